@@ -4,7 +4,9 @@ from fastapi.responses import FileResponse
 import os
 import logging
 from typing import Optional
-from app.api.v1.controllers.audio.cut_controller import cut_audio_handler
+from app.api.v1.controllers.audio.cut_controller import cut_audio_handler, ALLOWED_EXTENSIONS as AUDIO_EXTENSIONS
+from app.api.v1.controllers.plan_controller import cut_plan_handler
+from app.services.silence_analysis import AUDIO_CUT
 from app.services.task_manager import task_manager
 
 logger = logging.getLogger(__name__)
@@ -13,11 +15,17 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/cut")
-def cut_audio_route(background_tasks: BackgroundTasks, file: UploadFile = File(...), google_token: Optional[str] = Form(None), return_file: Optional[bool] = Form(False)):
-    return cut_audio_handler(background_tasks, file, google_token, return_file)
+async def cut_audio_route(background_tasks: BackgroundTasks, file: UploadFile = File(...), google_token: Optional[str] = Form(None), return_file: Optional[bool] = Form(False), callback_url: Optional[str] = Form(None)):
+    return await cut_audio_handler(background_tasks, file, google_token, return_file, callback_url)
+
+
+@router.post("/cut/plan")
+async def cut_audio_plan_route(file: UploadFile = File(...), format: str = Form("json")):
+    return await cut_plan_handler(file, AUDIO_EXTENSIONS, AUDIO_CUT, format)
 
 
 @router.get("/download/{task_id}")
+# Ruta síncrona: FastAPI la ejecuta en su pool de hilos, así que get_task no bloquea el event loop
 def download_audio(task_id: str, background_tasks: BackgroundTasks):
     task = task_manager.get_task(task_id)
     if not task:
@@ -26,6 +34,9 @@ def download_audio(task_id: str, background_tasks: BackgroundTasks):
     if task.status == "pending" or task.status == "processing":
         from fastapi import HTTPException
         raise HTTPException(status_code=202, detail=f"Procesamiento en curso: {task.porcentage}%")
+    if task.status == "cancelled":
+        from fastapi import HTTPException
+        raise HTTPException(status_code=409, detail="La tarea fue cancelada")
     if task.status == "failed" or not task.output_path:
         from fastapi import HTTPException
         raise HTTPException(status_code=500, detail="El procesamiento falló")
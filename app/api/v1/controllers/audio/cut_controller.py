@@ -2,36 +2,53 @@ from fastapi import HTTPException, UploadFile, File, BackgroundTasks
 from fastapi import status as http_status
 from fastapi.responses import JSONResponse
 import os
-import shutil
-import threading
+import asyncio
 import logging
 from uuid import uuid4
 from app.services.audio.cut import cut_audio
+from app.api.v1.controllers.downloads import download_url
 from app.services.task_manager import task_manager, Task
-from app.utils.process_wrapper import ProcessWrapper
+from app.services.scheduler import scheduler
+from app.services.render_cache import render_cache, submit_cached, upload_cached
+from app.services.silence_analysis import AUDIO_CUT
+from app.utils.job_control import JobCancelled, register_scratch
+from app.services.webhooks import run_with_callback, is_valid_callback_url
+from app.utils.uploads import save_upload
 
 logger = logging.getLogger(__name__)
 
 ALLOWED_EXTENSIONS = {".mpga", ".wav", ".m4a", ".aac", ".flac", ".ogg", ".mp3"}
 
 
-def generate_task_id():
+async def generate_task_id():
     logger.info("Creating new task")
     new_task = Task(id=str(uuid4()), porcentage=0, status="pending")
-    task_manager.add_task(new_task)
+    await asyncio.to_thread(task_manager.add_task, new_task)
     logger.info(f"Created new task: {new_task.id}")
     return new_task.id
 
 
-def _run_async_cut(task_id: str, temp_input: str, original_filename: str):
-    temp_output = None
+def _cache_key(temp_file: str):
+    return render_cache.key("audio_cut", temp_file, {"config": AUDIO_CUT})
+
+
+async def _run_async_cut(task_id: str, temp_input: str, original_filename: str, cache_key: str = None):
     try:
-        from app.core.config import settings
-        temp_output = ProcessWrapper.run(task_id, lambda: cut_audio(temp_input))
-        task_manager.set_output_path(task_id, temp_output)
+        extension = os.path.splitext(temp_input)[1]
+        temp_output = await asyncio.to_thread(render_cache.restore, cache_key, extension) if cache_key else None
+        if temp_output:
+            logger.info(f"Async cut served from cache for task {task_id}")
+        else:
+            temp_output = await cut_audio(temp_input)
+            if cache_key:
+                await asyncio.to_thread(render_cache.store, cache_key, extension, temp_output)
+        # Antes de que el planificador marque la tarea como completada
+        await asyncio.to_thread(task_manager.set_output_path, task_id, temp_output)
         logger.info(f"Async cut completed for task {task_id}: {temp_output}")
+        return temp_output
     except Exception as e:
         logger.error(f"Async cut failed for task {task_id}: {e}", exc_info=True)
+        raise
     finally:
         if os.path.exists(temp_input):
             try:
@@ -40,7 +57,56 @@ def _run_async_cut(task_id: str, temp_input: str, original_filename: str):
                 pass
 
 
-def cut_audio_handler(background_tasks: BackgroundTasks, file: UploadFile = File(...), google_token: str = None, return_file: bool = False):
+async def _cut_and_upload(task_id: str, temp_file: str, filename: str, google_token: str = None) -> dict:
+    temp_output = None
+    try:
+        logger.info("Iniciando procesamiento de audio...")
+        cache_key = _cache_key(temp_file)
+        temp_output, timings = await submit_cached(scheduler, task_id, cache_key, os.path.splitext(temp_file)[1],
+                                                   cut_audio, temp_file)
+        logger.info(f"Audio procesado exitosamente: {temp_output}")
+
+        from app.services.google_drive import drive_service
+
+        # Lo subido con el token del usuario está en su Drive: no se reutiliza entre peticiones
+        if google_token:
+            drive_data = await asyncio.to_thread(
+                drive_service.upload_file_with_user_token,
+                file_path=temp_output,
+                filename=filename,
+                access_token=google_token,
+                mime_type='audio/mpeg'
+            )
+        else:
+            drive_data = await upload_cached(
+                cache_key,
+                drive_service.upload_file,
+                file_path=temp_output,
+                filename=filename,
+                mime_type='audio/mpeg'
+            )
+
+        logger.info(f"Archivo subido a Google Drive: {drive_data['drive_url']}")
+
+        return {
+            "success": True,
+            "task_id": task_id,
+            "drive_link": drive_data["drive_url"],
+            "file_id": drive_data["file_id"],
+            "filename": filename,
+            "timings": timings,
+            "message": "Archivo procesado y subido a Google Drive correctamente"
+        }
+    finally:
+        for path in (temp_file, temp_output):
+            if path and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+async def cut_audio_handler(background_tasks: BackgroundTasks, file: UploadFile = File(...), google_token: str = None, return_file: bool = False, callback_url: str = None):
     logger.info(f">>> RECEIVING REQUEST IN cut_audio_handler <<<")
     logger.info(f"Filename: {file.filename}")
     logger.info(f"return_file: {return_file}")
@@ -52,24 +118,37 @@ def cut_audio_handler(background_tasks: BackgroundTasks, file: UploadFile = File
             detail=f"Extensión de archivo no permitida. Tipos soportados: {', '.join(ALLOWED_EXTENSIONS)}"
         )
 
+    if callback_url and not is_valid_callback_url(callback_url):
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="callback_url debe ser una URL http(s) válida"
+        )
+
     from app.core.config import settings
     os.makedirs(settings.TEMP_DIR, exist_ok=True)
 
-    task_id = generate_task_id()
+    task_id = await generate_task_id()
 
     if return_file:
         temp_input = os.path.join(settings.TEMP_DIR, f"input_{task_id}_{file.filename}")
-        with open(temp_input, "wb") as b:
-            shutil.copyfileobj(file.file, b)
-
-        logger.info(f"Starting async thread for task {task_id}")
-        thread = threading.Thread(
-            target=_run_async_cut,
-            args=(task_id, temp_input, file.filename),
-            daemon=True
-        )
-        thread.start()
-        logger.info(f"Thread started, returning JSONResponse immediately")
+        await asyncio.to_thread(save_upload, file, temp_input)
+        register_scratch(temp_input, task_id=task_id)
+
+        logger.info(f"Submitting async cut for task {task_id}")
+        future = scheduler.submit(task_id, _run_async_cut, task_id, temp_input, file.filename,
+                                  _cache_key(temp_input))
+        logger.info(f"Job queued, returning JSONResponse immediately")
+
+        if callback_url:
+            async def wait_for_download() -> dict:
+                await future
+                return {
+                    "success": True,
+                    "download_url": download_url("audio", task_id),
+                    "filename": file.filename,
+                    "timings": future.timings(),
+                }
+            run_with_callback(task_id, callback_url, wait_for_download())
 
         return JSONResponse({
             "task_id": task_id,
@@ -77,60 +156,33 @@ def cut_audio_handler(background_tasks: BackgroundTasks, file: UploadFile = File
             "message": "Procesamiento iniciado. Consulta /status/{task_id} para saber cuándo está listo y luego descarga desde /audio/download/{task_id}"
         })
 
-    temp_file = None
-    temp_output = None
-    try:
-        def execute_process():
-            nonlocal temp_file
-            temp_file = os.path.join(settings.TEMP_DIR, file.filename)
-            logger.info(f"Guardando archivo temporal: {temp_file}")
-            with open(temp_file, "wb") as b:
-                shutil.copyfileobj(file.file, b)
-            logger.info("Iniciando procesamiento de audio...")
-            return cut_audio(temp_file)
-
-        temp_output = ProcessWrapper.run(task_id, execute_process)
-        logger.info(f"Audio procesado exitosamente: {temp_output}")
-
-        from app.services.google_drive import drive_service
-
-        if google_token:
-            drive_data = drive_service.upload_file_with_user_token(
-                file_path=temp_output,
-                filename=file.filename,
-                access_token=google_token,
-                mime_type='audio/mpeg'
-            )
-        else:
-            drive_data = drive_service.upload_file(
-                file_path=temp_output,
-                filename=file.filename,
-                mime_type='audio/mpeg'
-            )
+    temp_file = os.path.join(settings.TEMP_DIR, f"{task_id}_{file.filename}")
+    logger.info(f"Guardando archivo temporal: {temp_file}")
+    await asyncio.to_thread(save_upload, file, temp_file)
+    register_scratch(temp_file, task_id=task_id)
 
-        os.remove(temp_output)
-        logger.info(f"Archivo subido a Google Drive: {drive_data['drive_url']}")
+    job = _cut_and_upload(task_id, temp_file, file.filename, google_token)
 
+    if callback_url:
+        run_with_callback(task_id, callback_url, job)
         return JSONResponse({
-            "success": True,
             "task_id": task_id,
-            "drive_link": drive_data["drive_url"],
-            "file_id": drive_data["file_id"],
-            "filename": file.filename,
-            "message": "Archivo procesado y subido a Google Drive correctamente"
-        })
+            "status": "processing",
+            "message": "Procesamiento iniciado. El resultado se enviará a callback_url"
+        }, status_code=http_status.HTTP_202_ACCEPTED)
 
+    try:
+        return JSONResponse(await job)
     except HTTPException:
         raise
+    except JobCancelled:
+        raise HTTPException(
+            status_code=http_status.HTTP_409_CONFLICT,
+            detail="La tarea fue cancelada"
+        )
     except Exception as e:
         logger.error(f"Error en cut_audio_handler: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error durante el procesamiento: {str(e)}"
         )
-    finally:
-        if temp_file and os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-            except OSError:
-                pass
@@ -0,0 +1,21 @@
+from fastapi import HTTPException
+from fastapi import status as http_status
+from app.services.scheduler import JobScheduler, SchedulerFull
+
+# Segundos que se sugieren al cliente antes de reintentar
+RETRY_AFTER_SECONDS = 5
+
+
+def queue_full(error: SchedulerFull) -> HTTPException:
+    """503 con Retry-After para una cola llena."""
+    return HTTPException(
+        status_code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Cola '{error.name}' llena ({error.limit} trabajos en espera); reintenta más tarde",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
+def ensure_capacity(lane: JobScheduler):
+    """Rechaza antes de guardar la subida (y antes del 202 de un callback) si la cola está llena."""
+    if lane.is_full():
+        raise queue_full(SchedulerFull(lane.name, lane.max_queued))
@@ -0,0 +1,6 @@
+from app.core.config import settings
+
+
+def download_url(kind: str, task_id: str) -> str:
+    """URL absoluta de /{kind}/download/{task_id} (PUBLIC_BASE_URL), la que sirve a quien recibe el callback."""
+    return f"{settings.PUBLIC_BASE_URL}/{kind}/download/{task_id}"
@@ -3,92 +3,337 @@ from fastapi import status as http_status
 from fastapi.responses import JSONResponse, FileResponse
 from fastapi import BackgroundTasks
 import os
+import json
+import asyncio
 import logging
+import zipfile
+from typing import List
 from uuid import uuid4
-from app.services.image.tweet import generate_tweet_image
+from app.services.image.tweet import generate_tweet_image, generate_tweet_images
 from app.services.task_manager import task_manager, Task
-from app.utils.process_wrapper import ProcessWrapper
+from app.services.scheduler import scheduler
+from app.services.render_cache import render_cache, submit_cached, upload_cached, mark_cached, CACHED_TIMINGS
+from app.utils.job_control import JobCancelled, register_scratch
+from app.services.webhooks import run_with_callback, is_valid_callback_url
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Textos por petición de /image/tweet/batch (un carrusel)
+MAX_BATCH_TEXTS = 30
 
-def _generate_task_id():
+
+async def _generate_task_id():
     new_task = Task(id=str(uuid4()), porcentage=0, status="pending")
-    task_manager.add_task(new_task)
+    await asyncio.to_thread(task_manager.add_task, new_task)
     return new_task.id
 
 
-async def tweet_image_handler(text: str, return_file: bool = True):
-    task_id = _generate_task_id()
-    output_path = None
+def _cache_key(text: str):
+    return render_cache.key("tweet", None, {"text": text})
+
+
+async def _render_and_upload(task_id: str, text: str):
+    """Genera la imagen y la sube a Drive. Devuelve (ruta de salida, datos de Drive, tiempos)."""
+    cache_key = _cache_key(text)
+    output_path, timings = await submit_cached(scheduler, task_id, cache_key, ".png", generate_tweet_image, text)
+    logger.info(f"Tweet image generated: {output_path}")
+
+    from app.services.google_drive import drive_service
 
     try:
-        def execute_process():
-            return generate_tweet_image(text)
+        drive_data = await upload_cached(
+            cache_key,
+            drive_service.upload_file,
+            file_path=output_path,
+            filename=f"tweet_{uuid4().hex[:8]}.png",
+            mime_type='image/png',
+            folder_id=settings.GOOGLE_DRIVE_MEME_FOLDER_ID
+        )
+    except Exception as e:
+        logger.error(f"Error uploading to Google Drive: {str(e)}")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error uploading tweet image to Google Drive: {str(e)}"
+        )
 
-        output_path = ProcessWrapper.run(task_id, execute_process)
-        logger.info(f"Tweet image generated: {output_path}")
+    return output_path, drive_data, timings
 
-        from app.services.google_drive import drive_service
 
-        try:
-            drive_data = drive_service.upload_file(
-                file_path=output_path,
-                filename=f"tweet_{uuid4().hex[:8]}.png",
-                mime_type='image/png',
-                folder_id=settings.GOOGLE_DRIVE_MEME_FOLDER_ID
-            )
+async def _tweet_to_drive(task_id: str, text: str) -> dict:
+    cache_key = _cache_key(text)
+    drive_data = await asyncio.to_thread(render_cache.get_upload, cache_key) if cache_key else None
+    if drive_data:
+        logger.info(f"Tweet image served from cache for task {task_id}")
+        await mark_cached(task_id)
+        timings = dict(CACHED_TIMINGS)
+    else:
+        output_path, drive_data, timings = await _render_and_upload(task_id, text)
+        if os.path.exists(output_path):
+            os.remove(output_path)
 
-            if not return_file:
-                if os.path.exists(output_path):
-                    os.remove(output_path)
+    return {
+        "success": True,
+        "task_id": task_id,
+        "drive_link": drive_data["drive_url"],
+        "file_id": drive_data["file_id"],
+        "timings": timings,
+        "message": "Tweet image generated and uploaded to Google Drive"
+    }
 
-                return JSONResponse({
-                    "success": True,
-                    "task_id": task_id,
-                    "drive_link": drive_data["drive_url"],
-                    "file_id": drive_data["file_id"],
-                    "message": "Tweet image generated and uploaded to Google Drive"
-                })
-
-            def cleanup():
-                if output_path and os.path.exists(output_path):
-                    os.remove(output_path)
-
-            tasks = BackgroundTasks()
-            tasks.add_task(cleanup)
-
-            return FileResponse(
-                path=output_path,
-                filename=f"tweet_{uuid4().hex[:8]}.png",
-                media_type='image/png',
-                background=tasks,
-                headers={
-                    "X-Drive-Link": drive_data["drive_url"],
-                    "X-File-ID": drive_data["file_id"],
-                    "X-Task-ID": task_id
-                }
-            )
 
+async def tweet_image_handler(text: str, return_file: bool = True, callback_url: str = None):
+    if callback_url and not is_valid_callback_url(callback_url):
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="callback_url must be a valid http(s) URL"
+        )
+
+    task_id = await _generate_task_id()
+
+    if callback_url:
+        run_with_callback(task_id, callback_url, _tweet_to_drive(task_id, text))
+        return JSONResponse({
+            "task_id": task_id,
+            "status": "processing",
+            "message": "Processing started. The result will be sent to callback_url"
+        }, status_code=http_status.HTTP_202_ACCEPTED)
+
+    try:
+        if not return_file:
+            return JSONResponse(await _tweet_to_drive(task_id, text))
+
+        output_path, drive_data, _ = await _render_and_upload(task_id, text)
+
+        def cleanup():
+            if output_path and os.path.exists(output_path):
+                os.remove(output_path)
+
+        tasks = BackgroundTasks()
+        tasks.add_task(cleanup)
+
+        return FileResponse(
+            path=output_path,
+            filename=f"tweet_{uuid4().hex[:8]}.png",
+            media_type='image/png',
+            background=tasks,
+            headers={
+                "X-Drive-Link": drive_data["drive_url"],
+                "X-File-ID": drive_data["file_id"],
+                "X-Task-ID": task_id
+            }
+        )
+
+    except HTTPException:
+        raise
+    except JobCancelled:
+        raise HTTPException(
+            status_code=http_status.HTTP_409_CONFLICT,
+            detail="Task was cancelled"
+        )
+    except Exception as e:
+        logger.error(f"Error in tweet_image_handler: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating tweet image: {str(e)}"
+        )
+
+
+def parse_texts(raw: str) -> List[str]:
+    """`texts` is a JSON list of strings, e.g. ["first card", "second card"]."""
+    try:
+        texts = json.loads(raw)
+    except (TypeError, ValueError):
+        texts = None
+    if not isinstance(texts, list) or not texts:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="texts must be a non-empty JSON list"
+        )
+    if len(texts) > MAX_BATCH_TEXTS:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_TEXTS} texts per request"
+        )
+    if not all(isinstance(text, str) and text.strip() for text in texts):
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="Every text must be a non-empty string"
+        )
+    return texts
+
+
+def _first_of_each_text(texts: List[str], indices: List[int]) -> dict:
+    """{index: index of the first occurrence of the same text} for every index in `indices`."""
+    first = {}
+    for index in indices:
+        first.setdefault(texts[index], index)
+    return {index: first[texts[index]] for index in indices}
+
+
+async def _render_many(task_id: str, texts: List[str], keys: list, indices: List[int]):
+    """
+    Renders texts[i] for every i in `indices` in a single scheduler job, taking
+    what is already in the render cache. A text repeated in the batch is
+    rendered once and its indices share the same file. Returns
+    ({index: path}, timings).
+    """
+    first = _first_of_each_text(texts, indices)
+    unique = sorted(set(first.values()))
+    paths = {}
+    for index in unique:
+        if keys[index]:
+            cached = await asyncio.to_thread(render_cache.restore, keys[index], ".png")
+            if cached:
+                paths[index] = cached
+
+    missing = [index for index in unique if index not in paths]
+    timings = dict(CACHED_TIMINGS)
+    if missing:
+        future = scheduler.submit(task_id, generate_tweet_images, [texts[index] for index in missing])
+        for index, path in zip(missing, await future):
+            paths[index] = path
+            if keys[index]:
+                await asyncio.to_thread(render_cache.store, keys[index], ".png", path)
+        timings = future.timings()
+    else:
+        await mark_cached(task_id)
+    return {index: paths[first[index]] for index in indices}, timings
+
+
+async def _tweet_batch_to_drive(task_id: str, texts: List[str]) -> dict:
+    keys = [_cache_key(text) for text in texts]
+    uploads = await asyncio.to_thread(lambda: [render_cache.get_upload(key) if key else None for key in keys])
+    pending = [index for index, upload in enumerate(uploads) if not upload]
+    first = _first_of_each_text(texts, pending)
+    paths = {}
+    try:
+        paths, timings = await _render_many(task_id, texts, keys, pending)
+
+        from app.services.google_drive import drive_service
+        semaphore = asyncio.Semaphore(max(1, settings.DRIVE_UPLOAD_WORKERS))
+
+        async def upload(index: int) -> dict:
+            async with semaphore:
+                return await upload_cached(
+                    keys[index],
+                    drive_service.upload_file,
+                    file_path=paths[index],
+                    filename=f"tweet_{index + 1:02d}_{uuid4().hex[:8]}.png",
+                    mime_type='image/png',
+                    folder_id=settings.GOOGLE_DRIVE_MEME_FOLDER_ID
+                )
+
+        unique = sorted(set(first.values()))
+        try:
+            uploaded = dict(zip(unique, await asyncio.gather(*(upload(index) for index in unique))))
         except Exception as e:
             logger.error(f"Error uploading to Google Drive: {str(e)}")
             raise HTTPException(
                 status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error uploading tweet image to Google Drive: {str(e)}"
+                detail=f"Error uploading tweet images to Google Drive: {str(e)}"
             )
+        for index in pending:
+            uploads[index] = uploaded[first[index]]
+
+        return {
+            "success": True,
+            "task_id": task_id,
+            "results": [
+                {
+                    "text": text,
+                    "drive_link": drive_data["drive_url"],
+                    "file_id": drive_data["file_id"],
+                    "cached": index not in pending,
+                }
+                for index, (text, drive_data) in enumerate(zip(texts, uploads))
+            ],
+            "timings": timings,
+            "message": f"{len(texts)} tweet images generated and uploaded to Google Drive"
+        }
+    finally:
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+
+async def _tweet_batch_zip(task_id: str, texts: List[str]) -> str:
+    """Renders every text and packs the PNGs (already compressed, so stored as-is) into a ZIP."""
+    keys = [_cache_key(text) for text in texts]
+    paths = {}
+    try:
+        paths, _ = await _render_many(task_id, texts, keys, list(range(len(texts))))
+
+        os.makedirs("temp", exist_ok=True)
+        zip_path = os.path.join("temp", f"tweets_{uuid4().hex[:8]}.zip")
+        register_scratch(zip_path)
+
+        def write_zip():
+            with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as archive:
+                for index in range(len(texts)):
+                    archive.write(paths[index], f"tweet_{index + 1:02d}.png")
+
+        await asyncio.to_thread(write_zip)
+        return zip_path
+    finally:
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+
+async def tweet_batch_handler(texts: str, return_file: bool = False, callback_url: str = None):
+    parsed_texts = parse_texts(texts)
+
+    if callback_url and not is_valid_callback_url(callback_url):
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="callback_url must be a valid http(s) URL"
+        )
+
+    task_id = await _generate_task_id()
+
+    if callback_url:
+        # With a callback the result always goes to Drive: there is no request to return the ZIP to
+        run_with_callback(task_id, callback_url, _tweet_batch_to_drive(task_id, parsed_texts))
+        return JSONResponse({
+            "task_id": task_id,
+            "status": "processing",
+            "message": "Processing started. The result will be sent to callback_url"
+        }, status_code=http_status.HTTP_202_ACCEPTED)
+
+    try:
+        if not return_file:
+            return JSONResponse(await _tweet_batch_to_drive(task_id, parsed_texts))
+
+        zip_path = await _tweet_batch_zip(task_id, parsed_texts)
+
+        def cleanup():
+            if os.path.exists(zip_path):
+                os.remove(zip_path)
+
+        tasks = BackgroundTasks()
+        tasks.add_task(cleanup)
+
+        return FileResponse(
+            path=zip_path,
+            filename=f"tweets_{task_id[:8]}.zip",
+            media_type='application/zip',
+            background=tasks,
+            headers={"X-Task-ID": task_id}
+        )
 
     except HTTPException:
         raise
+    except JobCancelled:
+        raise HTTPException(
+            status_code=http_status.HTTP_409_CONFLICT,
+            detail="Task was cancelled"
+        )
     except Exception as e:
-        logger.error(f"Error in tweet_image_handler: {str(e)}", exc_info=True)
+        logger.error(f"Error in tweet_batch_handler: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error generating tweet image: {str(e)}"
+            detail=f"Error generating tweet images: {str(e)}"
         )
-    finally:
-        if output_path and not return_file and os.path.exists(output_path):
-            try:
-                os.remove(output_path)
-            except OSError:
-                pass
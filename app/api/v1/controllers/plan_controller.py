@@ -0,0 +1,101 @@
+from fastapi import HTTPException, UploadFile
+from fastapi import status as http_status
+from fastapi.responses import JSONResponse, PlainTextResponse
+import os
+import asyncio
+import logging
+from uuid import uuid4
+from app.core.config import settings
+from app.services.cut_plan import build_cut_plan
+from app.services.silence_analysis import SilenceConfig, detect_speech
+from app.services.scheduler import preview_scheduler, SchedulerFull
+from app.api.v1.controllers.capacity import ensure_capacity, queue_full
+from app.services.task_manager import task_manager, Task
+from app.utils.ffmpeg_runner import probe
+from app.utils.job_control import JobCancelled
+from app.utils.uploads import save_upload
+
+logger = logging.getLogger(__name__)
+
+PLAN_FORMATS = {"json", "edl", "concat"}
+
+
+def _video_fps(info: dict):
+    stream = next((s for s in info.get("streams", []) if s.get("codec_type") == "video"), None)
+    if not stream:
+        return None
+    num, _, den = stream.get("r_frame_rate", "0/1").partition("/")
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+async def _analyse(temp_file: str, filename: str, config: SilenceConfig) -> dict:
+    info = await probe(temp_file)
+    duration = float(info["format"]["duration"])
+    fps = _video_fps(info)
+    segments = await detect_speech(temp_file, config, duration)
+    return build_cut_plan(segments, duration, filename, fps=fps, has_video=fps is not None)
+
+
+async def cut_plan_handler(file: UploadFile, allowed_extensions: set, config: SilenceConfig, format: str = "json"):
+    """
+    Devuelve dónde cortaría /cut sin codificar nada: solo se analiza el audio.
+    El análisis pasa por el carril corto del planificador (el de las
+    previsualizaciones), así que respeta su límite de trabajos e hilos y
+    responde 503 si su cola está llena.
+    """
+    file_extension = os.path.splitext(file.filename)[1].lower()
+    if file_extension not in allowed_extensions:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"Extensión no permitida. Soportados: {', '.join(allowed_extensions)}"
+        )
+
+    if format not in PLAN_FORMATS:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"format debe ser uno de: {', '.join(sorted(PLAN_FORMATS))}"
+        )
+
+    ensure_capacity(preview_scheduler)
+
+    os.makedirs(settings.TEMP_DIR, exist_ok=True)
+    temp_file = os.path.join(settings.TEMP_DIR, f"plan_{uuid4().hex[:8]}_{file.filename}")
+    await asyncio.to_thread(save_upload, file, temp_file)
+
+    task = Task(id=str(uuid4()), porcentage=0, status="pending")
+    await asyncio.to_thread(task_manager.add_task, task)
+    try:
+        plan = await preview_scheduler.submit(task.id, _analyse, temp_file, file.filename, config)
+    except SchedulerFull as e:
+        await asyncio.to_thread(task_manager.update_task_status, task.id, False)
+        raise queue_full(e)
+    except JobCancelled:
+        raise HTTPException(
+            status_code=http_status.HTTP_409_CONFLICT,
+            detail="La tarea fue cancelada"
+        )
+    except Exception as e:
+        logger.error(f"Error generando plan de corte: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error analizando archivo: {str(e)}"
+        )
+    finally:
+        if os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+            except OSError as e:
+                logger.warning(f"Error eliminando {temp_file}: {e}")
+
+    logger.info(
+        f"Plan de corte para {file.filename}: {len(plan['kept'])} tramos, "
+        f"{plan['removed_duration']}s eliminados"
+    )
+    if format == "edl":
+        return PlainTextResponse(plan["edl"])
+    if format == "concat":
+        return PlainTextResponse(plan["concat"])
+    return JSONResponse(plan)
@@ -1,17 +1,99 @@
-from fastapi.responses import JSONResponse
+from fastapi import Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.services.task_manager import task_manager
+from app.services.scheduler import scheduler_for
+import asyncio
+import json
+import time
 import logging
 
 logger = logging.getLogger(__name__)
-async def status_controller(task_id: str):  
-    task = task_manager.get_task(str(task_id))
-    if not task:
-        return JSONResponse(content={"error": "No se encontro la tarea"}, status_code=404)
-    
-    payload = {
+
+MAX_WAIT_SECONDS = 60
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def task_payload(task) -> dict:
+    return {
         "id": task.id,
         "status": task.status,
         "porcentage": task.porcentage,
+        "fps": task.fps,
+        "speed": task.speed,
+        "queue_position": scheduler_for(task.id).queue_position(task.id),
     }
 
-    return JSONResponse(content={"task": payload})
\ No newline at end of file
+
+async def status_controller(task_id: str, wait: float = None):
+    """
+    Estado de una tarea. Con `wait` (long-poll) responde en cuanto el estado
+    cambia o tras `wait` segundos como máximo.
+    """
+    task_id = str(task_id)
+    with task_manager.watch(task_id) as watch:
+        task = await asyncio.to_thread(task_manager.get_task, task_id)
+        if not task:
+            return JSONResponse(content={"error": "No se encontro la tarea"}, status_code=404)
+
+        payload = task_payload(task)
+        if wait and not task.finished:
+            deadline = time.monotonic() + min(wait, MAX_WAIT_SECONDS)
+            while (remaining := deadline - time.monotonic()) > 0:
+                await watch.wait(remaining)
+                task = await asyncio.to_thread(task_manager.get_task, task_id)
+                if not task:
+                    return JSONResponse(content={"error": "No se encontro la tarea"}, status_code=404)
+                current = task_payload(task)
+                if current != payload:
+                    payload = current
+                    break
+
+    return JSONResponse(content={"task": payload})
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def status_events_controller(task_id: str, request: Request):
+    """
+    Stream Server-Sent Events con el progreso de la tarea: un evento `progress`
+    por cambio y un evento final `end` (o `error` si la tarea no existe).
+    """
+    task_id = str(task_id)
+    if not await asyncio.to_thread(task_manager.get_task, task_id):
+        return JSONResponse(content={"error": "No se encontro la tarea"}, status_code=404)
+
+    async def event_stream():
+        with task_manager.watch(task_id) as watch:
+            last_payload = None
+            last_sent = time.monotonic()
+            while True:
+                task = await asyncio.to_thread(task_manager.get_task, task_id)
+                if not task:
+                    yield _sse("error", {"error": "No se encontro la tarea"})
+                    return
+
+                payload = task_payload(task)
+                if payload != last_payload:
+                    last_payload = payload
+                    last_sent = time.monotonic()
+                    yield _sse("progress", {"task": payload})
+                if task.finished:
+                    yield _sse("end", {"task": payload})
+                    return
+
+                if await request.is_disconnected():
+                    return
+
+                changed = await watch.wait(SSE_HEARTBEAT_SECONDS)
+                if not changed and time.monotonic() - last_sent >= SSE_HEARTBEAT_SECONDS:
+                    last_sent = time.monotonic()
+                    # Comentario SSE para mantener viva la conexión a través de proxies
+                    yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
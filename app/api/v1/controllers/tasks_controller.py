@@ -1,6 +1,12 @@
 from fastapi.responses import JSONResponse
 from uuid import uuid4
 from app.services.task_manager import task_manager, Task
+from app.services.scheduler import scheduler, preview_scheduler, scheduler_for
+from app.services.webhooks import webhook_sender
+from app.utils.ffmpeg_runner import running_processes
+from app.services.analysis_cache import analysis_cache
+from app.services.render_cache import render_cache
+import asyncio
 import logging
 from pathlib import Path
 import os
@@ -11,10 +17,28 @@ async def init_task_handler():
     """Crea una nueva task genérica para cualquier operación"""
     logger.info("Creating new task")
     new_task = Task(id=str(uuid4()), porcentage=0, status="pending")
-    task_manager.add_task(new_task)
+    await asyncio.to_thread(task_manager.add_task, new_task)
     logger.info(f"Created new task: {new_task.id}")
     return JSONResponse(content={"task_id": new_task.id}, status_code=200)
 
+async def cancel_task_handler(task_id: str):
+    """Cancela una tarea: descarta o detiene su trabajo y borra sus temporales"""
+    task = await asyncio.to_thread(task_manager.get_task, task_id)
+    if not task:
+        return JSONResponse(content={"error": "No se encontro la tarea"}, status_code=404)
+    if task.finished:
+        return JSONResponse(content={"error": f"La tarea ya terminó con estado '{task.status}'"}, status_code=409)
+
+    # Primero el almacén: así otros workers también ven la cancelación
+    await asyncio.to_thread(task_manager.cancel_task, task_id)
+    had_job = scheduler_for(task_id).cancel(task_id)
+    logger.info(f"Task {task_id} cancelled (job in this worker: {had_job})")
+    return JSONResponse(content={"task_id": task_id, "status": "cancelled"}, status_code=200)
+
+async def task_stats_handler():
+    store_stats = await asyncio.to_thread(task_manager.stats)
+    return JSONResponse(content={**store_stats, "scheduler": scheduler.stats(), "preview_scheduler": preview_scheduler.stats(), "webhooks": webhook_sender.stats(), "ffmpeg": running_processes(), "analysis_cache": analysis_cache.stats(), "render_cache": render_cache.stats()}, status_code=200)
+
 def clean_temp():
     from app.core.config import settings
     folder = settings.TEMP_DIR
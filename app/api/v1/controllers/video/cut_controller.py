@@ -2,67 +2,47 @@ from fastapi import UploadFile, File, HTTPException
 from fastapi import status as http_status
 from fastapi.responses import StreamingResponse
 from app.services.video.cut import cut_video_remove_silence
+from app.services.silence_analysis import VIDEO_CUT
 import shutil
 import os
+import asyncio
 import logging
 import io
 from uuid import uuid4
 from app.services.task_manager import task_manager
 from app.services.task_manager import Task
-from app.utils.process_wrapper import ProcessWrapper
+from app.services.scheduler import scheduler, preview_scheduler, SchedulerFull
+from app.api.v1.controllers.capacity import ensure_capacity, queue_full
+from app.services.render_cache import render_cache, submit_cached
+from app.utils.job_control import JobCancelled, register_scratch
+from app.services.webhooks import run_with_callback, is_valid_callback_url
+from app.utils.uploads import save_upload
+from app.core.encoding_profiles import EncodingProfile, EncodingProfileName
+from app.api.v1.controllers.video.profile import resolve_render_profile
+from app.api.v1.controllers.video.results import publish_result
 from fastapi.responses import JSONResponse
 
 logger = logging.getLogger(__name__)
 ALLOWED_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".flv", ".wmv", ".webm"}
 
-def cut_video_handler(file: UploadFile = File(...), task_id: str = None):
-    logger.info("Iniciando proceso de corte de video")
-
-    if not task_id:
-        raise HTTPException(
-            status_code=http_status.HTTP_400_BAD_REQUEST,
-            detail="task_id es requerido"
-        )
-    
-    task = task_manager.get_task(task_id)
-    if not task:
-        raise HTTPException(
-            status_code=http_status.HTTP_404_NOT_FOUND,
-            detail=f"Task {task_id} no encontrada"
-        )
 
-    temp_file = None
+async def _cut_video(task_id: str, temp_file: str, filename: str, smart_cut: bool = False,
+                     profile: EncodingProfile = None, preview: bool = False) -> dict:
     temp_output = None
-
     try:
-        def execute_process():
-            nonlocal temp_file, temp_output
-            file_extension = os.path.splitext(file.filename)[1].lower()
-            if file_extension not in ALLOWED_EXTENSIONS:
-                logger.warning(f"Extensión no permitida: {file_extension}")
-                raise HTTPException(
-                    status_code=http_status.HTTP_400_BAD_REQUEST,
-                    detail=f"Extensión no permitida. Soportados: {', '.join(ALLOWED_EXTENSIONS)}"
-                )
-
-            os.makedirs("temp", exist_ok=True)
-            temp_file = os.path.join("temp", file.filename)
-
-            with open(temp_file, "wb") as b:
-                shutil.copyfileobj(file.file, b)
-
-            logger.info(f"Archivo temporal: {temp_file}")
-
-            return cut_video_remove_silence(temp_file)
-
-        temp_output = ProcessWrapper.run(task_id, execute_process)
+        lane = preview_scheduler if preview else scheduler
+        cache_key = render_cache.key("video_cut", temp_file,
+                                     {"smart_cut": smart_cut, "profile": profile, "config": VIDEO_CUT})
+        temp_output, timings = await submit_cached(lane, task_id, cache_key, os.path.splitext(temp_file)[1],
+                                                   cut_video_remove_silence, temp_file, smart_cut, profile)
         logger.info(f"Video procesado: {temp_output}")
 
         # Guardar en carpeta results en lugar de descargar
         results_folder = "results"
         os.makedirs(results_folder, exist_ok=True)
         
-        output_filename = f"cut_{file.filename}"
+        # Con el task_id: dos tareas que suben el mismo nombre no se pisan el resultado
+        output_filename = f"{task_id}_{'preview_' if preview else ''}cut_{filename}"
         output_path = os.path.join(results_folder, output_filename)
         
         # Mover archivo procesado a results
@@ -70,15 +50,95 @@ def cut_video_handler(file: UploadFile = File(...), task_id: str = None):
         logger.info(f"Archivo guardado en: {output_path}")
 
         # Devolver información del archivo guardado
-        return JSONResponse({
+        return {
             "success": True,
+            "task_id": task_id,
             "file_path": os.path.abspath(output_path),
+            "download_url": await publish_result(task_id, output_path),
             "filename": output_filename,
+            "timings": timings,
             "message": "Archivo procesado y guardado correctamente"
-        })
+        }
+    finally:
+        if temp_file and os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+                logger.info(f"Archivo temporal eliminado: {temp_file}")
+            except OSError as e:
+                logger.warning(f"Error eliminando {temp_file}: {e}")
+        
+        if temp_output and os.path.exists(temp_output):
+            try:
+                os.remove(temp_output)
+                logger.info(f"Archivo de salida eliminado: {temp_output}")
+            except OSError as e:
+                logger.warning(f"Error eliminando {temp_output}: {e}")
+
 
+async def cut_video_handler(file: UploadFile = File(...), task_id: str = None, callback_url: str = None, smart_cut: bool = False,
+                            profile: str = None, preview: bool = False, preview_seconds: float = None):
+    logger.info("Iniciando proceso de corte de video")
+
+    if not task_id:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="task_id es requerido"
+        )
+    
+    task = await asyncio.to_thread(task_manager.get_task, task_id)
+    if not task:
+        raise HTTPException(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            detail=f"Task {task_id} no encontrada"
+        )
+
+    file_extension = os.path.splitext(file.filename)[1].lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
+        logger.warning(f"Extensión no permitida: {file_extension}")
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"Extensión no permitida. Soportados: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+
+    if callback_url and not is_valid_callback_url(callback_url):
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="callback_url debe ser una URL http(s) válida"
+        )
+
+    encoding_profile = resolve_render_profile(profile, preview, preview_seconds,
+                                              EncodingProfileName.FAST)
+    if preview:
+        ensure_capacity(preview_scheduler)
+
+    os.makedirs("temp", exist_ok=True)
+    temp_file = os.path.join("temp", f"{task_id}_{file.filename}")
+    await asyncio.to_thread(save_upload, file, temp_file)
+    register_scratch(temp_file, task_id=task_id)
+    logger.info(f"Archivo temporal: {temp_file}")
+
+    # El smart cut conserva la resolución original: no sirve para un proxy
+    job = _cut_video(task_id, temp_file, file.filename, smart_cut and not preview, encoding_profile, preview)
+
+    if callback_url:
+        run_with_callback(task_id, callback_url, job)
+        return JSONResponse({
+            "task_id": task_id,
+            "status": "processing",
+            "message": "Procesamiento iniciado. El resultado se enviará a callback_url"
+        }, status_code=http_status.HTTP_202_ACCEPTED)
+
+    try:
+        return JSONResponse(await job)
     except HTTPException:
         raise
+    except SchedulerFull as e:
+        raise queue_full(e)
+    except JobCancelled:
+        raise HTTPException(
+            status_code=http_status.HTTP_409_CONFLICT,
+            detail="La tarea fue cancelada"
+        )
     except FileNotFoundError as e:
         logger.error(f"Archivo no encontrado: {e}")
         raise HTTPException(
@@ -91,17 +151,3 @@ def cut_video_handler(file: UploadFile = File(...), task_id: str = None):
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error procesando video: {str(e)}"
         )
-    finally:
-        if temp_file and os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-                logger.info(f"Archivo temporal eliminado: {temp_file}")
-            except OSError as e:
-                logger.warning(f"Error eliminando {temp_file}: {e}")
-        
-        if temp_output and os.path.exists(temp_output):
-            try:
-                os.remove(temp_output)
-                logger.info(f"Archivo de salida eliminado: {temp_output}")
-            except OSError as e:
-                logger.warning(f"Error eliminando {temp_output}: {e}")
@@ -2,151 +2,421 @@ from fastapi import HTTPException, UploadFile, File, Form
 from fastapi import status as http_status
 from fastapi.responses import JSONResponse
 import os
-import shutil
+import json
+import asyncio
 import logging
+from typing import List
 from uuid import uuid4
-from app.services.video.meme import create_meme
-from app.core.video_styles import VideoTemplate, StyleRegistry
+from app.services.video.meme import create_meme, create_meme_batch
+from app.core.video_styles import VideoTemplate, StyleRegistry, TextStyle
 from app.services.task_manager import task_manager, Task
-from app.utils.process_wrapper import ProcessWrapper
+from app.services.scheduler import scheduler, preview_scheduler, SchedulerFull
+from app.api.v1.controllers.capacity import ensure_capacity, queue_full
+from app.services.render_cache import render_cache, submit_cached, upload_cached, mark_cached, CACHED_TIMINGS
+from app.utils.job_control import JobCancelled, register_scratch
+from app.services.webhooks import run_with_callback, is_valid_callback_url
+from app.utils.uploads import save_upload
 from app.core.config import settings
+from app.core.encoding_profiles import EncodingProfile, EncodingProfileName
+from app.api.v1.controllers.video.profile import resolve_profile, resolve_render_profile
 
 logger = logging.getLogger(__name__)
 
 ALLOWED_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv"}
 
-def generate_task_id():
+# Variantes por petición de /video/meme/batch: todas comparten un proceso de ffmpeg
+MAX_BATCH_VARIANTS = 20
+
+# Mapeo de colores a formato ASS (&HBBGGRR)
+COLOR_MAP = {
+    "white": "&H00FFFFFF",
+    "black": "&H00000000"
+}
+
+async def generate_task_id():
     logger.info("Creating new task for meme generation")
     new_task = Task(id=str(uuid4()), porcentage=0, status="pending")
-    task_manager.add_task(new_task)
+    await asyncio.to_thread(task_manager.add_task, new_task)
     logger.info(f"Created new task: {new_task.id}")
     return new_task.id
 
+
+def resolve_style(template: str, color: str) -> TextStyle:
+    try:
+        video_template = VideoTemplate(template)
+    except ValueError:
+        video_template = VideoTemplate.MEME_THIN
+    
+    style_template = StyleRegistry.resolve(video_template)
+    style_template.primary_color = COLOR_MAP.get(color.lower(), "&H00FFFFFF")
+    return style_template
+
+
+def meme_cache_key(temp_file: str, text: str, style_template: TextStyle, profile: EncodingProfile):
+    return render_cache.key("meme", temp_file, {"text": text, "style": style_template, "profile": profile})
+
+
+async def _render_and_upload(task_id: str, temp_file: str, filename: str, text: str, style_template: TextStyle,
+                             profile: EncodingProfile = None, cache_key: str = None):
+    """Genera el meme y lo sube a Drive. Devuelve (ruta de salida, datos de Drive, tiempos)."""
+    try:
+        logger.info(f"Iniciando generación de meme con texto: {text}")
+        temp_output, timings = await submit_cached(scheduler, task_id, cache_key, ".mp4",
+                                                   create_meme, temp_file, text, style_template, profile)
+    finally:
+        # Limpieza del archivo original subido
+        if temp_file and os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+
+    logger.info(f"Meme generado exitosamente: {temp_output}")
+
+    from app.services.google_drive import drive_service
+    try:
+        drive_data = await upload_cached(
+            cache_key,
+            drive_service.upload_file,
+            file_path=temp_output,
+            filename=f"meme_{filename}",
+            mime_type='video/mp4',
+            folder_id=settings.GOOGLE_DRIVE_MEME_FOLDER_ID
+        )
+    except Exception as e:
+        logger.error(f"Error subiendo a Google Drive: {str(e)}")
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error subiendo meme a Google Drive: {str(e)}"
+        )
+
+    return temp_output, drive_data, timings
+
+
+async def _render_preview(task_id: str, temp_file: str, text: str, style_template: TextStyle,
+                          profile: EncodingProfile, cache_key: str = None) -> str:
+    """Proxy de revisión en el carril de previsualizaciones; no se sube a Drive."""
+    try:
+        temp_output, _ = await submit_cached(preview_scheduler, task_id, cache_key, ".mp4",
+                                             create_meme, temp_file, text, style_template, profile)
+        return temp_output
+    finally:
+        if temp_file and os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+
+
+async def _meme_to_drive(task_id: str, temp_file: str, filename: str, text: str, style_template: TextStyle,
+                         profile: EncodingProfile = None, cache_key: str = None) -> dict:
+    drive_data = await asyncio.to_thread(render_cache.get_upload, cache_key) if cache_key else None
+    if drive_data:
+        # El mismo meme ya está en Drive: ni render ni subida
+        logger.info(f"Meme servido desde caché para la tarea {task_id}")
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        await mark_cached(task_id)
+        timings = dict(CACHED_TIMINGS)
+    else:
+        temp_output, drive_data, timings = await _render_and_upload(task_id, temp_file, filename, text,
+                                                                    style_template, profile, cache_key)
+        # Limpiar el archivo de salida: solo se devuelve el enlace de Drive
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+
+    return {
+        "success": True,
+        "task_id": task_id,
+        "drive_link": drive_data["drive_url"],
+        "file_id": drive_data["file_id"],
+        "filename": filename,
+        "timings": timings,
+        "message": "Meme generado y subido a Google Drive correctamente"
+    }
+
+
+def file_response(path: str, filename: str, headers: dict):
+    """Devuelve el archivo y lo borra después de enviarlo."""
+    from fastapi.responses import FileResponse
+    from fastapi import BackgroundTasks
+
+    def cleanup():
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    tasks = BackgroundTasks()
+    tasks.add_task(cleanup)
+
+    return FileResponse(
+        path=path,
+        filename=filename,
+        media_type='video/mp4',
+        background=tasks,
+        headers=headers
+    )
+
+
 async def meme_video_handler(
     file: UploadFile = File(...), 
     text: str = Form(...), 
     template: str = Form("meme_modern_thin"),
     color: str = Form("white"),
-    return_file: bool = False
+    return_file: bool = False,
+    callback_url: str = None,
+    profile: str = None,
+    preview: bool = False,
+    preview_seconds: float = None
 ):
-    temp_file = None
-    temp_output = None
-    
-    # Mapeo de colores a formato ASS (&HBBGGRR)
-    color_map = {
-        "white": "&H00FFFFFF",
-        "black": "&H00000000"
-    }
-    target_color = color_map.get(color.lower(), "&H00FFFFFF")
-    
-    task_id = generate_task_id()
-    
+    # 1. Validar extensión
+    file_extension = os.path.splitext(file.filename)[1].lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
+        logger.warning(f"Extensión de archivo no permitida: {file_extension}")
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"Extensión de archivo no permitida. Tipos soportados: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+
+    if callback_url and not is_valid_callback_url(callback_url):
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="callback_url debe ser una URL http(s) válida"
+        )
+
+    if preview and callback_url:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="preview no admite callback_url: la previsualización se devuelve en la respuesta"
+        )
+
+    encoding_profile = resolve_render_profile(profile, preview, preview_seconds,
+                                              EncodingProfileName.ARCHIVE)
+    if preview:
+        ensure_capacity(preview_scheduler)
+
+    task_id = await generate_task_id()
+
+    # 2. Guardar archivo en el directorio temporal
+    os.makedirs(settings.TEMP_DIR, exist_ok=True)
+    temp_file = os.path.join(settings.TEMP_DIR, f"{uuid4().hex}_{file.filename}")
+    logger.info(f"Guardando archivo temporal: {temp_file}")
+    await asyncio.to_thread(save_upload, file, temp_file)
+    register_scratch(temp_file, task_id=task_id)
+
+    # 3. Resolver template
+    style_template = resolve_style(template, color)
+    cache_key = meme_cache_key(temp_file, text, style_template, encoding_profile)
+
+    if callback_url:
+        # Con callback el resultado siempre va a Drive: no hay petición a la que devolver el archivo
+        run_with_callback(task_id, callback_url, _meme_to_drive(task_id, temp_file, file.filename, text, style_template, encoding_profile, cache_key))
+        return JSONResponse({
+            "task_id": task_id,
+            "status": "processing",
+            "message": "Procesamiento iniciado. El resultado se enviará a callback_url"
+        }, status_code=http_status.HTTP_202_ACCEPTED)
+
     try:
-        def execute_process():
-            # 1. Validar extensión
-            file_extension = os.path.splitext(file.filename)[1].lower()
-            if file_extension not in ALLOWED_EXTENSIONS:
-                logger.warning(f"Extensión de archivo no permitida: {file_extension}")
-                raise HTTPException(
-                    status_code=http_status.HTTP_400_BAD_REQUEST,
-                    detail=f"Extensión de archivo no permitida. Tipos soportados: {', '.join(ALLOWED_EXTENSIONS)}"
-                )
+        if preview:
+            temp_output = await _render_preview(task_id, temp_file, text, style_template, encoding_profile, cache_key)
+            return file_response(temp_output, f"preview_meme_{file.filename}", {"X-Task-ID": task_id})
 
-            # 2. Asegurar directorio temporal
-            os.makedirs(settings.TEMP_DIR, exist_ok=True)
-            nonlocal temp_file
-            temp_file = os.path.join(settings.TEMP_DIR, f"{uuid4().hex}_{file.filename}")
+        if not return_file:
+            return JSONResponse(await _meme_to_drive(task_id, temp_file, file.filename, text, style_template, encoding_profile, cache_key))
 
-            # 3. Guardar archivo
-            logger.info(f"Guardando archivo temporal: {temp_file}")
-            with open(temp_file, "wb") as b:
-                shutil.copyfileobj(file.file, b)
+        temp_output, drive_data, _ = await _render_and_upload(task_id, temp_file, file.filename, text, style_template, encoding_profile, cache_key)
 
-            # 4. Resolver template
-            try:
-                video_template = VideoTemplate(template)
-            except ValueError:
-                video_template = VideoTemplate.MEME_THIN
-            
-            style_template = StyleRegistry.resolve(video_template)
-            style_template.primary_color = target_color
-
-            # 5. Generar Meme
-            logger.info(f"Iniciando generación de meme con texto: {text}")
-            return create_meme(temp_file, text, style_template)
-
-        # Ejecutamos el proceso con seguimiento de progreso
-        temp_output = ProcessWrapper.run(task_id, execute_process)
-        
-        logger.info(f"Meme generado exitosamente: {temp_output}")
-
-        # 6. Subir a Google Drive
-        from app.services.google_drive import drive_service
-        try:
-            drive_data = drive_service.upload_file(
-                file_path=temp_output,
-                filename=f"meme_{file.filename}",
-                mime_type='video/mp4',
-                folder_id=settings.GOOGLE_DRIVE_MEME_FOLDER_ID
-            )
-            
-            # Limpiar el archivo de salida si no se va a retornar como archivo
-            if not return_file:
-                if os.path.exists(temp_output):
-                    os.remove(temp_output)
-                
-                return JSONResponse({
-                    "success": True,
-                    "task_id": task_id,
-                    "drive_link": drive_data["drive_url"],
-                    "file_id": drive_data["file_id"],
-                    "filename": file.filename,
-                    "message": "Meme generado y subido a Google Drive correctamente"
-                })
-            else:
-                # Retornar el archivo directamente para n8n/Telegram
-                from fastapi.responses import FileResponse
-                from fastapi import BackgroundTasks
-                
-                # Función para limpiar el archivo de salida después de enviarlo
-                def cleanup():
-                    if temp_output and os.path.exists(temp_output):
-                        os.remove(temp_output)
-                
-                tasks = BackgroundTasks()
-                tasks.add_task(cleanup)
-                
-                return FileResponse(
-                    path=temp_output,
-                    filename=f"meme_{file.filename}",
-                    media_type='video/mp4',
-                    background=tasks,
-                    headers={
-                        "X-Drive-Link": drive_data["drive_url"],
-                        "X-File-ID": drive_data["file_id"],
-                        "X-Task-ID": task_id
-                    }
-                )
-            
-        except Exception as e:
-            logger.error(f"Error subiendo a Google Drive: {str(e)}")
-            raise HTTPException(
-                status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error subiendo meme a Google Drive: {str(e)}"
-            )
+        # Retornar el archivo directamente para n8n/Telegram
+        return file_response(temp_output, f"meme_{file.filename}", {
+            "X-Drive-Link": drive_data["drive_url"],
+            "X-File-ID": drive_data["file_id"],
+            "X-Task-ID": task_id
+        })
 
     except HTTPException:
         raise
+    except SchedulerFull as e:
+        raise queue_full(e)
+    except JobCancelled:
+        raise HTTPException(
+            status_code=http_status.HTTP_409_CONFLICT,
+            detail="La tarea fue cancelada"
+        )
     except Exception as e:
         logger.error(f"Error en meme_video_handler: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error durante la generación del meme: {str(e)}"
         )
-    finally:
-        # Limpieza del archivo original subido
-        if temp_file and os.path.exists(temp_file):
+
+
+def parse_variants(raw: str) -> List[dict]:
+    """
+    `variants` es una lista JSON, p.ej.
+    [{"text": "A"}, {"text": "B", "template": "meme_classic", "color": "black"}].
+    """
+    try:
+        variants = json.loads(raw)
+    except (TypeError, ValueError):
+        variants = None
+    if not isinstance(variants, list) or not variants:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="variants debe ser una lista JSON no vacía"
+        )
+    if len(variants) > MAX_BATCH_VARIANTS:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {MAX_BATCH_VARIANTS} variantes por petición"
+        )
+
+    parsed = []
+    for variant in variants:
+        text = variant.get("text") if isinstance(variant, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            raise HTTPException(
+                status_code=http_status.HTTP_400_BAD_REQUEST,
+                detail="Cada variante necesita 'text'"
+            )
+        parsed.append({
+            "text": text,
+            "template": str(variant.get("template", "meme_modern_thin")),
+            "color": str(variant.get("color", "white")),
+        })
+    return parsed
+
+
+async def _meme_batch_to_drive(task_id: str, temp_file: str, filename: str, variants: List[dict],
+                               profile: EncodingProfile = None) -> dict:
+    """
+    Renderiza en un solo proceso las variantes que no estén ya en Drive y
+    sube cada salida. Devuelve un resultado por variante, en orden.
+    """
+    outputs = []
+    try:
+        styles = [resolve_style(variant["template"], variant["color"]) for variant in variants]
+        # La clave se calcula antes del render: prepare_for_video modifica el estilo
+        keys = [meme_cache_key(temp_file, variant["text"], style, profile)
+                for variant, style in zip(variants, styles)]
+        uploads = await asyncio.to_thread(lambda: [render_cache.get_upload(key) if key else None for key in keys])
+        pending = [index for index, upload in enumerate(uploads) if not upload]
+
+        if pending:
+            logger.info(f"Renderizando {len(pending)} de {len(variants)} variantes para la tarea {task_id}")
+            future = scheduler.submit(task_id, create_meme_batch, temp_file,
+                                      [(variants[index]["text"], styles[index]) for index in pending], profile)
+            outputs = await future
+            timings = future.timings()
+
+            from app.services.google_drive import drive_service
+
+            async def upload(index: int, output: str) -> dict:
+                if keys[index]:
+                    await asyncio.to_thread(render_cache.store, keys[index], ".mp4", output)
+                return await upload_cached(
+                    keys[index],
+                    drive_service.upload_file,
+                    file_path=output,
+                    filename=f"meme_{index + 1}_{filename}",
+                    mime_type='video/mp4',
+                    folder_id=settings.GOOGLE_DRIVE_MEME_FOLDER_ID
+                )
+
             try:
-                os.remove(temp_file)
-            except OSError:
-                pass
+                uploaded = await asyncio.gather(*(upload(index, output) for index, output in zip(pending, outputs)))
+            except Exception as e:
+                logger.error(f"Error subiendo a Google Drive: {str(e)}")
+                raise HTTPException(
+                    status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Error subiendo memes a Google Drive: {str(e)}"
+                )
+            for index, drive_data in zip(pending, uploaded):
+                uploads[index] = drive_data
+        else:
+            logger.info(f"Todas las variantes servidas desde caché para la tarea {task_id}")
+            await mark_cached(task_id)
+            timings = dict(CACHED_TIMINGS)
+
+        return {
+            "success": True,
+            "task_id": task_id,
+            "filename": filename,
+            "results": [
+                {
+                    **variant,
+                    "drive_link": drive_data["drive_url"],
+                    "file_id": drive_data["file_id"],
+                    "cached": index not in pending,
+                }
+                for index, (variant, drive_data) in enumerate(zip(variants, uploads))
+            ],
+            "timings": timings,
+            "message": f"{len(variants)} memes generados y subidos a Google Drive correctamente"
+        }
+    finally:
+        for path in (temp_file, *outputs):
+            if path and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+async def meme_batch_handler(
+    file: UploadFile = File(...),
+    variants: str = Form(...),
+    callback_url: str = None,
+    profile: str = None
+):
+    file_extension = os.path.splitext(file.filename)[1].lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
+        logger.warning(f"Extensión de archivo no permitida: {file_extension}")
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"Extensión de archivo no permitida. Tipos soportados: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+
+    parsed_variants = parse_variants(variants)
+
+    if callback_url and not is_valid_callback_url(callback_url):
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="callback_url debe ser una URL http(s) válida"
+        )
+
+    encoding_profile = resolve_profile(profile, EncodingProfileName.ARCHIVE)
+
+    task_id = await generate_task_id()
+
+    os.makedirs(settings.TEMP_DIR, exist_ok=True)
+    temp_file = os.path.join(settings.TEMP_DIR, f"{uuid4().hex}_{file.filename}")
+    await asyncio.to_thread(save_upload, file, temp_file)
+    register_scratch(temp_file, task_id=task_id)
+
+    job = _meme_batch_to_drive(task_id, temp_file, file.filename, parsed_variants, encoding_profile)
+
+    if callback_url:
+        run_with_callback(task_id, callback_url, job)
+        return JSONResponse({
+            "task_id": task_id,
+            "status": "processing",
+            "message": "Procesamiento iniciado. El resultado se enviará a callback_url"
+        }, status_code=http_status.HTTP_202_ACCEPTED)
+
+    try:
+        return JSONResponse(await job)
+    except HTTPException:
+        raise
+    except JobCancelled:
+        raise HTTPException(
+            status_code=http_status.HTTP_409_CONFLICT,
+            detail="La tarea fue cancelada"
+        )
+    except Exception as e:
+        logger.error(f"Error en meme_batch_handler: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error durante la generación de los memes: {str(e)}"
+        )
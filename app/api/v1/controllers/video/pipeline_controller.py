@@ -0,0 +1,218 @@
+from fastapi import HTTPException, UploadFile, File
+from fastapi import status as http_status
+from fastapi.responses import JSONResponse
+import os
+import json
+import asyncio
+import logging
+from typing import List
+from uuid import uuid4
+from app.services.video.pipeline import render_pipeline, PipelineStep, CutStep, ZoomStep, MemeStep
+from app.services.video.zoom_pan import ZoomConfig
+from app.services.task_manager import task_manager
+from app.services.scheduler import scheduler, preview_scheduler, SchedulerFull
+from app.api.v1.controllers.capacity import ensure_capacity, queue_full
+from app.services.render_cache import render_cache, submit_cached, upload_cached
+from app.utils.job_control import JobCancelled, register_scratch
+from app.services.webhooks import run_with_callback, is_valid_callback_url
+from app.utils.uploads import save_upload
+from app.core.config import settings
+from app.core.encoding_profiles import EncodingProfile, EncodingProfileName
+from app.api.v1.controllers.video.profile import resolve_render_profile
+from app.api.v1.controllers.video.meme_controller import resolve_style, file_response
+from app.api.v1.controllers.video.cut_controller import ALLOWED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_OPERATIONS = {"cut", "zoom", "meme"}
+MEME_PARAMS = {"text", "template", "color"}
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def parse_operations(raw: str) -> List[PipelineStep]:
+    """
+    `operations` es una lista JSON ordenada, p.ej.
+    [{"op": "cut"}, {"op": "zoom", "num_zooms": 5}, {"op": "meme", "text": "..."}].
+    El orden se respeta (ver render_pipeline); parámetros desconocidos o
+    fuera de rango dan 400.
+    """
+    try:
+        operations = json.loads(raw)
+    except (TypeError, ValueError):
+        raise _bad_request("operations debe ser una lista JSON")
+    if not isinstance(operations, list) or not operations:
+        raise _bad_request("operations debe ser una lista JSON no vacía")
+
+    steps: List[PipelineStep] = []
+    seen = set()
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get("op") not in PIPELINE_OPERATIONS:
+            raise _bad_request(f"Cada operación necesita 'op': {', '.join(sorted(PIPELINE_OPERATIONS))}")
+        params = {key: value for key, value in operation.items() if key != "op"}
+        op = operation["op"]
+        if op in seen:
+            raise _bad_request(f"La operación '{op}' aparece más de una vez")
+        seen.add(op)
+
+        if op == "cut":
+            if params:
+                raise _bad_request("cut no admite parámetros")
+            steps.append(CutStep())
+        elif op == "zoom":
+            try:
+                steps.append(ZoomStep(ZoomConfig.from_params(params)))
+            except ValueError as e:
+                raise _bad_request(f"zoom: {e}")
+        else:
+            unknown = set(params) - MEME_PARAMS
+            if unknown:
+                raise _bad_request(f"meme: parámetros desconocidos: {', '.join(sorted(unknown))}")
+            text = params.get("text")
+            if not isinstance(text, str) or not text.strip():
+                raise _bad_request("meme necesita 'text'")
+            template, color = params.get("template", "meme_modern_thin"), params.get("color", "white")
+            if not isinstance(template, str) or not isinstance(color, str):
+                raise _bad_request("meme: 'template' y 'color' deben ser texto")
+            style = resolve_style(template, color)
+            steps.append(MemeStep(text, style))
+    return steps
+
+
+def pipeline_cache_key(temp_file: str, steps: List[PipelineStep], profile: EncodingProfile):
+    # El nombre del paso distingue CutStep() de un paso vacío de otro tipo
+    return render_cache.key("pipeline", temp_file, {
+        "steps": [(type(step).__name__, step) for step in steps],
+        "profile": profile,
+    })
+
+
+async def _pipeline_to_drive(task_id: str, temp_file: str, filename: str, steps: List[PipelineStep],
+                             profile: EncodingProfile, cache_key: str = None) -> dict:
+    temp_output = None
+    try:
+        temp_output, timings = await submit_cached(scheduler, task_id, cache_key, ".mp4",
+                                                   render_pipeline, temp_file, steps, profile)
+        logger.info(f"Pipeline procesado: {temp_output}")
+
+        from app.services.google_drive import drive_service
+        try:
+            drive_data = await upload_cached(
+                cache_key,
+                drive_service.upload_file,
+                file_path=temp_output,
+                filename=f"pipeline_{filename}",
+                mime_type='video/mp4',
+                folder_id=settings.GOOGLE_DRIVE_MEME_FOLDER_ID
+            )
+        except Exception as e:
+            logger.error(f"Error subiendo a Google Drive: {str(e)}")
+            raise HTTPException(
+                status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error subiendo video a Google Drive: {str(e)}"
+            )
+
+        return {
+            "success": True,
+            "task_id": task_id,
+            "drive_link": drive_data["drive_url"],
+            "file_id": drive_data["file_id"],
+            "filename": filename,
+            "timings": timings,
+            "message": "Video procesado y subido a Google Drive correctamente"
+        }
+    finally:
+        for path in (temp_file, temp_output):
+            if path and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Error eliminando {path}: {e}")
+
+
+async def _render_preview(task_id: str, temp_file: str, steps: List[PipelineStep], profile: EncodingProfile,
+                          cache_key: str = None) -> str:
+    """Proxy de revisión en el carril de previsualizaciones; no se sube a Drive."""
+    try:
+        temp_output, _ = await submit_cached(preview_scheduler, task_id, cache_key, ".mp4",
+                                             render_pipeline, temp_file, steps, profile)
+        return temp_output
+    finally:
+        if temp_file and os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+
+
+async def pipeline_video_handler(file: UploadFile = File(...), operations: str = None, task_id: str = None,
+                                 callback_url: str = None, profile: str = None, preview: bool = False,
+                                 preview_seconds: float = None):
+    logger.info("Iniciando pipeline de video")
+
+    if not task_id:
+        raise _bad_request("task_id es requerido")
+
+    task = await asyncio.to_thread(task_manager.get_task, task_id)
+    if not task:
+        raise HTTPException(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            detail=f"Task {task_id} no encontrada"
+        )
+
+    file_extension = os.path.splitext(file.filename)[1].lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
+        logger.warning(f"Extensión no permitida: {file_extension}")
+        raise _bad_request(f"Extensión no permitida. Soportados: {', '.join(ALLOWED_EXTENSIONS)}")
+
+    steps = parse_operations(operations)
+
+    if callback_url and not is_valid_callback_url(callback_url):
+        raise _bad_request("callback_url debe ser una URL http(s) válida")
+    if preview and callback_url:
+        raise _bad_request("preview no admite callback_url: la previsualización se devuelve en la respuesta")
+
+    encoding_profile = resolve_render_profile(profile, preview, preview_seconds,
+                                              EncodingProfileName.ARCHIVE)
+    if preview:
+        ensure_capacity(preview_scheduler)
+
+    os.makedirs(settings.TEMP_DIR, exist_ok=True)
+    temp_file = os.path.join(settings.TEMP_DIR, f"{uuid4().hex}_{file.filename}")
+    await asyncio.to_thread(save_upload, file, temp_file)
+    register_scratch(temp_file, task_id=task_id)
+    cache_key = pipeline_cache_key(temp_file, steps, encoding_profile)
+
+    if callback_url:
+        run_with_callback(task_id, callback_url,
+                          _pipeline_to_drive(task_id, temp_file, file.filename, steps, encoding_profile, cache_key))
+        return JSONResponse({
+            "task_id": task_id,
+            "status": "processing",
+            "message": "Procesamiento iniciado. El resultado se enviará a callback_url"
+        }, status_code=http_status.HTTP_202_ACCEPTED)
+
+    try:
+        if preview:
+            temp_output = await _render_preview(task_id, temp_file, steps, encoding_profile, cache_key)
+            return file_response(temp_output, f"preview_pipeline_{os.path.splitext(file.filename)[0]}.mp4",
+                                 {"X-Task-ID": task_id})
+        return JSONResponse(await _pipeline_to_drive(task_id, temp_file, file.filename, steps, encoding_profile,
+                                                     cache_key))
+    except HTTPException:
+        raise
+    except SchedulerFull as e:
+        raise queue_full(e)
+    except JobCancelled:
+        raise HTTPException(
+            status_code=http_status.HTTP_409_CONFLICT,
+            detail="La tarea fue cancelada"
+        )
+    except Exception as e:
+        logger.error(f"Error en pipeline: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error procesando video: {str(e)}"
+        )
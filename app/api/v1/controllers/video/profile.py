@@ -0,0 +1,30 @@
+from typing import Optional
+from fastapi import HTTPException
+from fastapi import status as http_status
+from app.core.encoding_profiles import EncodingProfile, EncodingProfileName, ProfileRegistry
+
+
+def resolve_profile(profile: Optional[str],
+                    default: EncodingProfileName = EncodingProfileName.STANDARD) -> EncodingProfile:
+    """Perfil de codificación pedido (o el del servidor, o `default`); 400 si no existe."""
+    try:
+        return ProfileRegistry.resolve(profile, default)
+    except ValueError:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"profile debe ser uno de: {', '.join(ProfileRegistry.names())}"
+        )
+
+
+def resolve_render_profile(profile: Optional[str], preview: bool = False,
+                           preview_seconds: Optional[float] = None,
+                           default: EncodingProfileName = EncodingProfileName.STANDARD) -> EncodingProfile:
+    """Con `preview` se ignora `profile` y se usa el proxy rápido (opcionalmente los primeros N segundos)."""
+    if not preview:
+        return resolve_profile(profile, default)
+    if preview_seconds is not None and preview_seconds <= 0:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="preview_seconds debe ser mayor que 0"
+        )
+    return ProfileRegistry.preview(preview_seconds)
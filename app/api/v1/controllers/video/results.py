@@ -0,0 +1,13 @@
+import asyncio
+import os
+from app.api.v1.controllers.downloads import download_url
+from app.services.task_manager import task_manager
+
+
+async def publish_result(task_id: str, output_path: str) -> str:
+    """
+    Asocia el archivo de results/ a la tarea y devuelve la URL de
+    /video/download/{task_id}, que sí sirve a quien recibe el callback.
+    """
+    await asyncio.to_thread(task_manager.set_output_path, task_id, os.path.abspath(output_path))
+    return download_url("video", task_id)
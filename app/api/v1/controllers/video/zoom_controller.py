@@ -1,47 +1,54 @@
 from fastapi import UploadFile, File, HTTPException
 from fastapi import status as http_status
-from fastapi.responses import StreamingResponse
-from app.services.video.zoom_pan import zoom_pan
+from fastapi.responses import StreamingResponse, JSONResponse
+from app.services.video.zoom_pan import zoom_pan, ZoomConfig
+from app.services.task_manager import task_manager, Task
+from app.services.scheduler import scheduler, preview_scheduler, SchedulerFull
+from app.api.v1.controllers.capacity import ensure_capacity, queue_full
+from app.services.render_cache import render_cache, submit_cached
+from app.utils.job_control import JobCancelled, register_scratch
+from app.services.webhooks import run_with_callback, is_valid_callback_url
+from app.utils.uploads import save_upload
+from app.core.encoding_profiles import EncodingProfile, EncodingProfileName
+from app.api.v1.controllers.video.profile import resolve_render_profile
+from app.api.v1.controllers.video.results import publish_result
 import shutil
 import os
+import asyncio
 import logging
 import io
+from uuid import uuid4
 
 logger = logging.getLogger(__name__)
 ALLOWED_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".flv", ".wmv", ".webm"}
 
 
-def zoom_video_handler(file: UploadFile = File(...), task_id: str = None):
-    logger.info("Iniciando proceso de zoom de video")
+async def _resolve_task_id(task_id: str = None) -> str:
+    # El task_id es opcional: si no viene de /tasks/init se crea uno nuevo
+    if task_id and await asyncio.to_thread(task_manager.get_task, task_id):
+        return task_id
+    new_task = Task(id=task_id or str(uuid4()), porcentage=0, status="pending")
+    await asyncio.to_thread(task_manager.add_task, new_task)
+    return new_task.id
 
-    temp_file = None
-    temp_output = None
 
+async def _zoom_video(task_id: str, temp_file: str, filename: str, profile: EncodingProfile = None,
+                      preview: bool = False, smart_zoom: bool = False) -> dict:
+    temp_output = None
     try:
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        if file_extension not in ALLOWED_EXTENSIONS:
-            logger.warning(f"Extensión no permitida: {file_extension}")
-            raise HTTPException(
-                status_code=http_status.HTTP_400_BAD_REQUEST,
-                detail=f"Extensión no permitida. Soportados: {', '.join(ALLOWED_EXTENSIONS)}"
-            )
-
-        os.makedirs("temp", exist_ok=True)
-        temp_file = os.path.join("temp", file.filename)
-
-        with open(temp_file, "wb") as b:
-            shutil.copyfileobj(file.file, b)
-
-        logger.info(f"Archivo temporal: {temp_file}")
-
-        temp_output = zoom_pan(temp_file)
+        lane = preview_scheduler if preview else scheduler
+        cache_key = render_cache.key("zoom", temp_file,
+                                     {"config": ZoomConfig(), "profile": profile, "smart_zoom": smart_zoom})
+        temp_output, timings = await submit_cached(lane, task_id, cache_key, os.path.splitext(temp_file)[1],
+                                                   zoom_pan, temp_file, None, None, profile, smart_zoom)
         logger.info(f"Video procesado: {temp_output}")
 
         # Guardar en carpeta results en lugar de descargar
         results_folder = "results"
         os.makedirs(results_folder, exist_ok=True)
         
-        output_filename = f"zoom_{file.filename}"
+        # Con el task_id: dos tareas que suben el mismo nombre no se pisan el resultado
+        output_filename = f"{task_id}_{'preview_' if preview else ''}zoom_{filename}"
         output_path = os.path.join(results_folder, output_filename)
         
         # Mover archivo procesado a results
@@ -49,15 +56,85 @@ def zoom_video_handler(file: UploadFile = File(...), task_id: str = None):
         logger.info(f"Archivo guardado en: {output_path}")
 
         # Devolver información del archivo guardado
-        return JSONResponse({
+        return {
             "success": True,
+            "task_id": task_id,
             "file_path": os.path.abspath(output_path),
+            "download_url": await publish_result(task_id, output_path),
             "filename": output_filename,
+            "timings": timings,
             "message": "Archivo procesado y guardado correctamente"
-        })
+        }
+    finally:
+        if temp_file and os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+                logger.info(f"Archivo temporal eliminado: {temp_file}")
+            except OSError as e:
+                logger.warning(f"Error eliminando {temp_file}: {e}")
+        
+        if temp_output and os.path.exists(temp_output):
+            try:
+                os.remove(temp_output)
+                logger.info(f"Archivo de salida eliminado: {temp_output}")
+            except OSError as e:
+                logger.warning(f"Error eliminando {temp_output}: {e}")
+
+
+async def zoom_video_handler(file: UploadFile = File(...), task_id: str = None, callback_url: str = None,
+                             profile: str = None, preview: bool = False, preview_seconds: float = None,
+                             smart_zoom: bool = False):
+    logger.info("Iniciando proceso de zoom de video")
+
+    file_extension = os.path.splitext(file.filename)[1].lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
+        logger.warning(f"Extensión no permitida: {file_extension}")
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"Extensión no permitida. Soportados: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+
+    if callback_url and not is_valid_callback_url(callback_url):
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="callback_url debe ser una URL http(s) válida"
+        )
+
+    encoding_profile = resolve_render_profile(profile, preview, preview_seconds,
+                                              EncodingProfileName.ARCHIVE)
+    if preview:
+        ensure_capacity(preview_scheduler)
+
+    task_id = await _resolve_task_id(task_id)
+
+    os.makedirs("temp", exist_ok=True)
+    temp_file = os.path.join("temp", f"{task_id}_{file.filename}")
+    await asyncio.to_thread(save_upload, file, temp_file)
+    register_scratch(temp_file, task_id=task_id)
+    logger.info(f"Archivo temporal: {temp_file}")
 
+    # Un proxy cambia resolución y fps: no puede copiar tramos del original
+    job = _zoom_video(task_id, temp_file, file.filename, encoding_profile, preview, smart_zoom and not preview)
+
+    if callback_url:
+        run_with_callback(task_id, callback_url, job)
+        return JSONResponse({
+            "task_id": task_id,
+            "status": "processing",
+            "message": "Procesamiento iniciado. El resultado se enviará a callback_url"
+        }, status_code=http_status.HTTP_202_ACCEPTED)
+
+    try:
+        return JSONResponse(await job)
     except HTTPException:
         raise
+    except SchedulerFull as e:
+        raise queue_full(e)
+    except JobCancelled:
+        raise HTTPException(
+            status_code=http_status.HTTP_409_CONFLICT,
+            detail="La tarea fue cancelada"
+        )
     except FileNotFoundError as e:
         logger.error(f"Archivo no encontrado: {e}")
         raise HTTPException(
@@ -70,17 +147,3 @@ def zoom_video_handler(file: UploadFile = File(...), task_id: str = None):
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error procesando video: {str(e)}"
         )
-    finally:
-        if temp_file and os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-                logger.info(f"Archivo temporal eliminado: {temp_file}")
-            except OSError as e:
-                logger.warning(f"Error eliminando {temp_file}: {e}")
-        
-        if temp_output and os.path.exists(temp_output):
-            try:
-                os.remove(temp_output)
-                logger.info(f"Archivo de salida eliminado: {temp_output}")
-            except OSError as e:
-                logger.warning(f"Error eliminando {temp_output}: {e}")
@@ -1,9 +1,15 @@
 from fastapi import APIRouter, Form
-from app.api.v1.controllers.image.tweet_controller import tweet_image_handler
+from typing import Optional
+from app.api.v1.controllers.image.tweet_controller import tweet_image_handler, tweet_batch_handler
 
 router = APIRouter()
 
 
 @router.post("/tweet")
-async def tweet_image_route(text: str = Form(...), return_file: bool = Form(True)):
-    return await tweet_image_handler(text, return_file)
+async def tweet_image_route(text: str = Form(...), return_file: bool = Form(True), callback_url: Optional[str] = Form(None)):
+    return await tweet_image_handler(text, return_file, callback_url)
+
+
+@router.post("/tweet/batch")
+async def tweet_batch_route(texts: str = Form(...), return_file: bool = Form(False), callback_url: Optional[str] = Form(None)):
+    return await tweet_batch_handler(texts, return_file, callback_url)
@@ -7,8 +7,9 @@ from app.api.v1.tasks import router as tasks_router
 from app.api.v1.script import router as script_router
 from app.api.v1.elevenlabs import router as elevenlabs_router
 from app.api.v1.create import router as create_router
-from app.api.v1.controllers.status_controller import status_controller
+from app.api.v1.controllers.status_controller import status_controller, status_events_controller
 from fastapi.responses import StreamingResponse
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -32,8 +33,12 @@ async def get_endpoints(request: Request):
     return {"endpoints": endpoints}
 
 @router.get("/status/{task_id}")
-async def task_status(task_id:str):
-    return await status_controller(task_id)
+async def task_status(task_id:str, wait: Optional[float] = None):
+    return await status_controller(task_id, wait)
+
+@router.get("/status/{task_id}/events")
+async def task_status_events(task_id: str, request: Request):
+    return await status_events_controller(task_id, request)
 
 router.include_router(tasks_router, prefix="/tasks", tags=["tasks"])
 router.include_router(audio_router, prefix="/audio", tags=["audio"])
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.controllers.tasks_controller import init_task_handler, clean_temp
+from app.api.v1.controllers.tasks_controller import init_task_handler, clean_temp, task_stats_handler, cancel_task_handler
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,4 +14,16 @@ async def init_task_route():
 
 @router.get("/clean")
 async def clean_temp_tasks():
-    return await clean_temp()
\ No newline at end of file
+    return await clean_temp()
+
+
+@router.get("/stats")
+async def task_stats_route():
+    """Contadores del registro de tareas (vivas, caducadas, desalojadas)"""
+    return await task_stats_handler()
+
+
+@router.delete("/{task_id}")
+async def cancel_task_route(task_id: str):
+    """Cancela la tarea: mata sus ffmpeg, descarta el trabajo en cola y limpia temporales"""
+    return await cancel_task_handler(task_id)
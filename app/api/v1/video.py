@@ -1,7 +1,14 @@
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import FileResponse
 from app.api.v1.controllers.video import cut_video_handler, zoom_video_handler
-from app.api.v1.controllers.video.meme_controller import meme_video_handler
+from app.api.v1.controllers.video.meme_controller import meme_video_handler, meme_batch_handler
+from app.api.v1.controllers.video.pipeline_controller import pipeline_video_handler
+from app.api.v1.controllers.video.cut_controller import ALLOWED_EXTENSIONS as VIDEO_EXTENSIONS
+from app.api.v1.controllers.plan_controller import cut_plan_handler
+from app.services.silence_analysis import VIDEO_CUT
+from app.services.task_manager import task_manager
 from typing import Optional
+import os
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,12 +16,32 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/cut")
-def cut_video_route(file: UploadFile = File(...), task_id: str = None):
-    return cut_video_handler(file, task_id)
+async def cut_video_route(file: UploadFile = File(...), task_id: str = None, callback_url: Optional[str] = Form(None), smart_cut: bool = Form(False), profile: Optional[str] = Form(None), preview: bool = Form(False), preview_seconds: Optional[float] = Form(None)):
+    return await cut_video_handler(file, task_id, callback_url, smart_cut, profile, preview, preview_seconds)
+
+@router.post("/cut/plan")
+async def cut_video_plan_route(file: UploadFile = File(...), format: str = Form("json")):
+    return await cut_plan_handler(file, VIDEO_EXTENSIONS, VIDEO_CUT, format)
+
+@router.get("/download/{task_id}")
+# Ruta síncrona: FastAPI la ejecuta en su pool de hilos, así que get_task no bloquea el event loop
+def download_video(task_id: str):
+    task = task_manager.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    if not task.finished:
+        raise HTTPException(status_code=202, detail=f"Procesamiento en curso: {task.porcentage}%")
+    if task.status == "cancelled":
+        raise HTTPException(status_code=409, detail="La tarea fue cancelada")
+    if task.status == "failed" or not task.output_path:
+        raise HTTPException(status_code=500, detail="El procesamiento falló")
+    if not os.path.exists(task.output_path):
+        raise HTTPException(status_code=410, detail="El archivo ya no está disponible")
+    return FileResponse(path=task.output_path, filename=os.path.basename(task.output_path))
 
 @router.post("/zoom")
-def zoom_video_route(file: UploadFile = File(...), task_id: str = None):
-    return zoom_video_handler(file, task_id)
+async def zoom_video_route(file: UploadFile = File(...), task_id: str = None, callback_url: Optional[str] = Form(None), profile: Optional[str] = Form(None), preview: bool = Form(False), preview_seconds: Optional[float] = Form(None), smart_zoom: bool = Form(False)):
+    return await zoom_video_handler(file, task_id, callback_url, profile, preview, preview_seconds, smart_zoom)
 
 @router.post("/meme")
 async def meme_video_route(
@@ -22,6 +49,31 @@ async def meme_video_route(
     text: str = Form(...), 
     template: str = Form("meme_modern_thin"),
     color: str = Form("white"),
-    return_file: bool = Form(False)
+    return_file: bool = Form(False),
+    callback_url: Optional[str] = Form(None),
+    profile: Optional[str] = Form(None),
+    preview: bool = Form(False),
+    preview_seconds: Optional[float] = Form(None)
+):
+    return await meme_video_handler(file, text, template, color, return_file, callback_url, profile, preview, preview_seconds)
+
+@router.post("/meme/batch")
+async def meme_batch_route(
+    file: UploadFile = File(...),
+    variants: str = Form(...),
+    callback_url: Optional[str] = Form(None),
+    profile: Optional[str] = Form(None)
+):
+    return await meme_batch_handler(file, variants, callback_url, profile)
+
+@router.post("/pipeline")
+async def pipeline_video_route(
+    file: UploadFile = File(...),
+    operations: str = Form(...),
+    task_id: str = None,
+    callback_url: Optional[str] = Form(None),
+    profile: Optional[str] = Form(None),
+    preview: bool = Form(False),
+    preview_seconds: Optional[float] = Form(None)
 ):
-    return await meme_video_handler(file, text, template, color, return_file)
+    return await pipeline_video_handler(file, operations, task_id, callback_url, profile, preview, preview_seconds)
@@ -32,6 +32,57 @@ class Settings:
     ADMIN_API_KEY: str = os.getenv("ADMIN_API_KEY", "")
     ELEVENLABS_DEFAULT_CHARACTER_LIMIT: int = int(os.getenv("ELEVENLABS_DEFAULT_CHARACTER_LIMIT", "10000"))
     ELEVENLABS_DB_PATH: str = os.getenv("ELEVENLABS_DB_PATH", str(BASE_DIR / "elevenlabs.db"))
+    TASK_MAX_ENTRIES: int = int(os.getenv("TASK_MAX_ENTRIES", "5000"))
+    TASK_TTL_SECONDS: float = float(os.getenv("TASK_TTL_SECONDS", "3600"))
+    TASK_PENDING_TTL_SECONDS: float = float(os.getenv("TASK_PENDING_TTL_SECONDS", "1800"))
+    # "memory" (un solo proceso) o "sqlite" (compartido entre workers de uvicorn y reinicios)
+    TASK_STORE: str = os.getenv("TASK_STORE", "memory")
+    TASK_DB_PATH: str = os.getenv("TASK_DB_PATH", str(BASE_DIR / "tasks.db"))
+    TASK_PROGRESS_FLUSH_SECONDS: float = float(os.getenv("TASK_PROGRESS_FLUSH_SECONDS", "1.0"))
+    # 0 = derivar del número de CPUs
+    SCHEDULER_WORKERS: int = int(os.getenv("SCHEDULER_WORKERS", "0"))
+    SCHEDULER_THREADS_PER_JOB: int = int(os.getenv("SCHEDULER_THREADS_PER_JOB", "0"))
+    # 0 = sin límite de tiempo por ejecución de ffmpeg
+    FFMPEG_TIMEOUT_SECONDS: float = float(os.getenv("FFMPEG_TIMEOUT_SECONDS", "0"))
+    # Trozos de video largo procesados a la vez por un corte (0 = según hilos del trabajo)
+    CUT_CHUNK_WORKERS: int = int(os.getenv("CUT_CHUNK_WORKERS", "0"))
+    CUT_CHUNK_SECONDS: float = float(os.getenv("CUT_CHUNK_SECONDS", str(8 * 60)))
+    # Caché de análisis (ffprobe, niveles de audio, keyframes) por hash de contenido; 0 = desactivada
+    ANALYSIS_CACHE_DIR: str = os.getenv("ANALYSIS_CACHE_DIR", str(BASE_DIR / "cache" / "analysis"))
+    ANALYSIS_CACHE_MAX_BYTES: int = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    # Caché de renders (salida y subida a Drive) por hash de entrada, parámetros y versión del código; 0 = desactivada
+    RENDER_CACHE_DIR: str = os.getenv("RENDER_CACHE_DIR", str(BASE_DIR / "cache" / "render"))
+    RENDER_CACHE_MAX_BYTES: int = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+    # Perfil de codificación por defecto: draft | fast | standard | archive;
+    # vacío = el de cada operación (corte: fast; meme, zoom y pipeline: archive)
+    ENCODING_PROFILE: str = os.getenv("ENCODING_PROFILE", "")
+    # Carril de previsualizaciones (proxies 480p) independiente de los renders completos
+    PREVIEW_WORKERS: int = int(os.getenv("PREVIEW_WORKERS", "2"))
+    PREVIEW_THREADS_PER_JOB: int = int(os.getenv("PREVIEW_THREADS_PER_JOB", "2"))
+    # Previsualizaciones en espera como máximo; más allá se responde 503 (0 = sin límite)
+    PREVIEW_QUEUE_SIZE: int = int(os.getenv("PREVIEW_QUEUE_SIZE", "8"))
+    # Fuentes de reserva (rutas separadas por comas, en orden) para los caracteres
+    # que Poppins no tiene en las imágenes de tweet, p.ej. emojis y símbolos
+    TWEET_FALLBACK_FONTS: str = os.getenv(
+        "TWEET_FALLBACK_FONTS",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf,"
+        "/usr/share/fonts/truetype/ancient-scripts/Symbola_hint.ttf",
+    )
+    # Imágenes de tweet renderizadas a la vez en /image/tweet/batch (0 = una por CPU)
+    TWEET_BATCH_WORKERS: int = int(os.getenv("TWEET_BATCH_WORKERS", "2"))
+    # Subidas simultáneas a Drive de un mismo lote
+    DRIVE_UPLOAD_WORKERS: int = int(os.getenv("DRIVE_UPLOAD_WORKERS", "4"))
+    WEBHOOK_WORKERS: int = int(os.getenv("WEBHOOK_WORKERS", "4"))
+    WEBHOOK_QUEUE_SIZE: int = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+    WEBHOOK_MAX_ATTEMPTS: int = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+    WEBHOOK_BACKOFF_SECONDS: float = float(os.getenv("WEBHOOK_BACKOFF_SECONDS", "2"))
+    WEBHOOK_TIMEOUT_SECONDS: float = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "10"))
+    # Espera máxima al apagar para entregar los webhooks en cola o en reintento
+    WEBHOOK_DRAIN_SECONDS: float = float(os.getenv("WEBHOOK_DRAIN_SECONDS", "15"))
+    # Permite callbacks a redes privadas/loopback (solo despliegues internos)
+    WEBHOOK_ALLOW_PRIVATE: bool = os.getenv("WEBHOOK_ALLOW_PRIVATE", "false").lower() == "true"
+    # URL pública de la API para los enlaces de descarga de los callbacks ("" = rutas relativas)
+    PUBLIC_BASE_URL: str = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")
     _GROK_SYSTEM_PROMPT_FILE: str = os.getenv("GROK_SYSTEM_PROMPT_FILE", str(BASE_DIR / "grok_system_prompt.txt"))
     _TEMPLATE_SCRIPT_PROMPT_FILE: str = os.getenv("TEMPLATE_SCRIPT_PROMPT_FILE", str(BASE_DIR / "template_script_prompt.txt"))
 
@@ -16,6 +16,21 @@ CREATE TABLE IF NOT EXISTS elevenlabs_users (
 );
 """
 
+CREATE_TASKS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    porcentage INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    output_path TEXT,
+    fps REAL,
+    speed REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_expires_at ON tasks (expires_at);
+"""
+
 
 async def get_db() -> aiosqlite.Connection:
     db = await aiosqlite.connect(settings.ELEVENLABS_DB_PATH)
@@ -33,3 +48,20 @@ async def init_db():
         await db.execute(CREATE_TABLE_SQL)
         await db.commit()
     logger.info("ElevenLabs database initialized successfully")
+
+    if settings.TASK_STORE.lower() == "sqlite":
+        await init_task_db()
+
+
+async def init_task_db():
+    import os
+    logger.info(f"Initializing task database at {settings.TASK_DB_PATH}")
+    db_dir = os.path.dirname(settings.TASK_DB_PATH)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    async with aiosqlite.connect(settings.TASK_DB_PATH) as db:
+        # WAL: lectores de otros workers no bloquean al que escribe el progreso
+        await db.execute("PRAGMA journal_mode=WAL")
+        await db.executescript(CREATE_TASKS_TABLE_SQL)
+        await db.commit()
+    logger.info("Task database initialized successfully")
@@ -0,0 +1,162 @@
+from dataclasses import dataclass, replace
+from enum import Enum
+from typing import List, Optional
+from app.core.config import settings
+
+
+class EncodingProfileName(str, Enum):
+    DRAFT = "draft"
+    FAST = "fast"
+    STANDARD = "standard"
+    ARCHIVE = "archive"
+    PREVIEW = "preview"
+
+
+def _as_kwargs(args: List[str]) -> dict:
+    return {key.lstrip("-"): value for key, value in zip(args[::2], args[1::2])}
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    name: str
+    vcodec: str = "libx264"
+    preset: str = "veryfast"
+    crf: int = 23
+    # Máximo de hilos por ffmpeg dentro del presupuesto del planificador; 0 = sin tope propio
+    threads: int = 0
+    # "copy" conserva el audio original cuando no hay que filtrarlo
+    acodec: str = "aac"
+    audio_bitrate: Optional[str] = "128k"
+    # Altura máxima de salida; None = resolución original
+    max_height: Optional[int] = None
+    # Fps máximos de salida; None = los del original
+    max_fps: Optional[int] = None
+    # Solo los primeros N segundos del resultado (previsualizaciones); None = completo
+    max_seconds: Optional[float] = None
+
+    def video_args(self) -> List[str]:
+        return ["-c:v", self.vcodec, "-preset", self.preset, "-crf", str(self.crf)]
+
+    def audio_args(self, filtered: bool = False) -> List[str]:
+        """Audio de salida; si el audio pasa por filtros no se puede copiar."""
+        if self.acodec == "copy" and not filtered:
+            return ["-c:a", "copy"]
+        args = ["-c:a", "aac" if self.acodec == "copy" else self.acodec]
+        if self.audio_bitrate:
+            args += ["-b:a", self.audio_bitrate]
+        return args
+
+    def copies_audio(self, filtered: bool = False) -> bool:
+        return self.audio_args(filtered) == ["-c:a", "copy"]
+
+    def output_kwargs(self, filtered_audio: bool = False) -> dict:
+        """Los mismos parámetros como kwargs de `ffmpeg.output` (ffmpeg-python)."""
+        return _as_kwargs(self.video_args() + self.audio_args(filtered_audio))
+
+    def audio_kwargs(self, filtered: bool = False) -> dict:
+        """Solo los de audio, como kwargs de `ffmpeg.output`."""
+        return _as_kwargs(self.audio_args(filtered))
+
+    def scale_filter(self) -> Optional[str]:
+        """Filtro que limita la altura sin ampliar ni deformar; None si no hay límite."""
+        if not self.max_height:
+            return None
+        return f"scale=-2:'min({self.max_height},ih)'"
+
+    def video_filter(self) -> Optional[str]:
+        """Cadena de filtros de salida (resolución y fps máximos); None si no hace falta."""
+        filters = [f for f in (self.scale_filter(), f"fps={self.max_fps}" if self.max_fps else None) if f]
+        return ",".join(filters) or None
+
+    def limit_duration(self, duration: float) -> float:
+        """Duración que se renderiza de hecho con este perfil."""
+        if self.max_seconds and duration:
+            return min(duration, self.max_seconds)
+        return self.max_seconds or duration
+
+
+# Catálogo de perfiles: velocidad frente a calidad/tamaño. Los presets
+# rápidos apenas ganan con más de 2-4 hilos por ffmpeg: con el tope, los
+# hilos sobrantes del trabajo quedan para otros trabajos o grupos en paralelo.
+_PROFILE_CATALOG = {
+    EncodingProfileName.DRAFT: {
+        "preset": "ultrafast",
+        "crf": 28,
+        "threads": 2,
+        "acodec": "aac",
+        "audio_bitrate": "96k",
+        "max_height": 720,
+    },
+    # Lo que usaba /video/cut antes de los perfiles
+    EncodingProfileName.FAST: {
+        "preset": "ultrafast",
+        "crf": 23,
+        "threads": 4,
+        "acodec": "aac",
+        "audio_bitrate": "128k",
+    },
+    EncodingProfileName.STANDARD: {
+        "preset": "veryfast",
+        "crf": 23,
+        "threads": 4,
+        "acodec": "aac",
+        "audio_bitrate": "128k",
+    },
+    # Lo que usaban /video/meme y /video/zoom antes de los perfiles
+    EncodingProfileName.ARCHIVE: {
+        "preset": "slow",
+        "crf": 18,
+        "acodec": "copy",
+        "audio_bitrate": "192k",
+    },
+    # Proxy rápido para revisar el resultado antes del render final
+    EncodingProfileName.PREVIEW: {
+        "preset": "ultrafast",
+        "crf": 32,
+        "threads": 2,
+        "acodec": "aac",
+        "audio_bitrate": "64k",
+        "max_height": 480,
+        "max_fps": 15,
+    },
+}
+
+
+class ProfileRegistry:
+    @staticmethod
+    def names() -> List[str]:
+        """Perfiles que se pueden pedir por nombre; `preview` solo se usa con preview=true."""
+        return [name.value for name in EncodingProfileName if name is not EncodingProfileName.PREVIEW]
+
+    @staticmethod
+    def _build(profile_name: EncodingProfileName) -> EncodingProfile:
+        return EncodingProfile(name=profile_name.value, **_PROFILE_CATALOG[profile_name])
+
+    @staticmethod
+    def resolve(name: Optional[str] = None,
+                default: EncodingProfileName = EncodingProfileName.STANDARD) -> EncodingProfile:
+        """
+        Devuelve el perfil pedido o, si no se indica, el del servidor
+        (ENCODING_PROFILE) o, si tampoco hay, `default`: el que usaba cada
+        operación antes de los perfiles. Lanza ValueError si el nombre no existe
+        o es `preview`, que va por su propio carril (ver `preview`).
+        """
+        profile_name = EncodingProfileName(name or settings.ENCODING_PROFILE or default)
+        if profile_name is EncodingProfileName.PREVIEW:
+            raise ValueError("el perfil preview solo se usa con preview=true")
+        return ProfileRegistry._build(profile_name)
+
+    @staticmethod
+    def validate_settings():
+        """Falla al arrancar (y no en cada petición) si ENCODING_PROFILE no existe."""
+        if settings.ENCODING_PROFILE and settings.ENCODING_PROFILE not in ProfileRegistry.names():
+            raise ValueError(
+                f"ENCODING_PROFILE={settings.ENCODING_PROFILE!r} no existe; "
+                f"usa uno de: {', '.join(ProfileRegistry.names())}"
+            )
+
+    @staticmethod
+    def preview(seconds: Optional[float] = None) -> EncodingProfile:
+        """Perfil de previsualización, opcionalmente limitado a los primeros `seconds` segundos."""
+        profile = ProfileRegistry._build(EncodingProfileName.PREVIEW)
+        return replace(profile, max_seconds=seconds) if seconds else profile
@@ -4,14 +4,28 @@ from app.api.v1.routes import router
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.database import init_db
+from app.core.encoding_profiles import ProfileRegistry
+from app.services.scheduler import scheduler, preview_scheduler
+from app.services.webhooks import webhook_sender
+from app.services.task_manager import task_manager
+from app.services.image.tweet import preload_base_layer
+import asyncio
 import logging
 import sys
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    ProfileRegistry.validate_settings()
     await init_db()
+    await webhook_sender.start()
+    await asyncio.to_thread(preload_base_layer)
     yield
+    # Primero los trabajos: sus callbacks de cancelación se entregan al vaciar los webhooks
+    await scheduler.shutdown()
+    await preview_scheduler.shutdown()
+    await webhook_sender.stop()
+    await asyncio.to_thread(task_manager.close)
 
 
 app = FastAPI(lifespan=lifespan)
@@ -0,0 +1,108 @@
+import os
+import io
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+from app.services.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+
+def new_hasher():
+    return hashlib.sha256()
+
+
+class AnalysisCache(DiskCache):
+    """
+    Caché en disco de resultados de análisis (ffprobe, niveles de audio,
+    índices de keyframes) direccionada por el hash del contenido del fichero.
+
+    El hash se calcula mientras se guarda la subida (app.utils.uploads) y se
+    asocia a la ruta con `remember`; los servicios solo reciben rutas, así que
+    `digest_for` resuelve ruta -> hash comprobando tamaño y mtime. Los ficheros
+    intermedios sin hash conocido no se cachean.
+
+    Cada entrada es un fichero `<hash>.<tipo>` (ver DiskCache).
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_paths: int = 4096):
+        super().__init__(directory, max_bytes)
+        self.max_paths = max_paths
+        self._paths: "OrderedDict[str, Tuple[str, int, float]]" = OrderedDict()
+
+    # --- ruta -> hash ---
+
+    def remember(self, path: str, digest: str):
+        """Asocia a `path` el hash de su contenido (calculado al escribirlo)."""
+        stat = os.stat(path)
+        with self._lock:
+            self._paths[os.path.abspath(path)] = (digest, stat.st_size, stat.st_mtime)
+            self._paths.move_to_end(os.path.abspath(path))
+            while len(self._paths) > self.max_paths:
+                self._paths.popitem(last=False)
+
+    def digest_for(self, path: str) -> Optional[str]:
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._paths.get(key)
+        if entry is None:
+            return None
+        digest, size, mtime = entry
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        # El fichero cambió desde que se calculó el hash
+        if stat.st_size != size or stat.st_mtime != mtime:
+            with self._lock:
+                self._paths.pop(key, None)
+            return None
+        return digest
+
+    # --- almacenamiento ---
+
+    def _read(self, path: str, kind: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        digest = self.digest_for(path)
+        if digest is None:
+            return None
+        return self.read_entry(digest, kind)
+
+    def _write(self, path: str, kind: str, data: bytes):
+        if not self.enabled:
+            return
+        digest = self.digest_for(path)
+        if digest is None:
+            return
+        self.write_entry(digest, kind, data)
+
+    def get_json(self, path: str, kind: str) -> Optional[Any]:
+        data = self._read(path, f"{kind}.json")
+        return None if data is None else json.loads(data)
+
+    def put_json(self, path: str, kind: str, value: Any):
+        self._write(path, f"{kind}.json", json.dumps(value).encode("utf-8"))
+
+    def get_array(self, path: str, kind: str) -> Optional[np.ndarray]:
+        data = self._read(path, f"{kind}.npy")
+        return None if data is None else np.load(io.BytesIO(data), allow_pickle=False)
+
+    def put_array(self, path: str, kind: str, value: np.ndarray):
+        buffer = io.BytesIO()
+        np.save(buffer, value, allow_pickle=False)
+        self._write(path, f"{kind}.npy", buffer.getvalue())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**super().stats(), "known_paths": len(self._paths)}
+
+
+analysis_cache = AnalysisCache(
+    directory=settings.ANALYSIS_CACHE_DIR,
+    max_bytes=settings.ANALYSIS_CACHE_MAX_BYTES,
+)
@@ -2,19 +2,16 @@ import ffmpeg
 import os
 import logging
 from app.core.config import settings
+from app.services.silence_analysis import detect_speech, AUDIO_CUT
+from app.utils.ffmpeg_progress import stage
+from app.utils.ffmpeg_runner import run_ffmpeg, probe_duration, probe_sample_rate
+from app.services.segment_graph import write_cut_graph
+from app.utils.job_control import register_scratch
 
 logger = logging.getLogger(__name__)
 
-CONFIG_FILTER = {
-    "start_periods": 1,
-    "start_duration": 0,
-    "start_threshold": "-30dB",
-    "stop_periods": -1,
-    "stop_duration": 0.1,
-    "stop_threshold": "-40dB"
-}
 
-def cut_audio(input_file: str):
+async def cut_audio(input_file: str):
     """
     Función pura para cortar silencios de un audio usando FFmpeg.
     No maneja tareas ni estados, solo procesa el archivo.
@@ -22,36 +19,39 @@ def cut_audio(input_file: str):
     if not os.path.exists(input_file):
         raise FileNotFoundError(f"El archivo de entrada no existe: {input_file}")
 
-    config_cut = (
-        f"silenceremove="
-        f"start_periods={CONFIG_FILTER['start_periods']}:"
-        f"start_duration={CONFIG_FILTER['start_duration']}:"
-        f"start_threshold={CONFIG_FILTER['start_threshold']}:"
-        f"stop_periods={CONFIG_FILTER['stop_periods']}:"
-        f"stop_duration={CONFIG_FILTER['stop_duration']}:"
-        f"stop_threshold={CONFIG_FILTER['stop_threshold']}"
-    )
-
     input_basename = os.path.basename(input_file)
     output_path = os.path.join(settings.TEMP_DIR, f"output_{input_basename}")
     
     os.makedirs(settings.TEMP_DIR, exist_ok=True)
+    register_scratch(output_path)
 
     try:
-        (
-            ffmpeg.input(input_file)
-            .output(
-                output_path,
-                af=config_cut,
-                acodec="libmp3lame",  # Codec MP3
-                ar="44100",  # Sample rate
-            )
-            .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True, quiet=False)
-        )
+        duration = await probe_duration(input_file)
+        with stage(0.0, 0.3):
+            segments = await detect_speech(input_file, AUDIO_CUT, duration)
+        if not segments:
+            raise Exception("El audio no contiene voz")
+
+        graph_file = write_cut_graph(f"{output_path}.graph.txt", segments, video=False,
+                                     sample_rate=await probe_sample_rate(input_file))
+        try:
+            with stage(0.3, 1.0):
+                await run_ffmpeg([
+                    "ffmpeg",
+                    "-i", input_file,
+                    "-filter_complex_script", graph_file,
+                    "-map", "[aout]",
+                    "-acodec", "libmp3lame",  # Codec MP3
+                    "-ar", "44100",  # Sample rate
+                    "-y",
+                    output_path,
+                ], duration=sum(end - start for start, end in segments))
+        finally:
+            if os.path.exists(graph_file):
+                os.remove(graph_file)
 
         return output_path
 
     except ffmpeg.Error as e:
         error_msg = e.stderr.decode() if e.stderr else str(e)
-        raise Exception(f"Error procesando audio con FFmpeg: {error_msg}") from e
\ No newline at end of file
+        raise Exception(f"Error procesando audio con FFmpeg: {error_msg}") from e
@@ -0,0 +1,65 @@
+from typing import List, Optional
+from app.services.silence_analysis import Segment, silence_periods
+
+EDL_DEFAULT_FPS = 30
+
+
+def _timecode(seconds: float, fps: int) -> str:
+    frames = int(round(seconds * fps))
+    hours, rest = divmod(frames, 3600 * fps)
+    minutes, rest = divmod(rest, 60 * fps)
+    secs, frames = divmod(rest, fps)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}:{frames:02d}"
+
+
+def _describe(segments: List[Segment]) -> List[dict]:
+    return [
+        {"index": i, "start": start, "end": end, "duration": round(end - start, 3)}
+        for i, (start, end) in enumerate(segments)
+    ]
+
+
+def build_edl(segments: List[Segment], source_name: str, fps: int = EDL_DEFAULT_FPS,
+              has_video: bool = True) -> str:
+    """EDL CMX3600: un evento por tramo conservado, colocados seguidos en la línea de tiempo."""
+    track = "AA/V" if has_video else "AA"
+    lines = [f"TITLE: {source_name}", "FCM: NON-DROP FRAME", ""]
+    record = 0.0
+    for i, (start, end) in enumerate(segments, start=1):
+        length = end - start
+        lines.append(
+            f"{i:03d}  AX       {track:<5} C        "
+            f"{_timecode(start, fps)} {_timecode(end, fps)} "
+            f"{_timecode(record, fps)} {_timecode(record + length, fps)}"
+        )
+        lines.append(f"* FROM CLIP NAME: {source_name}")
+        lines.append("")
+        record += length
+    return "\n".join(lines)
+
+
+def build_concat_list(segments: List[Segment], source_path: str) -> str:
+    """Lista para el demuxer concat de ffmpeg (`ffmpeg -f concat -safe 0 -i lista ...`)."""
+    escaped = source_path.replace("'", "'\\''")
+    lines = ["ffconcat version 1.0"]
+    for start, end in segments:
+        lines += [f"file '{escaped}'", f"inpoint {start}", f"outpoint {end}"]
+    return "\n".join(lines) + "\n"
+
+
+def build_cut_plan(segments: List[Segment], duration: float, source_name: str,
+                   fps: Optional[float] = None, has_video: bool = True) -> dict:
+    """Plan de corte (tramos conservados y eliminados) sin renderizar nada."""
+    removed = silence_periods(segments, duration)
+    kept_duration = sum(end - start for start, end in segments)
+    edl_fps = int(round(fps)) if fps else EDL_DEFAULT_FPS
+    return {
+        "source": source_name,
+        "duration": round(duration, 3),
+        "kept_duration": round(kept_duration, 3),
+        "removed_duration": round(duration - kept_duration, 3),
+        "kept": _describe(segments),
+        "removed": _describe(removed),
+        "edl": build_edl(segments, source_name, edl_fps, has_video),
+        "concat": build_concat_list(segments, source_name),
+    }
@@ -0,0 +1,151 @@
+import os
+import shutil
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """
+    Almacén en disco de entradas `<clave>.<tipo>` con presupuesto de bytes:
+    la expulsión es LRU por mtime (se actualiza en cada lectura) hasta quedar
+    por debajo de `max_bytes`. Cuenta aciertos, fallos y expulsiones.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _entry_path(self, key: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{key}.{kind}")
+
+    def _tmp_path(self, entry: str) -> str:
+        return f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    # --- entradas en memoria ---
+
+    def read_entry(self, key: str, kind: str, count: bool = True) -> Optional[bytes]:
+        """Contenido de la entrada o None; con `count=False` no suma a aciertos/fallos."""
+        if not self.enabled:
+            return None
+        entry = self._entry_path(key, kind)
+        try:
+            with open(entry, "rb") as f:
+                data = f.read()
+            os.utime(entry)
+        except OSError:
+            if count:
+                self.misses += 1
+            return None
+        if count:
+            self.hits += 1
+        return data
+
+    def write_entry(self, key: str, kind: str, data: bytes):
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entry = self._entry_path(key, kind)
+        tmp = self._tmp_path(entry)
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, entry)
+        except OSError as e:
+            logger.warning(f"No se pudo escribir en la caché {entry}: {e}")
+            return
+        self._added(len(data))
+
+    # --- entradas como ficheros (sin cargarlas en memoria) ---
+
+    def fetch_file(self, key: str, kind: str, dest: str) -> bool:
+        """Copia la entrada a `dest`; False si no está."""
+        if not self.enabled:
+            return False
+        entry = self._entry_path(key, kind)
+        try:
+            shutil.copyfile(entry, dest)
+            os.utime(entry)
+        except OSError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def store_file(self, key: str, kind: str, source: str):
+        if not self.enabled:
+            return
+        size = os.path.getsize(source)
+        # Una sola entrada que no cabe vaciaría la caché para nada
+        if size > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entry = self._entry_path(key, kind)
+        tmp = self._tmp_path(entry)
+        try:
+            shutil.copyfile(source, tmp)
+            os.replace(tmp, entry)
+        except OSError as e:
+            logger.warning(f"No se pudo escribir en la caché {entry}: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._added(size)
+
+    # --- expulsión ---
+
+    def _added(self, size: int):
+        with self._lock:
+            self._size = (self._size if self._size is not None else self._scan_size()) + size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        try:
+            with os.scandir(self.directory) as it:
+                return [e for e in it if e.is_file() and not e.name.endswith(".tmp")]
+        except FileNotFoundError:
+            return []
+
+    def _scan_size(self) -> int:
+        return sum(e.stat().st_size for e in self._entries())
+
+    def _evict(self):
+        """Borra las entradas usadas hace más tiempo hasta bajar al 90% del límite."""
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        size = sum(e.stat().st_size for e in entries)
+        target = int(self.max_bytes * 0.9)
+        for entry in entries:
+            if size <= target:
+                break
+            try:
+                entry_size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            size -= entry_size
+            self.evicted += 1
+        self._size = size
+
+    def stats(self) -> dict:
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            return {
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted": self.evicted,
+            }
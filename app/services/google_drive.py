@@ -1,9 +1,12 @@
 import os
 import io
 import logging
+import threading
+import httplib2
 from typing import Optional
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
@@ -17,6 +20,22 @@ class GoogleDriveService:
     def __init__(self):
         self.creds: Optional[Credentials] = None
         self.service = None
+        # httplib2 no es thread-safe: un transporte por hilo sobre las mismas credenciales
+        self._local = threading.local()
+        self._auth_lock = threading.Lock()
+
+    def _http(self) -> AuthorizedHttp:
+        http = getattr(self._local, "http", None)
+        if http is None or http.credentials is not self.creds:
+            http = AuthorizedHttp(self.creds, http=httplib2.Http())
+            self._local.http = http
+        return http
+
+    def _ensure_service(self):
+        with self._auth_lock:
+            if not self.service:
+                logger.info("Service not initialized, authenticating...")
+                self.authenticate()
         
     def authenticate(self):
         """
@@ -79,9 +98,7 @@ class GoogleDriveService:
             Dict con drive_url y file_id
         """
         # Autenticar automáticamente si no está autenticado
-        if not self.service:
-            logger.info("Service not initialized, authenticating...")
-            self.authenticate()
+        self._ensure_service()
         
         # Usar folder_id proporcionado o el ID por defecto de settings
         target_folder_id = folder_id or settings.GOOGLE_DRIVE_AUDIO_FOLDER_ID
@@ -102,7 +119,7 @@ class GoogleDriveService:
                 body=file_metadata,
                 media_body=media,
                 fields='id'
-            ).execute()
+            ).execute(http=self._http())
             
             file_id = file.get('id')
             logger.info(f"File uploaded successfully with ID: {file_id}")
@@ -111,7 +128,7 @@ class GoogleDriveService:
             self.service.permissions().create(
                 fileId=file_id,
                 body={'type': 'anyone', 'role': 'reader'}
-            ).execute()
+            ).execute(http=self._http())
             
             # Retornar enlace público
             return {
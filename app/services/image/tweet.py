@@ -1,11 +1,18 @@
 import ffmpeg
 import os
 import uuid
+import asyncio
 import logging
 from dataclasses import replace
+from functools import lru_cache, partial
 from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+from fontTools.ttLib import TTFont
 from app.core.video_styles import TextStyle
-from app.core.config import BASE_DIR
+from app.core.config import BASE_DIR, settings
+from app.utils.ffmpeg_runner import run_stream, run_parallel
+from app.utils.job_control import register_scratch
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +21,8 @@ BACKGROUND_PATH = str(ASSETS_DIR / "background.png")
 AVATAR_PATH = str(ASSETS_DIR / "avatar.png")
 VERIFIED_PATH = str(ASSETS_DIR / "verified.png")
 FONTS_DIR = str(BASE_DIR / "app" / "assets" / "fonts")
+FONT_REGULAR_PATH = os.path.join(FONTS_DIR, "Poppins-Regular.ttf")
+FONT_BOLD_PATH = os.path.join(FONTS_DIR, "Poppins-Bold.ttf")
 
 CANVAS_WIDTH = 1080
 CANVAS_HEIGHT = 1080
@@ -69,6 +78,10 @@ MAIN_TEXT_MARGIN_L = 120
 MAIN_TEXT_MARGIN_R = 100
 MAIN_TEXT_MARGIN_V = 500
 
+BACKGROUND_OPACITY = 0.75
+USERNAME = "Adevsays"
+HANDLE = "@a_dev_says"
+
 
 def _generate_tweet_ass(output_path: str, text: str) -> str:
     sanitized = text.replace("\n", "\\N").replace("\r", "")
@@ -108,8 +121,8 @@ def _generate_tweet_ass(output_path: str, text: str) -> str:
         "",
         "[Events]",
         "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
-        f"Dialogue: 0,0:00:00.00,0:00:01.00,Username,,0,0,0,,{{\\pos({username.pos_x},{username.pos_y})}}Adevsays",
-        f"Dialogue: 0,0:00:00.00,0:00:01.00,Handle,,0,0,0,,{{\\pos({handle.pos_x},{handle.pos_y})}}@a_dev_says",
+        f"Dialogue: 0,0:00:00.00,0:00:01.00,Username,,0,0,0,,{{\\pos({username.pos_x},{username.pos_y})}}{USERNAME}",
+        f"Dialogue: 0,0:00:00.00,0:00:01.00,Handle,,0,0,0,,{{\\pos({handle.pos_x},{handle.pos_y})}}{HANDLE}",
         f"Dialogue: 0,0:00:00.00,0:00:01.00,MainText,,0,0,0,,{sanitized}",
     ]
 
@@ -138,13 +151,19 @@ def _build_badge_stream():
     )
 
 
-def generate_tweet_image(text: str) -> str:
+async def generate_tweet_image_ffmpeg(text: str) -> str:
+    """
+    Motor anterior: un grafo de ffmpeg completo por imagen (lienzo lavfi,
+    fondo, máscara circular con geq y libass). Se conserva como referencia
+    visual y para scripts/bench_tweet_renderer.py.
+    """
     os.makedirs("temp", exist_ok=True)
     os.makedirs("resultado", exist_ok=True)
 
     unique_id = uuid.uuid4().hex[:8]
     ass_path = os.path.abspath(os.path.join("temp", f"tweet_{unique_id}.ass"))
     output_path = os.path.abspath(os.path.join("resultado", f"tweet_{unique_id}.png"))
+    register_scratch(ass_path, output_path)
 
     try:
         _generate_tweet_ass(ass_path, text)
@@ -163,11 +182,7 @@ def generate_tweet_image(text: str) -> str:
         composed = composed.overlay(_build_badge_stream(), x=BADGE_X, y=BADGE_Y)
         composed = composed.filter('ass', filename=ass_rel_path, fontsdir=FONTS_DIR)
 
-        (
-            ffmpeg.output(composed, output_path, vframes=1)
-            .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True)
-        )
+        await run_stream(ffmpeg.output(composed, output_path, vframes=1).overwrite_output())
 
         return output_path
 
@@ -184,3 +199,261 @@ def generate_tweet_image(text: str) -> str:
                 os.remove(ass_path)
             except OSError:
                 pass
+
+
+def _ass_color(color: str) -> tuple:
+    """&HAABBGGRR de ASS a RGB."""
+    value = int(color.replace("&H", ""), 16)
+    return (value & 0xFF, (value >> 8) & 0xFF, (value >> 16) & 0xFF)
+
+
+@lru_cache(maxsize=None)
+def _font(path: str, ass_size: int) -> ImageFont.FreeTypeFont:
+    """
+    Fuente equivalente a un Fontsize de ASS: libass escala la fuente para que
+    ascendente + descendente midan `ass_size` píxeles, no el em como Pillow.
+    Usa las mismas métricas que libass (usWinAscent/usWinDescent de OS/2 o,
+    si no hay, las de hhea) y un tamaño fraccionario, sin redondear.
+    """
+    path = _installed_font(path)
+    with TTFont(path, lazy=True) as font:
+        os2 = font["OS/2"] if "OS/2" in font else None
+        if os2 is not None and os2.usWinAscent + os2.usWinDescent:
+            height = os2.usWinAscent + os2.usWinDescent
+        else:
+            height = font["hhea"].ascent - font["hhea"].descent
+        units_per_em = font["head"].unitsPerEm
+    return ImageFont.truetype(path, max(1.0, ass_size * units_per_em / height),
+                              layout_engine=ImageFont.Layout.BASIC)
+
+
+@lru_cache(maxsize=1)
+def _fallback_paths() -> Tuple[str, ...]:
+    """Cadena de fuentes de reserva (TWEET_FALLBACK_FONTS) que existen en esta máquina."""
+    paths = []
+    for path in (p.strip() for p in settings.TWEET_FALLBACK_FONTS.split(",")):
+        if not path:
+            continue
+        if os.path.exists(path):
+            paths.append(path)
+        else:
+            logger.warning(f"Fuente de reserva no encontrada: {path}")
+    return tuple(paths)
+
+
+@lru_cache(maxsize=None)
+def _installed_font(path: str) -> str:
+    """
+    `path` si existe y si no la primera fuente de reserva. Poppins solo se
+    descarga en la imagen de Docker; fuera de ella libass tiraba de
+    fontconfig y aquí se usa la cadena de reserva.
+    """
+    if os.path.exists(path):
+        return path
+    fallback = next(iter(_fallback_paths()), None)
+    if fallback is None:
+        return path
+    logger.warning(f"Fuente no encontrada: {path}; se usa {fallback}")
+    return fallback
+
+
+@lru_cache(maxsize=None)
+def _charset(path: str) -> frozenset:
+    """Códigos de carácter que la fuente dibuja (su tabla cmap)."""
+    with TTFont(_installed_font(path), lazy=True) as font:
+        return frozenset(font.getBestCmap() or ())
+
+
+@lru_cache(maxsize=65536)
+def _font_path_for(char: str, path: str) -> str:
+    """
+    Fuente con la que se dibuja `char`: la pedida si lo tiene y si no la
+    primera de reserva que lo tenga, como hacía libass a través de fontconfig.
+    Si ninguna lo tiene se queda la pedida (recuadro vacío, como libass).
+    """
+    if char.isspace() or ord(char) in _charset(path):
+        return path
+    return next((fallback for fallback in _fallback_paths() if ord(char) in _charset(fallback)), path)
+
+
+@lru_cache(maxsize=4096)
+def _glyph(font: ImageFont.FreeTypeFont, char: str) -> Optional[Tuple[Image.Image, int, int]]:
+    """Máscara del carácter y su desplazamiento respecto al origen en la línea base (None si no tiene tinta)."""
+    left, top, right, bottom = font.getbbox(char, anchor="ls")
+    if right <= left or bottom <= top:
+        return None
+    mask = Image.new("L", (right - left, bottom - top), 0)
+    ImageDraw.Draw(mask).text((-left, -top), char, font=font, fill=255, anchor="ls")
+    return mask, left, top
+
+
+@lru_cache(maxsize=65536)
+def _advance(font: ImageFont.FreeTypeFont, char: str, following: str) -> float:
+    """Avance de `char` cuando le sigue `following`, con el kerning del par incluido."""
+    if not following:
+        return font.getlength(char)
+    return font.getlength(char + following) - font.getlength(following)
+
+
+def _glyphs(text: str, path: str, ass_size: int):
+    """
+    (fuente, carácter, siguiente) de cada carácter de `text`, con la fuente
+    de reserva donde haga falta. El kerning solo se aplica entre caracteres
+    de la misma fuente.
+    """
+    fonts = [_font(_font_path_for(char, path), ass_size) for char in text]
+    for index, (char, font) in enumerate(zip(text, fonts)):
+        following = text[index + 1] if index + 1 < len(text) and fonts[index + 1] is font else ""
+        yield font, char, following
+
+
+def _text_width(text: str, path: str, ass_size: int) -> float:
+    return sum(_advance(font, char, following) for font, char, following in _glyphs(text, path, ass_size))
+
+
+def _draw_line(draw: ImageDraw.ImageDraw, path: str, ass_size: int, x: float, baseline: int,
+               text: str, fill: tuple):
+    """
+    Dibuja la línea pegando máscaras de glifo cacheadas: rasterizar con
+    FreeType es lo caro y el texto de los tweets repite casi siempre los
+    mismos caracteres.
+    """
+    for font, char, following in _glyphs(text, path, ass_size):
+        glyph = _glyph(font, char)
+        if glyph:
+            mask, left, top = glyph
+            draw.bitmap((round(x) + left, baseline + top), mask, fill=fill)
+        x += _advance(font, char, following)
+
+
+def _draw_text(draw: ImageDraw.ImageDraw, style: TextStyle, path: str, text: str):
+    style.prepare_for_video(CANVAS_WIDTH, CANVAS_HEIGHT)
+    # Alineación 7 con \pos: la esquina superior izquierda de la línea está en (pos_x, pos_y)
+    draw.text((style.pos_x, style.pos_y), text, font=_font(path, style.font_size),
+              fill=_ass_color(style.primary_color), anchor="la")
+
+
+@lru_cache(maxsize=1)
+def _base_layer() -> Image.Image:
+    """
+    Todo lo que no depende del texto (fondo atenuado, avatar circular, insignia,
+    nombre y usuario), compuesto una sola vez por proceso.
+    """
+    base = Image.new("RGBA", (CANVAS_WIDTH, CANVAS_HEIGHT), (0, 0, 0, 255))
+
+    with Image.open(BACKGROUND_PATH) as background:
+        background = background.convert("RGBA").resize((CANVAS_WIDTH, CANVAS_HEIGHT), Image.BICUBIC)
+    alpha = background.getchannel("A").point(lambda value: round(value * BACKGROUND_OPACITY))
+    background.putalpha(alpha)
+    base.alpha_composite(background)
+
+    with Image.open(AVATAR_PATH) as avatar:
+        avatar = avatar.convert("RGBA")
+    side = min(avatar.size)
+    left, top = (avatar.width - side) // 2, (avatar.height - side) // 2
+    avatar = avatar.crop((left, top, left + side, top + side)).resize((AVATAR_SIZE, AVATAR_SIZE), Image.BICUBIC)
+    mask = Image.new("L", avatar.size, 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, AVATAR_SIZE - 1, AVATAR_SIZE - 1), fill=255)
+    avatar.putalpha(ImageChops.multiply(avatar.getchannel("A"), mask))
+    base.alpha_composite(avatar, (AVATAR_X, AVATAR_Y))
+
+    with Image.open(VERIFIED_PATH) as badge:
+        badge = badge.convert("RGBA").resize((BADGE_SIZE, BADGE_SIZE), Image.BICUBIC)
+    base.alpha_composite(badge, (BADGE_X, BADGE_Y))
+
+    draw = ImageDraw.Draw(base)
+    _draw_text(draw, replace(_USERNAME_STYLE), FONT_BOLD_PATH, USERNAME)
+    _draw_text(draw, replace(_HANDLE_STYLE), FONT_REGULAR_PATH, HANDLE)
+
+    return base.convert("RGB")
+
+
+def _rebalance(lines: List[List[str]], measure: Callable[[str], float], width: float):
+    """
+    Equilibra las líneas de un párrafo como libass con `WrapStyle: 0`: pasa
+    la última palabra de una línea a la siguiente si eso acerca sus anchos (y
+    la siguiente sigue cabiendo en `width`), recorriendo todas las parejas
+    de líneas hasta que ya no se mueve ninguna.
+    """
+    moved = True
+    while moved:
+        moved = False
+        for upper, lower in zip(lines, lines[1:]):
+            if len(upper) < 2:
+                continue
+            before = abs(measure(" ".join(upper)) - measure(" ".join(lower)))
+            lower_width = measure(" ".join([upper[-1], *lower]))
+            if lower_width <= width and abs(measure(" ".join(upper[:-1])) - lower_width) < before:
+                lower.insert(0, upper.pop())
+                moved = True
+
+
+def _wrap(text: str, measure: Callable[[str], float], width: float) -> List[str]:
+    """
+    Salto de línea por palabras dentro de `width` píxeles, respetando los
+    saltos del texto: primero se llena cada línea y después se equilibran
+    (`_rebalance`), así un párrafo de dos líneas no deja una palabra sola.
+    """
+    lines = []
+    for paragraph in text.replace("\r", "").split("\n"):
+        paragraph_lines: List[List[str]] = [[]]
+        for word in paragraph.split(" "):
+            line = paragraph_lines[-1]
+            if line and measure(" ".join([*line, word])) > width:
+                paragraph_lines.append([word])
+            else:
+                line.append(word)
+        _rebalance(paragraph_lines, measure, width)
+        lines += [" ".join(line) for line in paragraph_lines]
+    return lines
+
+
+def render_tweet(text: str, output_path: str) -> str:
+    """Copia la capa base y dibuja solo el texto principal. Sin subprocesos."""
+    image = _base_layer().copy()
+    style = replace(_MAIN_TEXT_STYLE)
+    style.prepare_for_video(CANVAS_WIDTH, CANVAS_HEIGHT)
+    ascent, descent = _font(FONT_REGULAR_PATH, style.font_size).getmetrics()
+
+    draw = ImageDraw.Draw(image)
+    fill = _ass_color(style.primary_color)
+    measure = partial(_text_width, path=FONT_REGULAR_PATH, ass_size=style.font_size)
+    # Alineación 7: la primera línea empieza en los márgenes izquierdo y vertical
+    baseline = MAIN_TEXT_MARGIN_V + ascent
+    for line in _wrap(text, measure, CANVAS_WIDTH - MAIN_TEXT_MARGIN_L - MAIN_TEXT_MARGIN_R):
+        _draw_line(draw, FONT_REGULAR_PATH, style.font_size, MAIN_TEXT_MARGIN_L, baseline, line, fill)
+        baseline += ascent + descent
+
+    # compress_level bajo: el PNG se sube tal cual y zlib al máximo domina el tiempo
+    image.save(output_path, format="PNG", compress_level=1)
+    return output_path
+
+
+def preload_base_layer():
+    """Compone la capa base al arrancar para que la primera petición no pague el coste."""
+    try:
+        _base_layer()
+    except OSError as e:
+        logger.warning(f"Could not preload tweet base layer: {e}")
+
+
+async def generate_tweet_image(text: str) -> str:
+    os.makedirs("resultado", exist_ok=True)
+    output_path = os.path.abspath(os.path.join("resultado", f"tweet_{uuid.uuid4().hex[:8]}.png"))
+    register_scratch(output_path)
+    try:
+        return await asyncio.to_thread(render_tweet, text, output_path)
+    except Exception as e:
+        logger.error(f"Error in generate_tweet_image: {e}")
+        raise
+
+
+async def generate_tweet_images(texts: List[str]) -> List[str]:
+    """
+    Varias imágenes a la vez, como mucho TWEET_BATCH_WORKERS en paralelo.
+    Solo la compresión del PNG suelta el GIL: los glifos se dibujan uno a uno
+    en Python, así que más hilos apenas aceleran y le quitan tiempo al bucle
+    de eventos. Devuelve las rutas en el orden de `texts`.
+    """
+    workers = settings.TWEET_BATCH_WORKERS or os.cpu_count() or 1
+    return await run_parallel([lambda text=text: generate_tweet_image(text) for text in texts], workers)
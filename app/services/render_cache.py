@@ -0,0 +1,202 @@
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+import logging
+import dataclasses
+from enum import Enum
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from app.core.config import settings, BASE_DIR
+from app.services.disk_cache import DiskCache
+from app.services.analysis_cache import analysis_cache
+from app.services.task_manager import task_manager
+
+logger = logging.getLogger(__name__)
+
+# Código y recursos que determinan el resultado de un render
+_CODE_DIRS = ("app/services", "app/core", "app/utils", "app/assets")
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """
+    Hash de las fuentes y recursos de render: cualquier cambio de código
+    invalida las entradas anteriores sin tener que versionarlas a mano.
+    """
+    hasher = hashlib.sha256()
+    for directory in _CODE_DIRS:
+        for path in sorted((BASE_DIR / directory).rglob("*")):
+            if path.is_file() and "__pycache__" not in path.parts:
+                hasher.update(str(path.relative_to(BASE_DIR)).encode("utf-8"))
+                hasher.update(path.read_bytes())
+    return hasher.hexdigest()[:16]
+
+
+def _normalize(value: Any) -> Any:
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Path):
+        return str(value)
+    raise TypeError(f"No se puede normalizar {type(value).__name__} para la clave de caché")
+
+
+class RenderCache(DiskCache):
+    """
+    Caché de renders completos: la salida (`<clave>.<extensión>`) y, por
+    separado, el resultado de la subida a Drive (`<clave>.drive.json`), de modo
+    que un reintento idéntico no vuelve a codificar ni a subir.
+
+    La clave combina el hash del contenido de la entrada (el de la subida, ver
+    app.utils.uploads), la operación, sus parámetros normalizados
+    (dataclasses y enums incluidos) y la versión del código.
+
+    `hits`/`misses` cuentan las búsquedas de salidas; las de subidas a Drive
+    van aparte en `upload_hits`/`upload_misses`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        super().__init__(directory, max_bytes)
+        self.upload_hits = 0
+        self.upload_misses = 0
+
+    def key(self, operation: str, input_path: Optional[str], params: dict) -> Optional[str]:
+        """Clave del render o None si no se puede cachear (entrada de contenido desconocido)."""
+        if not self.enabled:
+            return None
+        digest = ""
+        if input_path is not None:
+            digest = analysis_cache.digest_for(input_path)
+            if digest is None:
+                return None
+        payload = json.dumps(
+            {"operation": operation, "input": digest, "params": params, "code": code_version()},
+            sort_keys=True, default=_normalize,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def restore(self, key: str, extension: str, dest: Optional[str] = None) -> Optional[str]:
+        """Copia la salida guardada a `dest` (o a un temporal nuevo); None si no está."""
+        if dest is None:
+            os.makedirs(settings.TEMP_DIR, exist_ok=True)
+            dest = os.path.join(settings.TEMP_DIR, f"cached_{uuid.uuid4().hex[:8]}{extension}")
+        return dest if self.fetch_file(key, extension.lstrip("."), dest) else None
+
+    def store(self, key: str, extension: str, path: str):
+        self.store_file(key, extension.lstrip("."), path)
+
+    def get_upload(self, key: str) -> Optional[dict]:
+        data = self.read_entry(key, "drive.json", count=False)
+        if data is None:
+            self.upload_misses += 1
+            return None
+        self.upload_hits += 1
+        return json.loads(data)
+
+    def put_upload(self, key: str, value: dict):
+        self.write_entry(key, "drive.json", json.dumps(value).encode("utf-8"))
+
+    def stats(self) -> dict:
+        return {**super().stats(), "upload_hits": self.upload_hits, "upload_misses": self.upload_misses}
+
+
+render_cache = RenderCache(
+    directory=settings.RENDER_CACHE_DIR,
+    max_bytes=settings.RENDER_CACHE_MAX_BYTES,
+)
+
+
+def _complete(task_id: str):
+    task_manager.update_task_porcentage(task_id, 100)
+    task_manager.update_task_status(task_id, True)
+
+
+async def mark_cached(task_id: str):
+    """Da por completada una tarea servida desde la caché (no pasa por el planificador)."""
+    # El almacén puede hacer E/S (sqlite): fuera del event loop
+    await asyncio.to_thread(_complete, task_id)
+
+
+CACHED_TIMINGS = {"queued_seconds": 0.0, "processing_seconds": 0.0, "cached": True}
+
+# Renders y subidas en curso por clave: una petición idéntica (p.ej. un
+# reintento de n8n) espera a que termine la primera en lugar de repetirla
+_rendering: Dict[str, asyncio.Future] = {}
+_uploading: Dict[str, asyncio.Future] = {}
+
+
+async def _lookup_or_claim(in_flight: Dict[str, asyncio.Future], key: str, lookup: Callable[[], Any]) -> Any:
+    """
+    Busca en la caché (en un hilo); si no está y otra petición ya trabaja en
+    la misma clave, espera a que acabe (bien o mal) y vuelve a mirar. Si no
+    está ni en curso, reclama la clave y devuelve None: quien la reclama debe
+    liberarla con `_release`.
+    """
+    while True:
+        found = await asyncio.to_thread(lookup)
+        if found is not None:
+            return found
+        pending = in_flight.get(key)
+        if pending is None:
+            in_flight[key] = asyncio.get_running_loop().create_future()
+            return None
+        logger.info(f"Trabajo idéntico en curso ({key[:12]}); se espera a su resultado")
+        # asyncio.wait no propaga el error ni la cancelación del trabajo ajeno
+        await asyncio.wait([pending])
+
+
+def _release(in_flight: Dict[str, asyncio.Future], key: str):
+    pending = in_flight.pop(key, None)
+    if pending is not None and not pending.done():
+        pending.set_result(None)
+
+
+async def submit_cached(lane, task_id: str, key: Optional[str], extension: str,
+                        func: Callable[..., Awaitable[str]], *args) -> Tuple[str, dict]:
+    """
+    Como `lane.submit(task_id, func, *args)` pero sirviendo la salida desde la
+    caché si ya se renderizó; en un acierto no se hace cola. Si el mismo render
+    está en marcha se espera a que acabe y se sirve su salida desde la caché.
+    Devuelve (ruta de salida, tiempos).
+    """
+    if not key:
+        future = lane.submit(task_id, func, *args)
+        return await future, future.timings()
+
+    cached = await _lookup_or_claim(_rendering, key, lambda: render_cache.restore(key, extension))
+    if cached:
+        logger.info(f"Render servido desde caché para la tarea {task_id}")
+        await mark_cached(task_id)
+        return cached, dict(CACHED_TIMINGS)
+
+    try:
+        future = lane.submit(task_id, func, *args)
+        output = await future
+        await asyncio.to_thread(render_cache.store, key, extension, output)
+    finally:
+        _release(_rendering, key)
+    return output, future.timings()
+
+
+async def upload_cached(key: Optional[str], upload: Callable[..., dict], *args, **kwargs) -> dict:
+    """
+    Sube con `upload` (bloqueante, en un hilo) salvo que el mismo render ya
+    esté en Drive; si se está subiendo, espera a esa subida y usa su resultado.
+    """
+    if not key:
+        return await asyncio.to_thread(upload, *args, **kwargs)
+
+    cached = await _lookup_or_claim(_uploading, key, lambda: render_cache.get_upload(key))
+    if cached:
+        return cached
+
+    try:
+        drive_data = await asyncio.to_thread(upload, *args, **kwargs)
+        await asyncio.to_thread(render_cache.put_upload, key, drive_data)
+    finally:
+        _release(_uploading, key)
+    return drive_data
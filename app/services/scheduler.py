@@ -0,0 +1,256 @@
+import os
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+from app.core.config import settings
+from app.utils.process_wrapper import ProcessWrapper
+from app.utils import job_control
+from app.utils.job_control import current_thread_budget, JobCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class JobFuture(asyncio.Future):
+    """Future de un trabajo con los tiempos de cola y de ejecución."""
+
+    def __init__(self):
+        super().__init__()
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def timings(self) -> dict:
+        started = self.started_at or time.time()
+        finished = self.finished_at or time.time()
+        return {
+            "queued_seconds": round(started - self.submitted_at, 3),
+            "processing_seconds": round(finished - started, 3) if self.started_at else 0.0,
+        }
+
+
+def _consume_exception(future: asyncio.Future):
+    # Evita "exception was never retrieved" si el cliente se desconecta sin esperar
+    if not future.cancelled():
+        future.exception()
+
+
+class SchedulerFull(Exception):
+    """La cola del planificador alcanzó `max_queued` trabajos en espera."""
+
+    def __init__(self, name: str, limit: int):
+        super().__init__(f"Scheduler '{name}' queue is full ({limit} jobs waiting)")
+        self.name = name
+        self.limit = limit
+
+
+class Job:
+    def __init__(self, task_id: str, func: Callable[..., Awaitable], args: tuple, kwargs: dict):
+        self.task_id = task_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = JobFuture()
+        self.future.add_done_callback(_consume_exception)
+        self.runner: Optional[asyncio.Task] = None
+
+
+class JobScheduler:
+    """
+    Planificador único para todo el trabajo de ffmpeg.
+
+    Un número fijo de workers (tareas asyncio del event loop) consume una cola
+    FIFO; cada trabajo es una corrutina que lanza sus ffmpeg con
+    app.utils.ffmpeg_runner y recibe un presupuesto de hilos
+    (`threads_per_job`) para que la suma de hilos de los ffmpeg en marcha se
+    aproxime al número de núcleos. Con `max_queued` la cola está acotada y
+    `submit` rechaza (SchedulerFull) en lugar de acumular esperas.
+    """
+
+    def __init__(self, workers: int, threads_per_job: int, name: str = "job", max_queued: int = 0):
+        self.name = name
+        self.workers = workers
+        self.threads_per_job = threads_per_job
+        self.max_queued = max_queued
+        self._queue: Deque[Job] = deque()
+        self._running: Dict[str, Job] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._closing = False
+
+    def _ensure_workers(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"{self.name}-worker-{i}"))
+        logger.info(f"Scheduler '{self.name}' started: {self.workers} workers x {self.threads_per_job} threads")
+
+    async def _worker(self):
+        while True:
+            while not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            job = self._queue.popleft()
+            self._running[job.task_id] = job
+            try:
+                await self._execute(job)
+            finally:
+                self._running.pop(job.task_id, None)
+
+    async def _execute(self, job: Job):
+        job.future.started_at = time.time()
+        token = current_thread_budget.set(self.threads_per_job)
+        try:
+            # Cancelada en otro worker mientras estaba en cola
+            job_control.check_cancelled(job.task_id)
+            job.runner = asyncio.create_task(
+                ProcessWrapper.run(job.task_id, job.func, *job.args, **job.kwargs)
+            )
+            result = await job.runner
+            job.future.finished_at = time.time()
+            if not job.future.done():
+                job.future.set_result(result)
+        except asyncio.CancelledError:
+            job.future.finished_at = time.time()
+            if not job.future.done():
+                job.future.set_exception(JobCancelled(job.task_id))
+            # El propio worker se está apagando
+            if self._closing:
+                raise
+        except Exception as e:
+            job.future.finished_at = time.time()
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            current_thread_budget.reset(token)
+            if job_control.is_cancelled(job.task_id):
+                job_control.cleanup_scratch(job.task_id)
+            job_control.finish(job.task_id)
+
+    def submit(self, task_id: str, func: Callable[..., Awaitable], *args, **kwargs) -> JobFuture:
+        """
+        Encola la corrutina `func` como trabajo de la tarea; el progreso y
+        estado se vuelcan en ella. Debe llamarse desde el event loop. Lanza
+        SchedulerFull si la cola está llena.
+        """
+        if self.is_full():
+            raise SchedulerFull(self.name, self.max_queued)
+        self._ensure_workers()
+        job = Job(task_id, func, args, kwargs)
+        self._queue.append(job)
+        self._wakeup.set()
+        logger.info(f"Job queued for task {task_id} in '{self.name}' (position {len(self._queue)})")
+        return job.future
+
+    def is_full(self) -> bool:
+        return bool(self.max_queued) and len(self._queue) >= self.max_queued
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        Cancela el trabajo de la tarea: si está en cola se descarta; si está en
+        marcha se matan sus ffmpeg y se cancela su corrutina. Los temporales
+        registrados se borran en cuanto el trabajo deja de ejecutarse.
+        Devuelve False si no lo conoce.
+        """
+        queued = next((job for job in self._queue if job.task_id == task_id), None)
+        if queued is not None:
+            self._queue.remove(queued)
+        running = self._running.get(task_id)
+
+        job_control.cancel(task_id)
+
+        if queued is not None:
+            queued.future.finished_at = time.time()
+            queued.future.set_exception(JobCancelled(task_id))
+            job_control.cleanup_scratch(task_id)
+            job_control.finish(task_id)
+            logger.info(f"Queued job for task {task_id} dropped")
+            return True
+
+        if running is not None:
+            if running.runner is not None:
+                running.runner.cancel()
+            logger.info(f"Running job for task {task_id} cancelled")
+            return True
+
+        job_control.finish(task_id)
+        return False
+
+    def queue_position(self, task_id: str) -> Optional[int]:
+        """1..N si la tarea está en cola, 0 si se está ejecutando, None si no está en el planificador."""
+        if task_id in self._running:
+            return 0
+        for position, job in enumerate(self._queue, start=1):
+            if job.task_id == task_id:
+                return position
+        return None
+
+    async def shutdown(self):
+        """
+        Cancela los trabajos en marcha y descarta los que esperan en cola: sus
+        futures terminan con JobCancelled para que nadie se quede esperando
+        un `submit` que ya no se va a ejecutar.
+        """
+        self._closing = True
+        while self._queue:
+            job = self._queue.popleft()
+            job.future.finished_at = time.time()
+            if not job.future.done():
+                job.future.set_exception(JobCancelled(job.task_id))
+            job_control.cleanup_scratch(job.task_id)
+            job_control.finish(job.task_id)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._closing = False
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "threads_per_job": self.threads_per_job,
+            "running": len(self._running),
+            "queued": len(self._queue),
+            "max_queued": self.max_queued,
+        }
+
+
+def _main_cpus() -> int:
+    """Núcleos del carril principal: los hilos de las previsualizaciones se reservan aparte."""
+    cpus = os.cpu_count() or 1
+    return max(1, cpus - settings.PREVIEW_WORKERS * settings.PREVIEW_THREADS_PER_JOB)
+
+
+def _default_workers() -> int:
+    return settings.SCHEDULER_WORKERS or max(1, _main_cpus() // 4)
+
+
+def _default_threads_per_job(workers: int) -> int:
+    return settings.SCHEDULER_THREADS_PER_JOB or max(1, _main_cpus() // workers)
+
+
+_workers = _default_workers()
+
+scheduler = JobScheduler(
+    workers=_workers,
+    threads_per_job=_default_threads_per_job(_workers),
+)
+
+# Carril aparte para previsualizaciones: cola corta y acotada con sus propios
+# workers e hilos (descontados del principal), así no esperan detrás de los
+# renders completos ni les quitan CPU
+preview_scheduler = JobScheduler(
+    workers=settings.PREVIEW_WORKERS,
+    threads_per_job=settings.PREVIEW_THREADS_PER_JOB,
+    name="preview",
+    max_queued=settings.PREVIEW_QUEUE_SIZE,
+)
+
+
+def scheduler_for(task_id: str) -> JobScheduler:
+    """Planificador que tiene el trabajo de la tarea (el principal si no está en ninguno)."""
+    if preview_scheduler.queue_position(task_id) is not None:
+        return preview_scheduler
+    return scheduler
@@ -0,0 +1,151 @@
+from typing import List, Optional, Tuple
+
+Segment = Tuple[float, float]
+
+# Muestras por bloque de aselect cuando no hay rejilla de frames (solo audio o fps desconocido)
+AUDIO_BLOCK = 1024
+# Si no se pudo leer la frecuencia del audio se remuestrea a esta para conocer la rejilla
+DEFAULT_SAMPLE_RATE = 48000
+
+
+def audio_block_size(sample_rate: int, frame_rate: Optional[float] = None) -> int:
+    """Muestras por bloque de aselect: un frame de video, o AUDIO_BLOCK sin fps."""
+    if frame_rate:
+        return max(1, round(sample_rate / frame_rate))
+    return AUDIO_BLOCK
+
+
+def grid_rate(sample_rate: Optional[int], frame_rate: Optional[float] = None) -> float:
+    """Cortes por segundo de la rejilla común: los frames o, sin fps, los bloques de audio."""
+    if frame_rate:
+        return frame_rate
+    return (sample_rate or DEFAULT_SAMPLE_RATE) / AUDIO_BLOCK
+
+
+def snap_segments(segments: List[Segment], frame_rate: float) -> List[Segment]:
+    """
+    Ajusta los cortes a una rejilla de `frame_rate` cortes por segundo (los
+    frames, o los bloques de audio de `grid_rate`) para que audio y video
+    conserven la misma duración.
+    """
+    snapped = []
+    for start, end in segments:
+        start, end = round(start * frame_rate) / frame_rate, round(end * frame_rate) / frame_rate
+        if end > start:
+            snapped.append((start, end))
+    return snapped
+
+
+def limit_segments(segments: List[Segment], seconds: float) -> List[Segment]:
+    """Primeros segmentos hasta sumar `seconds` de resultado; el último se recorta."""
+    limited = []
+    remaining = seconds
+    for start, end in segments:
+        if remaining <= 0:
+            break
+        end = min(end, start + remaining)
+        limited.append((start, end))
+        remaining -= end - start
+    return limited
+
+
+def select_expression(segments: List[Segment], offset: float = 0.0) -> str:
+    """
+    Expresión para `select`/`aselect` que vale 1 dentro de los segmentos.
+
+    En lugar de sumar un `between()` por segmento (coste lineal por frame) se
+    arma un árbol binario `if(lt(t,corte),izq,der)`: cada frame evalúa
+    O(log n) comparaciones y el grafo tiene siempre dos filtros, sea cual sea
+    el número de segmentos.
+    """
+    segments = [(start - offset, end - offset) for start, end in segments]
+    if not segments:
+        return "0"
+
+    def build(lo: int, hi: int) -> str:
+        if hi - lo == 1:
+            start, end = segments[lo]
+            # Intervalo semiabierto: un frame justo en el corte no se cuenta dos veces
+            return f"gte(t,{start:.6f})*lt(t,{end:.6f})"
+        mid = (lo + hi) // 2
+        return f"if(lt(t,{segments[mid][0]:.6f}),{build(lo, mid)},{build(mid, hi)})"
+
+    return build(0, len(segments))
+
+
+def audio_segments(segments: List[Segment], block: float) -> List[Segment]:
+    """
+    Lleva los segmentos (ya relativos al inicio del audio) a la rejilla de
+    bloques de `block` segundos. Si un bloque no mide exactamente un frame
+    (44100 Hz a 29.97 fps) redondear cada corte por separado acumula error
+    tramo a tramo; aquí el final de cada tramo se elige para que la duración
+    acumulada del audio siga a la del video, así el desfase nunca pasa de
+    medio bloque. Los límites se dan a medio bloque para que el `t` de un
+    bloque nunca caiga justo en un corte.
+    """
+    result = []
+    video_total = 0.0
+    kept = 0
+    previous_end = 0
+    for start, end in segments:
+        video_total += end - start
+        first = max(round(start / block), previous_end)
+        last = max(first, first + round(video_total / block) - kept)
+        kept += last - first
+        previous_end = last
+        if last > first:
+            result.append(((first - 0.5) * block, (last - 0.5) * block))
+    return result
+
+
+def quote(value: str) -> str:
+    """Protege un valor de opción dentro de un grafo (las comas y ':' separan filtros y opciones)."""
+    return "'" + value + "'"
+
+
+def cut_filter_graph(segments: List[Segment], offset: float = 0.0, video: bool = True, audio: bool = True,
+                     video_input: str = "0:v", audio_input: str = "0:a",
+                     frame_rate: Optional[float] = None, video_filter: Optional[str] = None,
+                     sample_rate: Optional[int] = None, source_filter: Optional[str] = None) -> str:
+    """
+    Grafo de corte para `-filter_complex_script`: `select`/`aselect` con la
+    expresión de `select_expression` y timestamps recompactados. Salidas
+    `[vout]` y `[aout]`; `source_filter` va antes del `select` (en tiempos del
+    original) y `video_filter` al final de la cadena de video.
+
+    Los cortes se ajustan a la rejilla de `grid_rate` y el audio se trocea en
+    bloques de un frame (`audio_block_size`) cuyos límites reparte
+    `audio_segments`: con muchos tramos cortos el audio y el video del
+    resultado miden lo mismo. `sample_rate` es la frecuencia del audio de
+    entrada; si no se conoce se remuestrea a DEFAULT_SAMPLE_RATE.
+    """
+    resample = "" if sample_rate else f"aresample={DEFAULT_SAMPLE_RATE},"
+    sample_rate = sample_rate or DEFAULT_SAMPLE_RATE
+    grid = grid_rate(sample_rate, frame_rate)
+    segments = [(start - offset, end - offset) for start, end in snap_segments(segments, grid)]
+    chains = []
+    if video:
+        # Límites a medio frame: el `t` de un frame nunca cae justo en el corte
+        half = 0.5 / grid
+        expression = quote(select_expression([(start - half, end - half) for start, end in segments]))
+        before = f"{source_filter}," if source_filter else ""
+        extra = f",{video_filter}" if video_filter else ""
+        chains.append(f"[{video_input}]{before}select={expression},setpts=N/FRAME_RATE/TB{extra}[vout]")
+    if audio:
+        # aselect decide por bloque, no por muestra: bloques de un frame
+        block = audio_block_size(sample_rate, frame_rate)
+        expression = quote(select_expression(audio_segments(segments, block / sample_rate)))
+        chains.append(f"[{audio_input}]{resample}asetnsamples=n={block}:p=0,aselect={expression},"
+                      f"asetpts=N/SR/TB[aout]")
+    return ";\n".join(chains)
+
+
+def write_cut_graph(path: str, segments: List[Segment], offset: float = 0.0, video: bool = True,
+                    audio: bool = True, video_input: str = "0:v", audio_input: str = "0:a",
+                    frame_rate: Optional[float] = None, video_filter: Optional[str] = None,
+                    sample_rate: Optional[int] = None) -> str:
+    """Escribe el grafo en un fichero para no depender del límite de longitud de la línea de comandos."""
+    with open(path, "w") as f:
+        f.write(cut_filter_graph(segments, offset, video, audio, video_input, audio_input, frame_rate,
+                                 video_filter, sample_rate))
+    return path
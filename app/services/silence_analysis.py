@@ -0,0 +1,182 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import numpy as np
+from app.services.analysis_cache import analysis_cache
+from app.utils.ffmpeg_runner import read_output
+
+logger = logging.getLogger(__name__)
+
+Segment = Tuple[float, float]
+
+
+@dataclass
+class SilenceConfig:
+    sample_rate: int = 16000
+    frame_ms: float = 20.0
+    # Silencios más cortos que esto no se cortan (se funden con la voz)
+    min_silence: float = 0.5
+    # Ráfagas de "voz" más cortas que esto se tratan como ruido
+    min_speech: float = 0.1
+    # Margen que se conserva alrededor de cada tramo de voz
+    padding: float = 0.1
+    # Umbral = suelo de ruido (percentil) + margen, acotado entre min y max
+    noise_percentile: float = 10.0
+    margin_db: float = 12.0
+    min_threshold_db: float = -60.0
+    max_threshold_db: float = -25.0
+    # Umbral fijo en dBFS; si se indica no se estima el suelo de ruido
+    threshold_db: Optional[float] = None
+
+
+VIDEO_CUT = SilenceConfig()
+AUDIO_CUT = SilenceConfig(min_silence=0.1, min_speech=0.05, padding=0.05)
+
+
+class FrameEnergy:
+    """
+    Acumula la energía RMS por ventana a partir de PCM s16le mono que llega
+    por bloques: solo se guarda un float por ventana, no el audio.
+    """
+
+    def __init__(self, sample_rate: int, frame_ms: float):
+        self.sample_rate = sample_rate
+        self.frame_size = max(1, int(sample_rate * frame_ms / 1000))
+        self._pending = b""
+        self._blocks: List[np.ndarray] = []
+        self.samples = 0
+
+    def feed(self, data: bytes) -> float:
+        data = self._pending + data
+        usable = len(data) - len(data) % (2 * self.frame_size)
+        self._pending = data[usable:]
+        if usable:
+            frames = np.frombuffer(data[:usable], dtype="<i2").reshape(-1, self.frame_size)
+            self._blocks.append(self._rms_db(frames))
+            self.samples += usable // 2
+        return self.samples / self.sample_rate
+
+    def finish(self) -> np.ndarray:
+        # Última ventana incompleta, rellenada con ceros
+        if len(self._pending) >= 2:
+            tail = np.frombuffer(self._pending[: len(self._pending) - len(self._pending) % 2], dtype="<i2")
+            frame = np.zeros(self.frame_size, dtype=np.int16)
+            frame[: len(tail)] = tail
+            self._blocks.append(self._rms_db(frame.reshape(1, -1)))
+            self._pending = b""
+        if not self._blocks:
+            return np.empty(0, dtype=np.float32)
+        return np.concatenate(self._blocks)
+
+    @staticmethod
+    def _rms_db(frames: np.ndarray) -> np.ndarray:
+        samples = frames.astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        return (20.0 * np.log10(np.maximum(rms, 1e-10))).astype(np.float32)
+
+
+def estimate_threshold(levels_db: np.ndarray, config: SilenceConfig) -> float:
+    if config.threshold_db is not None:
+        return config.threshold_db
+    if levels_db.size == 0:
+        return config.min_threshold_db
+    noise_floor = float(np.percentile(levels_db, config.noise_percentile))
+    return float(np.clip(noise_floor + config.margin_db, config.min_threshold_db, config.max_threshold_db))
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Índices [inicio, fin) de los tramos consecutivos a True."""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_segments(levels_db: np.ndarray, config: SilenceConfig, duration: Optional[float] = None) -> List[Segment]:
+    """
+    Tramos de voz (en segundos) a partir de la energía por ventana: umbral
+    adaptativo, relleno de silencios cortos, descarte de ráfagas cortas y
+    margen alrededor de cada tramo, fusionando los que se solapan.
+    """
+    frame_seconds = config.frame_ms / 1000
+    total = duration if duration else levels_db.size * frame_seconds
+    if levels_db.size == 0:
+        return [(0.0, total)] if total else []
+
+    speech = levels_db > estimate_threshold(levels_db, config)
+
+    # Silencios interiores más cortos que min_silence pasan a ser voz
+    starts, ends = _runs(~speech)
+    short = (ends - starts) * frame_seconds < config.min_silence
+    interior = (starts > 0) & (ends < speech.size)
+    for start, end in zip(starts[short & interior], ends[short & interior]):
+        speech[start:end] = True
+
+    starts, ends = _runs(speech)
+    keep = (ends - starts) * frame_seconds >= config.min_speech
+    starts, ends = starts[keep], ends[keep]
+    if starts.size == 0:
+        return []
+
+    seg_starts = np.maximum(starts * frame_seconds - config.padding, 0.0)
+    seg_ends = np.minimum(ends * frame_seconds + config.padding, total)
+
+    # Fusiona los tramos que se tocan tras aplicar el margen
+    new_group = np.concatenate(([True], seg_starts[1:] > seg_ends[:-1]))
+    merged_starts = seg_starts[new_group]
+    merged_ends = np.maximum.reduceat(seg_ends, np.flatnonzero(new_group))
+    return [(round(float(s), 3), round(float(e), 3)) for s, e in zip(merged_starts, merged_ends) if e > s]
+
+
+def silence_periods(segments: List[Segment], duration: float) -> List[Segment]:
+    """Complemento de los tramos de voz dentro de [0, duration]."""
+    periods = []
+    cursor = 0.0
+    for start, end in segments:
+        if start > cursor:
+            periods.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < duration:
+        periods.append((cursor, duration))
+    return periods
+
+
+async def analyse_levels(input_file: str, config: SilenceConfig = VIDEO_CUT,
+                         duration: Optional[float] = None) -> np.ndarray:
+    """
+    Decodifica solo el audio (mono, `sample_rate`, s16le) por una tubería y
+    devuelve el nivel RMS en dBFS de cada ventana de `frame_ms`. Los niveles
+    no dependen del umbral, así que se cachean por fichero y resolución.
+    """
+    cache_kind = f"levels-{config.sample_rate}-{config.frame_ms:g}"
+    cached = await asyncio.to_thread(analysis_cache.get_array, input_file, cache_kind)
+    if cached is not None:
+        return cached
+
+    energy = FrameEnergy(config.sample_rate, config.frame_ms)
+    await read_output(
+        [
+            "ffmpeg",
+            "-i", input_file,
+            "-vn", "-sn", "-dn",
+            "-ac", "1",
+            "-ar", str(config.sample_rate),
+            "-f", "s16le",
+            "-acodec", "pcm_s16le",
+            "pipe:1",
+        ],
+        energy.feed,
+        duration=duration,
+        # Bloques de ~8 s de audio: menos saltos al hilo que hace el RMS
+        chunk_size=1 << 18,
+    )
+    levels = energy.finish()
+    await asyncio.to_thread(analysis_cache.put_array, input_file, cache_kind, levels)
+    return levels
+
+
+async def detect_speech(input_file: str, config: SilenceConfig = VIDEO_CUT,
+                        duration: Optional[float] = None) -> List[Segment]:
+    levels = await analyse_levels(input_file, config, duration)
+    segments = speech_segments(levels, config, duration)
+    logger.info(f"Análisis de silencios: {len(segments)} tramos de voz en {input_file}")
+    return segments
@@ -0,0 +1,336 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.core.database import CREATE_TASKS_TABLE_SQL
+from app.services.task_manager import Task, TaskStore, FINISHED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteTaskStore(TaskStore):
+    """
+    Almacén de tareas en SQLite (modo WAL) compartido por todos los workers de
+    uvicorn y persistente entre reinicios.
+
+    El esquema lo crea `init_task_db` (aiosqlite) en el arranque; aquí se usa
+    sqlite3 síncrono con una conexión por hilo: desde el event loop, los
+    métodos que tocan la base de datos (altas, lecturas, cambios de estado y
+    output_path, `stats`) se llaman siempre con `asyncio.to_thread`.
+    Las actualizaciones de progreso se acumulan en memoria y se escriben en un
+    único lote cada `flush_interval` segundos; los cambios de estado y de
+    output_path se escriben al momento. Las tareas en curso de este proceso se
+    guardan también en memoria (`_active`), así el progreso no relee la fila.
+
+    El volcado del progreso, la purga y la relectura del estado de las tareas
+    en curso (para ver cancelaciones hechas desde otros workers) los hace un
+    hilo escritor cada `flush_interval` segundos: el progreso y
+    `peek_status`, que se llaman desde el event loop, no tocan la base de datos.
+
+    Una tarea en curso no tiene `expires_at`; caduca si pasa `pending_ttl` sin
+    que se escriba progreso (`updated_at`), p.ej. porque su worker murió.
+    """
+
+    def __init__(self, db_path: str, max_tasks: int = 5000, ttl: float = 3600,
+                 pending_ttl: float = 1800, flush_interval: float = 1.0):
+        super().__init__()
+        # Los cambios hechos por otros workers no se notifican: se releen periódicamente
+        self.watch_poll_interval = max(flush_interval, 0.5)
+        self.db_path = db_path
+        self.max_tasks = max_tasks
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending_progress: Dict[str, dict] = {}
+        self._active: Dict[str, Task] = {}
+        # Tareas en curso que otro worker canceló, vistas por el hilo escritor
+        self._cancelled_elsewhere: "OrderedDict[str, None]" = OrderedDict()
+        self._writer: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_flush = time.time()
+        self._last_purge = 0.0
+        self._schema_ready = False
+        # Contadores de este proceso
+        self.created_count = 0
+        self.evicted_count = 0
+        self.expired_count = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA busy_timeout=10000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(CREATE_TASKS_TABLE_SQL)
+                self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def _expires_at(self, status: str, now: float) -> float:
+        return now + (self.ttl if status in FINISHED_STATUSES else self.pending_ttl)
+
+    @staticmethod
+    def _row_to_task(row) -> Task:
+        task = Task(id=row["id"], porcentage=row["porcentage"], status=row["status"])
+        task.output_path = row["output_path"]
+        task.fps = row["fps"]
+        task.speed = row["speed"]
+        task.created_at = row["created_at"]
+        task.updated_at = row["updated_at"]
+        return task
+
+    def _remember(self, task: Optional[Task]):
+        """Mantiene en memoria el último estado de las tareas sin terminar."""
+        if task is None:
+            return
+        with self._lock:
+            if task.finished:
+                self._active.pop(task.id, None)
+            else:
+                self._active[task.id] = task
+        self._ensure_writer()
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, name="task-store-writer", daemon=True)
+                self._writer.start()
+
+    def _writer_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self._flush_progress(force=True)
+                self._refresh_active()
+                self._purge()
+            except sqlite3.Error as e:
+                logger.warning(f"Task store writer error: {e}")
+
+    def _refresh_active(self):
+        """Relee el estado de las tareas en curso de este proceso."""
+        with self._lock:
+            ids = list(self._active)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self._conn().execute(
+                f"SELECT id, status FROM tasks WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            statuses = {row["id"]: row["status"] for row in rows}
+            with self._lock:
+                for task_id in chunk:
+                    status = statuses.get(task_id)
+                    if status == "cancelled":
+                        self._cancelled_elsewhere[task_id] = None
+                        if len(self._cancelled_elsewhere) > 10000:
+                            self._cancelled_elsewhere.popitem(last=False)
+                    task = self._active.get(task_id)
+                    if task is not None and status is not None:
+                        task.status = status
+                    if status is None or status in FINISHED_STATUSES:
+                        self._active.pop(task_id, None)
+
+    def close(self):
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join(timeout=self.flush_interval + 5)
+            self._writer = None
+        self._flush_progress(force=True)
+
+    def _overlay_progress(self, task: Task) -> Task:
+        pending = self._pending_progress.get(task.id)
+        if pending:
+            task.porcentage = max(task.porcentage, pending["porcentage"])
+            task.fps = pending["fps"] if pending["fps"] is not None else task.fps
+            task.speed = pending["speed"] if pending["speed"] is not None else task.speed
+        return task
+
+    def _flush_progress(self, force: bool = False):
+        with self._lock:
+            if not self._pending_progress:
+                return
+            if not force and time.time() - self._last_flush < self.flush_interval:
+                return
+            batch = self._pending_progress
+            self._pending_progress = {}
+            self._last_flush = time.time()
+
+        rows = [
+            (p["porcentage"], p["fps"], p["speed"], p["updated_at"], task_id)
+            for task_id, p in batch.items()
+        ]
+        conn = self._conn()
+        conn.execute("BEGIN")
+        conn.executemany(
+            "UPDATE tasks SET porcentage = MAX(porcentage, ?), fps = COALESCE(?, fps), "
+            "speed = COALESCE(?, speed), updated_at = ?, expires_at = NULL "
+            "WHERE id = ? AND status NOT IN ('completed', 'failed', 'cancelled')",
+            rows,
+        )
+        conn.execute("COMMIT")
+
+    def _flush_task(self, task_id: str):
+        """Escribe ya el progreso pendiente de una tarea antes de cambiar su estado."""
+        with self._lock:
+            pending = self._pending_progress.pop(task_id, None)
+        if pending:
+            self._conn().execute(
+                "UPDATE tasks SET porcentage = MAX(porcentage, ?), fps = COALESCE(?, fps), "
+                "speed = COALESCE(?, speed), updated_at = ? WHERE id = ?",
+                (pending["porcentage"], pending["fps"], pending["speed"], pending["updated_at"], task_id),
+            )
+
+    def _purge(self):
+        now = time.time()
+        if now - self._last_purge < 5:
+            return
+        self._last_purge = now
+        conn = self._conn()
+        cursor = conn.execute(
+            "DELETE FROM tasks WHERE (expires_at IS NOT NULL AND expires_at <= ?) "
+            "OR (expires_at IS NULL AND updated_at <= ?)",
+            (now, now - self.pending_ttl),
+        )
+        self.expired_count += max(cursor.rowcount, 0)
+
+        overflow = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] - self.max_tasks
+        if overflow > 0:
+            cursor = conn.execute(
+                "DELETE FROM tasks WHERE id IN ("
+                "SELECT id FROM tasks WHERE expires_at IS NOT NULL "
+                "ORDER BY status IN ('completed', 'failed', 'cancelled') DESC, expires_at LIMIT ?)",
+                (overflow,),
+            )
+            self.evicted_count += max(cursor.rowcount, 0)
+
+    def add_task(self, task: Task):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO tasks (id, porcentage, status, output_path, fps, speed, created_at, updated_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (task.id, task.porcentage, task.status, task.output_path, task.fps, task.speed,
+             task.created_at, now, self._expires_at(task.status, now)),
+        )
+        self.created_count += 1
+        self._remember(task)
+        self._purge()
+
+    def remove_task(self, task: Task):
+        with self._lock:
+            self._pending_progress.pop(task.id, None)
+            self._active.pop(task.id, None)
+        self._conn().execute("DELETE FROM tasks WHERE id = ?", (task.id,))
+        self._notify(task.id)
+
+    def update_task_porcentage(self, id, task_porcentage):
+        return self.update_task_progress(id, task_porcentage)
+
+    def update_task_progress(self, id, task_porcentage=None, fps=None, speed=None):
+        """Acumula el progreso; devuelve el estado en memoria (None si la tarea no es de este proceso)."""
+        with self._lock:
+            pending = self._pending_progress.setdefault(id, {"porcentage": 0, "fps": None, "speed": None})
+            if task_porcentage is not None:
+                pending["porcentage"] = max(pending["porcentage"], task_porcentage)
+            if fps is not None:
+                pending["fps"] = fps
+            if speed is not None:
+                pending["speed"] = speed
+            pending["updated_at"] = time.time()
+            task = self._active.get(id)
+            if task is not None:
+                self._overlay_progress(task)
+                task.updated_at = pending["updated_at"]
+        # El hilo escritor vuelca el lote cada flush_interval
+        self._ensure_writer()
+        self._notify(id)
+        return task
+
+    def update_task_status(self, id, success: bool):
+        status = "completed" if success else "failed"
+        now = time.time()
+        self._flush_task(id)
+        # Una tarea cancelada no pasa a completada/fallida al desenrollarse el trabajo
+        self._conn().execute(
+            "UPDATE tasks SET status = ?, updated_at = ?, expires_at = ? WHERE id = ? AND status != 'cancelled'",
+            (status, now, self._expires_at(status, now), id),
+        )
+        with self._lock:
+            self._active.pop(id, None)
+        self._notify(id)
+        return self.get_task(id)
+
+    def cancel_task(self, id):
+        now = time.time()
+        with self._lock:
+            self._pending_progress.pop(id, None)
+            self._active.pop(id, None)
+        self._conn().execute(
+            "UPDATE tasks SET status = 'cancelled', updated_at = ?, expires_at = ? WHERE id = ?",
+            (now, self._expires_at("cancelled", now), id),
+        )
+        self._notify(id)
+        return self.get_task(id)
+
+    def set_output_path(self, id, path):
+        self._conn().execute(
+            "UPDATE tasks SET output_path = ?, updated_at = ? WHERE id = ?",
+            (path, time.time(), id),
+        )
+        self._notify(id)
+        return self.get_task(id)
+
+    def peek_status(self, task_id) -> Optional[str]:
+        with self._lock:
+            if task_id in self._cancelled_elsewhere:
+                return "cancelled"
+            task = self._active.get(task_id)
+            return None if task is None else task.status
+
+    def get_task(self, task_id) -> Optional[Task]:
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT * FROM tasks WHERE id = ? AND "
+            "((expires_at IS NULL AND updated_at > ?) OR expires_at > ?)",
+            (task_id, now - self.pending_ttl, now),
+        ).fetchone()
+        if row is None:
+            with self._lock:
+                self._active.pop(task_id, None)
+            return None
+        with self._lock:
+            task = self._overlay_progress(self._row_to_task(row))
+        self._remember(task)
+        return task
+
+    def get_tasks(self) -> List[Task]:
+        self._flush_progress(force=True)
+        self._purge()
+        rows = self._conn().execute("SELECT * FROM tasks ORDER BY created_at").fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def stats(self) -> dict:
+        self._flush_progress(force=True)
+        self._purge()
+        conn = self._conn()
+        live = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+        idle = conn.execute("SELECT COUNT(*) FROM tasks WHERE expires_at IS NOT NULL").fetchone()[0]
+        return {
+            "live": live,
+            "running": live - idle,
+            "idle": idle,
+            "created": self.created_count,
+            "expired": self.expired_count,
+            "evicted": self.evicted_count,
+            "max_tasks": self.max_tasks,
+        }
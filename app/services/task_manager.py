@@ -1,4 +1,16 @@
-from typing import List
+import abc
+import asyncio
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = {"completed", "failed", "cancelled"}
+
 
 class Task:
     def __init__(self, id, porcentage, status):
@@ -6,45 +18,355 @@ class Task:
         self.porcentage = porcentage
         self.status = status
         self.output_path = None
+        self.fps = None
+        self.speed = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+
+class TaskWatch:
+    """
+    Suscripción a los cambios de una tarea desde el event loop. Se registra
+    antes de leer el estado para no perder cambios entre lectura y espera.
+    """
+
+    def __init__(self, store: "TaskStore", task_id: str):
+        self.store = store
+        self.task_id = task_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def __enter__(self):
+        self.store._add_watch(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.store._remove_watch(self)
+
+    async def wait(self, timeout: float) -> bool:
+        """True si hubo una notificación de cambio antes de `timeout` segundos."""
+        # Los almacenes sin notificaciones entre procesos se releen cada poll_interval
+        if self.store.watch_poll_interval:
+            timeout = min(timeout, self.store.watch_poll_interval)
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.event.clear()
+
+
+class TaskStore(abc.ABC):
+    """
+    Interfaz común de los almacenes de tareas. `task_manager` es una instancia
+    del almacén configurado en TASK_STORE ("memory" o "sqlite").
+
+    Cada cambio de una tarea notifica a sus `watch()` activos, que viven en el
+    event loop. El almacén puede hacer E/S (sqlite), así que desde el event
+    loop se llama con `asyncio.to_thread` y las notificaciones llegan desde
+    esos hilos; solo el progreso, `peek_status` y `watch` se llaman directamente.
+    """
+
+    # Intervalo máximo entre relecturas para los observadores (None = solo push)
+    watch_poll_interval: Optional[float] = None
 
-class TaskManager:
     def __init__(self):
-        self.tasks: List[Task] = []
+        self._watches: Dict[str, Set[TaskWatch]] = {}
+        self._watch_lock = threading.Lock()
+
+    def watch(self, task_id: str) -> TaskWatch:
+        return TaskWatch(self, task_id)
+
+    def _add_watch(self, watch: TaskWatch):
+        with self._watch_lock:
+            self._watches.setdefault(watch.task_id, set()).add(watch)
+
+    def _remove_watch(self, watch: TaskWatch):
+        with self._watch_lock:
+            watches = self._watches.get(watch.task_id)
+            if watches:
+                watches.discard(watch)
+                if not watches:
+                    del self._watches[watch.task_id]
+
+    def _notify(self, task_id: str):
+        with self._watch_lock:
+            watches = list(self._watches.get(task_id, ()))
+        for watch in watches:
+            try:
+                watch.loop.call_soon_threadsafe(watch.event.set)
+            except RuntimeError:
+                # Event loop cerrado
+                pass
+
+    @abc.abstractmethod
+    def add_task(self, task: Task):
+        ...
+
+    @abc.abstractmethod
+    def remove_task(self, task: Task):
+        ...
+
+    @abc.abstractmethod
+    def update_task_porcentage(self, id, task_porcentage) -> Optional[Task]:
+        ...
+
+    @abc.abstractmethod
+    def update_task_progress(self, id, task_porcentage=None, fps=None, speed=None) -> Optional[Task]:
+        ...
+
+    @abc.abstractmethod
+    def update_task_status(self, id, success: bool) -> Optional[Task]:
+        ...
+
+    @abc.abstractmethod
+    def cancel_task(self, id) -> Optional[Task]:
+        ...
+
+    @abc.abstractmethod
+    def set_output_path(self, id, path) -> Optional[Task]:
+        ...
+
+    @abc.abstractmethod
+    def get_task(self, task_id) -> Optional[Task]:
+        ...
+
+    @abc.abstractmethod
+    def peek_status(self, task_id) -> Optional[str]:
+        """
+        Último estado conocido en este proceso, sin E/S: se consulta en cada
+        línea de progreso de ffmpeg desde el event loop.
+        """
+        ...
+
+    def close(self):
+        """Vuelca lo pendiente al apagar."""
+
+    @abc.abstractmethod
+    def get_tasks(self) -> List[Task]:
+        ...
+
+    @abc.abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class InMemoryTaskStore(TaskStore):
+    """
+    Registro de tareas en memoria del proceso, indexado por id.
+
+    Las tareas terminadas caducan tras `ttl` segundos y las pendientes que nunca
+    se usan (p.ej. las creadas por /tasks/init) tras `pending_ttl`. Una tarea en
+    curso caduca si pasa `pending_ttl` sin informar de progreso (su trabajo
+    murió sin cerrar la tarea). Si se supera `max_tasks` se desalojan primero
+    las tareas inactivas más próximas a caducar; las que están en curso nunca
+    se desalojan.
+    """
+
+    def __init__(self, max_tasks: int = 5000, ttl: float = 3600, pending_ttl: float = 1800):
+        super().__init__()
+        self.max_tasks = max_tasks
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.tasks: Dict[str, Task] = {}
+        # Tareas inactivas ordenadas por fecha de caducidad (una cola por TTL)
+        self._pending_expiry: "OrderedDict[str, float]" = OrderedDict()
+        self._finished_expiry: "OrderedDict[str, float]" = OrderedDict()
+        # Tareas en curso ordenadas por el último progreso (+ pending_ttl)
+        self._running_expiry: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.created_count = 0
+        self.evicted_count = 0
+        self.expired_count = 0
+
+    def _schedule_expiry(self, task: Task):
+        self._pending_expiry.pop(task.id, None)
+        self._finished_expiry.pop(task.id, None)
+        self._running_expiry.pop(task.id, None)
+        if task.finished:
+            self._finished_expiry[task.id] = time.time() + self.ttl
+        else:
+            self._pending_expiry[task.id] = time.time() + self.pending_ttl
+
+    def _mark_running(self, task: Task):
+        """Una tarea con progreso está en curso: caduca solo si deja de informar."""
+        if task.finished:
+            return
+        self._pending_expiry.pop(task.id, None)
+        self._running_expiry.pop(task.id, None)
+        self._running_expiry[task.id] = time.time() + self.pending_ttl
+
+    def _deadline(self, task_id: str) -> Optional[float]:
+        for queue in (self._finished_expiry, self._pending_expiry, self._running_expiry):
+            deadline = queue.get(task_id)
+            if deadline is not None:
+                return deadline
+        return None
+
+    def _drop(self, task_id: str):
+        self.tasks.pop(task_id, None)
+        self._pending_expiry.pop(task_id, None)
+        self._finished_expiry.pop(task_id, None)
+        self._running_expiry.pop(task_id, None)
+
+    def _purge(self):
+        now = time.time()
+        for queue in (self._finished_expiry, self._pending_expiry, self._running_expiry):
+            while queue:
+                task_id, deadline = next(iter(queue.items()))
+                if deadline > now:
+                    break
+                self._drop(task_id)
+                self.expired_count += 1
+
+        for queue in (self._finished_expiry, self._pending_expiry):
+            while len(self.tasks) > self.max_tasks and queue:
+                self._drop(next(iter(queue)))
+                self.evicted_count += 1
+
+        if len(self.tasks) > self.max_tasks:
+            logger.warning(f"Task registry over capacity: {len(self.tasks)} active tasks (max {self.max_tasks})")
 
     def add_task(self, task):
-        self.tasks.append(task)
+        with self._lock:
+            self.tasks[task.id] = task
+            self.created_count += 1
+            self._schedule_expiry(task)
+            self._purge()
 
     def remove_task(self, task):
-        self.tasks.remove(task)
+        with self._lock:
+            self._drop(task.id)
+        self._notify(task.id)
 
     def update_task_porcentage(self, id, task_porcentage):
-        for task in self.tasks:
-            if task.id == id:
+        with self._lock:
+            task = self.tasks.get(id)
+            if task is None:
+                return None
+            task.porcentage = task_porcentage
+            task.updated_at = time.time()
+            self._mark_running(task)
+            self._purge()
+            self._notify(id)
+            return task
+
+    def update_task_progress(self, id, task_porcentage=None, fps=None, speed=None):
+        """Progreso real reportado por ffmpeg; los valores None no se tocan."""
+        with self._lock:
+            task = self.tasks.get(id)
+            if task is None:
+                return None
+            # El porcentaje nunca retrocede aunque un trabajo encadene varias pasadas
+            if task_porcentage is not None and task_porcentage > task.porcentage:
                 task.porcentage = task_porcentage
-                return task
-        return None
+            if fps is not None:
+                task.fps = fps
+            if speed is not None:
+                task.speed = speed
+            task.updated_at = time.time()
+            self._mark_running(task)
+            self._purge()
+            self._notify(id)
+            return task
 
-    def update_task_status(self, id, success:bool):
-        for task in self.tasks:
-            if task.id == id:
+    def update_task_status(self, id, success: bool):
+        with self._lock:
+            task = self.tasks.get(id)
+            if task is None:
+                return None
+            # Una tarea cancelada no pasa a completada/fallida al desenrollarse el trabajo
+            if task.status != "cancelled":
                 task.status = "completed" if success else "failed"
-                return task
-        return None
+            task.updated_at = time.time()
+            self._schedule_expiry(task)
+            self._notify(id)
+            return task
 
-    def get_tasks(self):
-        return self.tasks
-    
-    def get_task(self, task_id):
-        for task in self.tasks:
-            if task.id == task_id:
-                return task
-        return None
+    def cancel_task(self, id):
+        with self._lock:
+            task = self.tasks.get(id)
+            if task is None:
+                return None
+            task.status = "cancelled"
+            task.updated_at = time.time()
+            self._schedule_expiry(task)
+            self._notify(id)
+            return task
+
+    def get_tasks(self) -> List[Task]:
+        with self._lock:
+            self._purge()
+            return list(self.tasks.values())
+
+    def get_task(self, task_id) -> Optional[Task]:
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None
+            deadline = self._deadline(task_id)
+            if deadline is not None and deadline <= time.time():
+                self._drop(task_id)
+                self.expired_count += 1
+                return None
+            return task
+
+    def peek_status(self, task_id) -> Optional[str]:
+        task = self.tasks.get(task_id)
+        return None if task is None else task.status
 
     def set_output_path(self, id, path):
-        for task in self.tasks:
-            if task.id == id:
-                task.output_path = path
-                return task
-        return None
+        with self._lock:
+            task = self.tasks.get(id)
+            if task is None:
+                return None
+            task.output_path = path
+            task.updated_at = time.time()
+            self._notify(id)
+            return task
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._purge()
+            idle = len(self._pending_expiry) + len(self._finished_expiry)
+            return {
+                "live": len(self.tasks),
+                "running": len(self._running_expiry),
+                "idle": idle,
+                "created": self.created_count,
+                "expired": self.expired_count,
+                "evicted": self.evicted_count,
+                "max_tasks": self.max_tasks,
+            }
+
+
+# Alias histórico
+TaskManager = InMemoryTaskStore
+
+
+def _build_task_store() -> TaskStore:
+    backend = settings.TASK_STORE.lower()
+    if backend == "sqlite":
+        from app.services.sqlite_task_store import SqliteTaskStore
+        return SqliteTaskStore(
+            db_path=settings.TASK_DB_PATH,
+            max_tasks=settings.TASK_MAX_ENTRIES,
+            ttl=settings.TASK_TTL_SECONDS,
+            pending_ttl=settings.TASK_PENDING_TTL_SECONDS,
+            flush_interval=settings.TASK_PROGRESS_FLUSH_SECONDS,
+        )
+    if backend != "memory":
+        logger.warning(f"Unknown TASK_STORE '{settings.TASK_STORE}', using in-memory store")
+    return InMemoryTaskStore(
+        max_tasks=settings.TASK_MAX_ENTRIES,
+        ttl=settings.TASK_TTL_SECONDS,
+        pending_ttl=settings.TASK_PENDING_TTL_SECONDS,
+    )
+
 
-task_manager = TaskManager()
\ No newline at end of file
+task_manager = _build_task_store()
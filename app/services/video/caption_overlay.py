@@ -0,0 +1,109 @@
+import ffmpeg
+import os
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+from app.core.video_styles import TextStyle
+from app.services.video.ass_service import AssService
+from app.services.render_cache import render_cache
+from app.utils.ffmpeg_runner import run_stream
+from app.utils.job_control import register_scratch
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CaptionLayer:
+    """Capa del texto recortada a su caja: `path` se compone en (`x`, `y`)."""
+    path: str
+    x: int
+    y: int
+
+    def overlay(self, video):
+        """Compone la capa sobre `video` (ffmpeg-python)."""
+        return video.overlay(ffmpeg.input(self.path), x=self.x, y=self.y)
+
+
+def _crop_to_text(png_path: str) -> CaptionLayer:
+    """
+    Recorta el PNG a la caja de los píxeles no transparentes y guarda la
+    posición en sus metadatos, para que una copia restaurada de la caché la
+    conserve.
+
+    libass dibuja sobre el lienzo transparente mezclando el color con su
+    negro, así que deja el color premultiplicado por el alfa y los bordes
+    suavizados saldrían oscuros con `overlay`. Se pasa a alfa lineal, que es
+    lo que espera `overlay` (y PNG); `overlay=alpha=premultiplied` no sirve
+    porque compone en YUV y el offset de la luma vuelve a oscurecerlos.
+    """
+    with Image.open(png_path) as image:
+        image = Image.frombytes("RGBa", image.size, image.convert("RGBA").tobytes()).convert("RGBA")
+    box = image.getchannel("A").getbbox() or (0, 0, 1, 1)
+    metadata = PngInfo()
+    metadata.add_text("caption_x", str(box[0]))
+    metadata.add_text("caption_y", str(box[1]))
+    image.crop(box).save(png_path, pnginfo=metadata)
+    return CaptionLayer(png_path, box[0], box[1])
+
+
+def _read_layer(png_path: str) -> CaptionLayer:
+    with Image.open(png_path) as image:
+        return CaptionLayer(png_path, int(image.text["caption_x"]), int(image.text["caption_y"]))
+
+
+async def render_caption_overlay(text: str, template: TextStyle, width: int, height: int) -> CaptionLayer:
+    """
+    Renderiza el texto del meme una sola vez a un PNG RGBA transparente,
+    recortado a la caja del texto, para componerlo con `overlay` en lugar de
+    pasar libass por cada frame. El subtítulo es estático (un único Dialogue
+    con \\pos fijo), así que el resultado es idéntico y cada frame solo mezcla
+    el área del texto. Se cachea por (texto, estilo, ancho, alto). Devuelve
+    la capa, cuyo PNG es un temporal que debe borrar el llamador.
+    """
+    template.prepare_for_video(width, height)
+
+    os.makedirs("temp", exist_ok=True)
+    unique_id = uuid.uuid4().hex[:8]
+    png_path = os.path.join("temp", f"caption_{unique_id}.png")
+    # Ruta relativa con "/" para el filtro ass (como en create_meme)
+    ass_path = os.path.join("temp", f"caption_{unique_id}.ass").replace("\\", "/")
+    register_scratch(png_path, ass_path)
+
+    cache_key = render_cache.key("caption", None, {
+        "text": text, "style": template, "width": width, "height": height,
+    })
+    if cache_key and await asyncio.to_thread(render_cache.restore, cache_key, ".png", png_path):
+        logger.info(f"Texto del meme servido desde caché: {png_path}")
+        return await asyncio.to_thread(_read_layer, png_path)
+
+    try:
+        AssService.generate_ass(
+            output_path=ass_path,
+            text=text,
+            duration=1.0,
+            width=width,
+            height=height,
+            template=template
+        )
+        # Un solo frame transparente; alpha=1 hace que libass escriba también el
+        # canal alfa. El rgba va dentro del grafo de lavfi: fuera, el dispositivo
+        # ya ha convertido el lienzo a yuv420p (opaco) y el alfa se pierde
+        stream = (
+            ffmpeg
+            .input(f"color=c=black@0.0:s={width}x{height}:d=1,format=rgba", f="lavfi")
+            .filter("ass", filename=ass_path, alpha=1)
+            .output(png_path, vframes=1)
+            .overwrite_output()
+        )
+        await run_stream(stream)
+    finally:
+        if os.path.exists(ass_path):
+            os.remove(ass_path)
+
+    layer = await asyncio.to_thread(_crop_to_text, png_path)
+    if cache_key:
+        await asyncio.to_thread(render_cache.store, cache_key, ".png", png_path)
+    return layer
@@ -1,119 +1,170 @@
 import ffmpeg
 import os
-import re
-import subprocess
 import uuid
-
-CONFIG_FILTER = {
-    "start_periods": 1,
-    "start_duration": 0,
-    "start_threshold": "-30dB",
-    "stop_periods": -1,
-    "stop_duration": 0.5,
-    "stop_threshold": "-35dB"
-}
-
-
-def get_duration(input_file: str) -> float:
+import shutil
+import logging
+from typing import List, Optional, Tuple
+from app.core.config import settings
+from app.core.encoding_profiles import EncodingProfile, EncodingProfileName, ProfileRegistry
+from app.utils.ffmpeg_progress import stage, ParallelProgress
+from app.utils.ffmpeg_runner import run_ffmpeg, run_parallel, probe, probe_sample_rate
+from app.services.segment_graph import write_cut_graph, limit_segments, snap_segments, grid_rate
+from app.services.video.smart_cut import smart_cut as render_smart_cut, SmartCutUnsupported
+from app.services.silence_analysis import detect_speech, VIDEO_CUT
+from app.utils.job_control import register_scratch, limit_threads, JobCancelled, current_task_id, current_thread_budget
+
+logger = logging.getLogger(__name__)
+
+
+async def get_duration(input_file: str) -> float:
     try:
-        probe = ffmpeg.probe(input_file)
-        return float(probe['format']['duration'])
+        info = await probe(input_file)
+        return float(info['format']['duration'])
     except:
         return 0
 
 
-def detect_silence(input_file: str) -> list:
-    silence_filter = (
-        f"silencedetect="
-        f"n={CONFIG_FILTER['start_threshold']}:"
-        f"d={CONFIG_FILTER['stop_duration']}"
-    )
-
-    cmd = [
-        "ffmpeg",
+def group_segments(segments: List[Tuple[float, float]], max_span: float) -> List[List[Tuple[float, float]]]:
+    """
+    Agrupa segmentos consecutivos de modo que cada grupo abarque como mucho
+    `max_span` segundos del original; los segmentos más largos se parten.
+    Cada grupo se codifica una sola vez, de forma independiente.
+    """
+    pieces = []
+    for start, end in segments:
+        while end - start > max_span:
+            pieces.append((start, start + max_span))
+            start += max_span
+        if end > start:
+            pieces.append((start, end))
+
+    groups: List[List[Tuple[float, float]]] = []
+    for start, end in pieces:
+        if groups and end - groups[-1][0][0] <= max_span:
+            groups[-1].append((start, end))
+        else:
+            groups.append([(start, end)])
+    return groups
+
+
+async def get_frame_rate(input_file: str) -> Optional[float]:
+    try:
+        info = await probe(input_file)
+        video = next(s for s in info['streams'] if s['codec_type'] == 'video')
+        num, _, den = video.get('avg_frame_rate', '0/1').partition('/')
+        fps = float(num) / float(den or 1)
+        return fps if fps > 0 else None
+    except Exception:
+        return None
+
+
+async def encode_segments(input_file: str, segments: List[Tuple[float, float]], output_path: str,
+                          offset: float = 0.0, span: Optional[float] = None,
+                          frame_rate: Optional[float] = None, profile: Optional[EncodingProfile] = None,
+                          sample_rate: Optional[int] = None):
+    """
+    Única pasada de codificación: lee solo [offset, offset + span] del original
+    y se queda con los segmentos (en tiempos absolutos) mediante select/aselect.
+    El grafo tiene el mismo tamaño con 10 que con 5000 segmentos y se pasa
+    por fichero (ver app.services.segment_graph).
+    """
+    profile = profile or ProfileRegistry.resolve(default=EncodingProfileName.FAST)
+    graph_file = f"{output_path}.graph.txt"
+    write_cut_graph(graph_file, segments, offset, frame_rate=frame_rate, video_filter=profile.video_filter(),
+                    sample_rate=sample_rate)
+
+    cmd = ["ffmpeg"]
+    if offset > 0:
+        cmd += ["-ss", f"{offset:.6f}"]
+    if span is not None:
+        cmd += ["-t", f"{span:.6f}"]
+    cmd += [
         "-i", input_file,
-        "-af", silence_filter,
-        "-f", "null",
-        "-"
+        "-filter_complex_script", graph_file,
+        "-map", "[vout]", "-map", "[aout]",
+        *profile.video_args(),
+        *profile.audio_args(filtered=True),
+        "-avoid_negative_ts", "make_zero",
+        "-y",
+        output_path,
     ]
-
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    output = result.stderr
-
-    silence_periods = []
-    pattern = r'silence_start: ([\d.]+).*?silence_end: ([\d.]+)'
-
-    for match in re.finditer(pattern, output, re.DOTALL):
-        start = float(match.group(1))
-        end = float(match.group(2))
-        silence_periods.append((start, end))
-
-    return silence_periods
-
-
-def build_segments(silence_periods: list, duration: float) -> list:
-    if not silence_periods:
-        return [(0, duration)]
-
-    segments = []
-
-    if silence_periods[0][0] > 0:
-        segments.append((0, silence_periods[0][0]))
-
-    for i in range(len(silence_periods) - 1):
-        start = silence_periods[i][1]
-        end = silence_periods[i + 1][0]
-        if start < end:
-            segments.append((start, end))
-
-    if silence_periods[-1][1] < duration:
-        segments.append((silence_periods[-1][1], duration))
-
-    return segments
-
-
-def process_segment(input_file: str, segment_num: int, temp_dir: str, output_filename: str = None) -> str:
-    if output_filename is None:
-        output_filename = f"processed_segment_{segment_num}.mp4"
-    output_path = os.path.join(temp_dir, output_filename)
-
-    duration = get_duration(input_file)
-    silence_periods = detect_silence(input_file)
-    segments = build_segments(silence_periods, duration)
-
-    if not segments:
-        raise Exception("No segments found")
-
-    input_stream = ffmpeg.input(input_file)
-    video = input_stream.video
-    audio = input_stream.audio
-
-    trimmed_videos = []
-    trimmed_audios = []
-
-    for start, end in segments:
-        v = video.filter('trim', start=start, end=end).filter('setpts', 'PTS-STARTPTS')
-        a = audio.filter('atrim', start=start, end=end).filter('asetpts', 'PTS-STARTPTS')
-        trimmed_videos.append(v)
-        trimmed_audios.append(a)
-
-    if len(trimmed_videos) == 1:
-        final_video = trimmed_videos[0]
-        final_audio = trimmed_audios[0]
-    else:
-        final_video = ffmpeg.concat(*trimmed_videos, v=1, a=0)
-        final_audio = ffmpeg.concat(*trimmed_audios, v=0, a=1)
-
-    (
-        ffmpeg
-        .output(final_video, final_audio, output_path, vcodec='libx264', preset='ultrafast', acodec='aac')
-        .overwrite_output()
-        .run(capture_stdout=True, capture_stderr=True, quiet=False)
-    )
-    return output_path
-
-
-def cut_video_remove_silence(input_file: str) -> str:
+    try:
+        await run_ffmpeg(cmd, duration=sum(end - start for start, end in segments))
+    finally:
+        if os.path.exists(graph_file):
+            os.remove(graph_file)
+
+
+def chunk_workers(num_chunks: int) -> int:
+    """
+    Grupos que se codifican a la vez: CUT_CHUNK_WORKERS o, por defecto, la
+    mitad del presupuesto de hilos del trabajo (dos hilos por ffmpeg).
+    """
+    budget = current_thread_budget.get() or os.cpu_count() or 1
+    workers = settings.CUT_CHUNK_WORKERS or max(1, budget // 2)
+    return max(1, min(workers, num_chunks))
+
+
+async def encode_groups_parallel(input_file: str, groups: List[List[Tuple[float, float]]], temp_dir: str,
+                                 workers: int, progress: ParallelProgress,
+                                 frame_rate: Optional[float] = None,
+                                 profile: Optional[EncodingProfile] = None,
+                                 sample_rate: Optional[int] = None) -> List[str]:
+    """Codifica cada grupo en su propio fichero; devuelve las partes en orden."""
+
+    def job(index: int):
+        group = groups[index]
+        offset = group[0][0]
+        part_path = os.path.join(temp_dir, f"part_{index}.mp4")
+
+        async def encode() -> str:
+            await encode_segments(input_file, group, part_path, offset, group[-1][1] - offset, frame_rate, profile,
+                                  sample_rate)
+            return part_path
+        return encode
+
+    return await run_parallel([job(i) for i in range(len(groups))], workers, progress)
+
+
+async def concat_copy(parts: List[str], concat_file: str, output_path: str,
+                      durations: Optional[List[float]] = None):
+    """
+    Une las partes ya codificadas sin recodificar (`-c copy`). `durations`
+    es lo que mide el video de cada parte: el AAC de cada una dura un frame
+    de audio más (el priming), y sin fijar la duración el demuxer concat
+    dejaba ese hueco en el video en cada unión.
+    """
+    with open(concat_file, 'w') as f:
+        for index, part in enumerate(parts):
+            f.write(f"file '{os.path.abspath(part)}'\n")
+            if durations:
+                f.write(f"duration {durations[index]:.6f}\n")
+
+    await run_ffmpeg([
+        "ffmpeg",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", concat_file,
+        "-c", "copy",
+        "-y",
+        output_path
+    ])
+
+
+async def cut_video_remove_silence(input_file: str, smart_cut: bool = False,
+                                   profile: Optional[EncodingProfile] = None) -> str:
+    """
+    Quita los silencios con una sola codificación: analiza el audio del video
+    completo una vez, codifica los tramos con voz por grupos (en paralelo en
+    videos largos) y une las partes con copia de streams.
+
+    Con `smart_cut` solo se recodifican los GOPs parciales junto a cada corte
+    (ver app.services.video.smart_cut); si el origen no lo admite o ffmpeg
+    falla en ese camino se usa el normal. `profile` fija preset, CRF, hilos, audio, resolución y fps
+    máximos (por defecto el perfil del servidor); con `max_seconds` (perfil de
+    previsualización) solo se codifican los primeros segundos del resultado.
+    """
+    profile = profile or ProfileRegistry.resolve(default=EncodingProfileName.FAST)
 
     if not os.path.exists(input_file):
         raise FileNotFoundError(f"El archivo de entrada no existe: {input_file}")
@@ -125,78 +176,78 @@ def cut_video_remove_silence(input_file: str) -> str:
         input_name = input_name[:15]
 
     output_path = os.path.join("temp", f"cut_{input_name}{input_ext}")
+    register_scratch(output_path)
 
     try:
-        duration = get_duration(input_file)
-        max_segment_duration = 8 * 60
+        return await _cut_video(input_file, output_path, smart_cut, profile)
+    except JobCancelled:
+        raise
+    except ffmpeg.Error as e:
+        raise Exception(f"Error procesando video con FFmpeg: {e.stderr.decode() if e.stderr else str(e)}") from e
+    except Exception as e:
+        raise Exception(f"Error en cut_video_remove_silence: {str(e)}") from e
+
 
-        if duration <= max_segment_duration:
-            output_filename = f"cut_{input_name}{input_ext}"
-            return process_segment(input_file, 0, "temp", output_filename)
+async def _cut_video(input_file: str, output_path: str, smart_cut: bool, profile: EncodingProfile) -> str:
+    with limit_threads(profile.threads):
+        duration = await get_duration(input_file)
+
+        with stage(0.0, 0.2):
+            segments = await detect_speech(input_file, VIDEO_CUT, duration)
+
+        if not segments:
+            raise Exception("No segments found")
+
+        if profile.max_seconds:
+            segments = limit_segments(segments, profile.max_seconds)
+
+        if smart_cut:
+            temp_dir = os.path.join("temp", f"smart_{uuid.uuid4().hex[:8]}")
+            os.makedirs(temp_dir, exist_ok=True)
+            register_scratch(temp_dir)
+            try:
+                with stage(0.2, 1.0):
+                    await render_smart_cut(input_file, segments, output_path, temp_dir,
+                                           chunk_workers(len(segments)), profile)
+                return output_path
+            except SmartCutUnsupported as e:
+                logger.warning(f"Smart cut no disponible para {input_file} ({e}); se recodifica completo")
+            except ffmpeg.Error as e:
+                # Un trozo que ffmpeg no sabe copiar o recodificar no debe tumbar el corte
+                stderr = (e.stderr or b"").decode(errors="replace").strip().splitlines()
+                logger.warning(f"Smart cut falló para {input_file} ({stderr[-1] if stderr else e}); se recodifica completo")
+            finally:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+        frame_rate = await get_frame_rate(input_file)
+        sample_rate = await probe_sample_rate(input_file)
+        # Cada grupo empieza en la rejilla: su `-ss` no desplaza los frames respecto a los cortes
+        grid = grid_rate(sample_rate, frame_rate)
+        groups = [snap_segments(group, grid) for group in group_segments(segments, settings.CUT_CHUNK_SECONDS)]
+        groups = [group for group in groups if group]
+
+        if len(groups) == 1:
+            with stage(0.2, 1.0):
+                await encode_segments(input_file, segments, output_path, frame_rate=frame_rate, profile=profile,
+                                      sample_rate=sample_rate)
+            return output_path
 
         temp_dir = os.path.join("temp", f"temp_{uuid.uuid4().hex[:8]}")
         os.makedirs(temp_dir, exist_ok=True)
+        register_scratch(temp_dir)
 
-        chunk_files = []
-        num_chunks = int(duration // max_segment_duration) + (1 if duration % max_segment_duration > 0 else 0)
-
-        for i in range(num_chunks):
-            chunk_start = i * max_segment_duration
-            chunk_duration = min(max_segment_duration, duration - chunk_start)
-            chunk_file = os.path.join(temp_dir, f"chunk_{i}{input_ext}")
-
-            # Usar -ss ANTES de -i para seeking preciso
-            # Re-encodear en lugar de copy para evitar problemas de keyframes
-            cmd = [
-                "ffmpeg",
-                "-ss", str(chunk_start),  # ← ANTES de -i para seeking rápido
-                "-i", input_file,
-                "-t", str(chunk_duration),  # ← Usar -t (duración) en lugar de -to
-                "-c:v", "libx264",
-                "-preset", "ultrafast",
-                "-c:a", "aac",
-                "-avoid_negative_ts", "make_zero",  # ← Normalizar timestamps
-                "-y",
-                chunk_file
-            ]
-            subprocess.run(cmd, check=True, capture_output=True)
-            chunk_files.append(chunk_file)
-
-        processed_chunks = []
-        for i, chunk_file in enumerate(chunk_files):
-            processed = process_segment(chunk_file, i, temp_dir)
-            processed_chunks.append(processed)
-
-        concat_file = os.path.join(temp_dir, "concat.txt")
-        with open(concat_file, 'w') as f:
-            for chunk in processed_chunks:
-                f.write(f"file '{os.path.abspath(chunk)}'\n")
-
-        cmd = [
-            "ffmpeg",
-            "-f", "concat",
-            "-safe", "0",
-            "-i", concat_file,
-            "-c:v", "libx264",
-            "-preset", "ultrafast",
-            "-c:a", "aac",
-            "-af", "aresample=async=1",  # Forzar sincronización de audio
-            "-y",
-            output_path
-        ]
-        subprocess.run(cmd, check=True, capture_output=True)
-
-        for chunk in chunk_files + processed_chunks:
-            if os.path.exists(chunk):
-                os.remove(chunk)
-        os.remove(concat_file)
-        os.rmdir(temp_dir)
+        workers = chunk_workers(len(groups))
+        logger.info(f"Codificando {len(segments)} segmentos en {len(groups)} grupos con {workers} workers")
 
-        return output_path
+        progress = ParallelProgress(current_task_id.get(), len(groups), 0.2, 0.95)
+        parts = await encode_groups_parallel(input_file, groups, temp_dir, workers, progress, frame_rate, profile,
+                                             sample_rate)
 
-    except ffmpeg.Error as e:
-        raise Exception(f"Error procesando video con FFmpeg: {e.stderr.decode() if e.stderr else str(e)}") from e
-    except subprocess.CalledProcessError as e:
-        raise Exception(f"Error ejecutando ffmpeg: {e}") from e
-    except Exception as e:
-        raise Exception(f"Error en cut_video_remove_silence: {str(e)}") from e
+        with stage(0.95, 1.0):
+            # Los grupos ya están en la rejilla: cada parte mide lo que suman sus segmentos
+            durations = [sum(end - start for start, end in group) for group in groups]
+            await concat_copy(parts, os.path.join(temp_dir, "concat.txt"), output_path, durations)
+
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+        return output_path
@@ -2,16 +2,21 @@ import ffmpeg
 import os
 import uuid
 import logging
-from app.services.video.ass_service import AssService
+from typing import List, Optional, Tuple
+from app.services.video.caption_overlay import CaptionLayer, render_caption_overlay
+from app.utils.ffmpeg_progress import stage
+from app.utils.ffmpeg_runner import run_stream, probe
+from app.utils.job_control import register_scratch, limit_threads
+from app.core.encoding_profiles import EncodingProfile, EncodingProfileName, ProfileRegistry
 
 logger = logging.getLogger(__name__)
 
-def get_video_info(input_file: str) -> dict:
+async def get_video_info(input_file: str) -> dict:
     try:
-        probe = ffmpeg.probe(input_file)
-        video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
+        info = await probe(input_file)
+        video_stream = next((stream for stream in info['streams'] if stream['codec_type'] == 'video'), None)
         return {
-            'duration': float(probe['format']['duration']),
+            'duration': float(info['format']['duration']),
             'width': int(video_stream['width']),
             'height': int(video_stream['height'])
         }
@@ -21,62 +26,56 @@ def get_video_info(input_file: str) -> dict:
 
 from app.core.video_styles import TextStyle, StyleRegistry
 
-def create_meme(video_path: str, text: str, template: TextStyle) -> str:
+async def create_meme(video_path: str, text: str, template: TextStyle,
+                      profile: Optional[EncodingProfile] = None) -> str:
     """
     Servicio que crea un meme. 
     Recibe la configuración de estilo ya resuelta.
     Mantiene calidad original, audio y elimina sombras.
+    La calidad de salida la fija `profile` (por defecto el perfil del servidor).
     """
+    profile = profile or ProfileRegistry.resolve(default=EncodingProfileName.ARCHIVE)
     if not os.path.exists(video_path):
         raise FileNotFoundError(f"Video no encontrado: {video_path}")
 
-    os.makedirs("temp", exist_ok=True)
     os.makedirs("resultado", exist_ok=True)
 
     unique_id = uuid.uuid4().hex[:8]
-    rel_ass_path = os.path.join("temp", f"meme_{unique_id}.ass")
-    ass_path = os.path.abspath(rel_ass_path)
     output_filename = f"meme_{unique_id}.mp4"
     output_path = os.path.abspath(os.path.join("resultado", output_filename))
+    register_scratch(output_path)
+    caption = None
 
     try:
-        info = get_video_info(video_path)
-        
-        # 1. Preparar el estilo para las dimensiones reales de este video
-        # (Esto calcula automáticamente font_size, pos_x y pos_y basados en los ratios del template)
-        template.prepare_for_video(info['width'], info['height'])
-
-        # 2. Generar el archivo .ass con el servicio genérico
-        AssService.generate_ass(
-            output_path=ass_path,
-            text=text,
-            duration=info['duration'],
-            width=info['width'],
-            height=info['height'],
-            template=template
-        )
+        info = await get_video_info(video_path)
+
+        # 1. Renderizar el texto una vez (o tomarlo de la caché) como capa transparente
+        # (prepare_for_video calcula font_size, pos_x y pos_y a partir de los ratios del template)
+        caption = await render_caption_overlay(text, template, info['width'], info['height'])
 
-        # 3. Configurar FFmpeg para mantener audio y calidad
-        ass_filter_path = rel_ass_path.replace("\\", "/")
-        
         logger.info(f"Procesando meme de alta calidad: {output_filename}")
 
-        input_video = ffmpeg.input(video_path)
-        # Aplicamos el filtro de ASS solo al flujo de video
-        video = input_video.video.filter("ass", filename=ass_filter_path)
+        # Previsualización: solo los primeros segundos
+        input_kwargs = {"t": profile.max_seconds} if profile.max_seconds else {}
+        input_video = ffmpeg.input(video_path, **input_kwargs)
+        video = input_video.video
+        # Descartar frames antes de componer el texto abarata el resto de la cadena
+        if profile.max_fps:
+            video = video.filter("fps", profile.max_fps)
+        # 2. Componer la capa: overlay repite su único frame durante todo el video
+        video = caption.overlay(video)
+        if profile.max_height:
+            video = video.filter("scale", -2, f"min({profile.max_height},ih)")
         # Tomamos el audio original sin cambios
         audio = input_video.audio
 
-        (
+        stream = (
             ffmpeg
-            .output(video, audio, output_path, 
-                    vcodec='libx264', 
-                    crf=18,             # Calidad alta (rango 18-23 es excelente)
-                    preset='slow',      # Mejor compresión/calidad
-                    acodec='copy')      # Copiar audio original sin pérdida
+            .output(video, audio, output_path, **profile.output_kwargs())
             .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True)
         )
+        with limit_threads(profile.threads):
+            await run_stream(stream, duration=profile.limit_duration(info['duration']))
 
         return output_path
 
@@ -88,10 +87,104 @@ def create_meme(video_path: str, text: str, template: TextStyle) -> str:
         logger.error(f"Error en create_meme: {e}")
         raise e
     finally:
-        # 3. Limpiar archivo temporal
-        if os.path.exists(ass_path):
+        # 3. Limpiar la capa temporal (la caché guarda su propia copia)
+        if caption and os.path.exists(caption.path):
             try:
-                os.remove(ass_path)
-                logger.info(f"Temporal .ass eliminado: {ass_path}")
+                os.remove(caption.path)
             except Exception as e:
                 logger.warning(f"No se pudo eliminar el temporal: {e}")
+
+
+def meme_batch_stream(video_path: str, captions: List[CaptionLayer], output_paths: List[str],
+                      profile: EncodingProfile, audio_path: Optional[str] = None):
+    """
+    Grafo de ffmpeg-python del lote: un `split` del video con una rama por
+    capa de texto y una salida por rama. El audio se copia en todas las
+    salidas: de `audio_path` (codificado una sola vez) si se indica, si no del
+    original (perfiles con audio `copy`).
+    """
+    input_kwargs = {"t": profile.max_seconds} if profile.max_seconds else {}
+    input_video = ffmpeg.input(video_path, **input_kwargs)
+    audio = ffmpeg.input(audio_path).audio if audio_path else input_video.audio
+    video = input_video.video
+    # El fps se ajusta antes del split: una sola vez para todas las ramas
+    if profile.max_fps:
+        video = video.filter("fps", profile.max_fps)
+    branches = video.filter_multi_output("split", len(captions))
+
+    output_kwargs = {**profile.output_kwargs(), "c:a": "copy"}
+    output_kwargs.pop("b:a", None)
+
+    outputs = []
+    for index, (caption, output_path) in enumerate(zip(captions, output_paths)):
+        branch = caption.overlay(branches[index])
+        if profile.max_height:
+            branch = branch.filter("scale", -2, f"min({profile.max_height},ih)")
+        outputs.append(ffmpeg.output(branch, audio, output_path, **output_kwargs))
+    return ffmpeg.merge_outputs(*outputs).overwrite_output()
+
+
+async def create_meme_batch(video_path: str, variants: List[Tuple[str, TextStyle]],
+                            profile: Optional[EncodingProfile] = None) -> List[str]:
+    """
+    Varias variantes de texto sobre el mismo video en un único proceso de
+    ffmpeg: se decodifica una sola vez y `split` reparte los frames a una rama
+    con la capa de texto de cada variante, cada una con su salida. El audio es
+    el mismo en todas: si el perfil no lo copia se codifica una vez antes y
+    cada salida copia ese resultado. Devuelve las rutas en el orden de
+    `variants`.
+    """
+    profile = profile or ProfileRegistry.resolve(default=EncodingProfileName.ARCHIVE)
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Video no encontrado: {video_path}")
+    if not variants:
+        return []
+
+    os.makedirs("resultado", exist_ok=True)
+
+    unique_id = uuid.uuid4().hex[:8]
+    output_paths = [os.path.abspath(os.path.join("resultado", f"meme_{unique_id}_{index}.mp4"))
+                    for index in range(len(variants))]
+    register_scratch(*output_paths)
+    captions = []
+    audio_path = None
+
+    try:
+        info = await get_video_info(video_path)
+        duration = profile.limit_duration(info['duration'])
+
+        for text, template in variants:
+            captions.append(await render_caption_overlay(text, template, info['width'], info['height']))
+
+        logger.info(f"Procesando {len(variants)} variantes de meme en un solo render")
+
+        with limit_threads(profile.threads):
+            if not profile.copies_audio():
+                audio_path = os.path.abspath(os.path.join("resultado", f"meme_{unique_id}_audio.m4a"))
+                register_scratch(audio_path)
+                input_kwargs = {"t": profile.max_seconds} if profile.max_seconds else {}
+                audio_stream = (
+                    ffmpeg
+                    .output(ffmpeg.input(video_path, **input_kwargs).audio, audio_path, **profile.audio_kwargs())
+                    .overwrite_output()
+                )
+                with stage(0.0, 0.05):
+                    await run_stream(audio_stream, duration=duration)
+
+            stream = meme_batch_stream(video_path, captions, output_paths, profile, audio_path)
+            with stage(0.05 if audio_path else 0.0, 1.0):
+                await run_stream(stream, duration=duration)
+
+        return output_paths
+
+    except ffmpeg.Error as e:
+        stderr = e.stderr.decode() if e.stderr else str(e)
+        logger.error(f"FFmpeg error: {stderr}")
+        raise Exception(f"FFmpeg falló: {stderr}")
+    finally:
+        for path in [caption.path for caption in captions] + ([audio_path] if audio_path else []):
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"No se pudo eliminar el temporal: {e}")
@@ -0,0 +1,158 @@
+import os
+import uuid
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Union
+from app.core.config import settings
+from app.core.encoding_profiles import EncodingProfile, EncodingProfileName, ProfileRegistry
+from app.core.video_styles import TextStyle
+from app.services.segment_graph import cut_filter_graph, limit_segments, snap_segments, quote
+from app.services.silence_analysis import detect_speech, VIDEO_CUT
+from app.services.video.ass_service import AssService
+from app.services.video.zoom_pan import (
+    ZoomConfig, get_video_info, calculate_zoom_frames, zoom_filter
+)
+from app.utils.ffmpeg_progress import stage
+from app.utils.ffmpeg_runner import run_ffmpeg, probe
+from app.utils.job_control import register_scratch, limit_threads
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CutStep:
+    pass
+
+
+@dataclass
+class ZoomStep:
+    config: ZoomConfig
+
+
+@dataclass
+class MemeStep:
+    text: str
+    template: TextStyle
+
+
+PipelineStep = Union[CutStep, ZoomStep, MemeStep]
+
+
+async def render_pipeline(input_file: str, steps: List[PipelineStep],
+                          profile: Optional[EncodingProfile] = None) -> str:
+    """
+    Aplica corte de silencios, zoom y meme en el orden de `steps` en un
+    único grafo de filtros: una decodificación y una codificación en lugar de
+    una por operación. Ninguna operación cambia el ritmo del video, así que
+    el corte siempre se expresa en tiempos del original. Los pasos anteriores
+    al corte van antes del `select` y se calculan sobre el original (un zoom
+    puede caer en un silencio y desaparecer); los posteriores, sobre la
+    duración ya cortada.
+    """
+    profile = profile or ProfileRegistry.resolve(default=EncodingProfileName.ARCHIVE)
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"Input file not found: {input_file}")
+
+    os.makedirs(settings.TEMP_DIR, exist_ok=True)
+    unique_id = uuid.uuid4().hex[:8]
+    output_path = os.path.join(settings.TEMP_DIR, f"pipeline_{unique_id}.mp4")
+    graph_file = os.path.join(settings.TEMP_DIR, f"pipeline_{unique_id}.graph.txt")
+    # Rutas con "/" para las opciones de los filtros (como en create_meme)
+    ass_path = os.path.join(settings.TEMP_DIR, f"pipeline_{unique_id}.ass").replace("\\", "/")
+    register_scratch(output_path, graph_file, ass_path)
+
+    video_info = await get_video_info(input_file)
+    width, height = video_info["width"], video_info["height"]
+    duration = video_info["duration"]
+    fps = float(video_info["fps"]) if isinstance(video_info["fps"], (int, float)) else 30.0
+    info = await probe(input_file)
+    audio = next((s for s in info["streams"] if s.get("codec_type") == "audio"), None)
+    has_audio = audio is not None
+    sample_rate = int(audio["sample_rate"]) if audio and audio.get("sample_rate") else None
+    source_fps = fps
+
+    cut = any(isinstance(step, CutStep) for step in steps)
+
+    try:
+        with limit_threads(profile.threads):
+            segments = None
+            timeline = profile.limit_duration(duration)
+            if cut:
+                with stage(0.0, 0.2):
+                    segments = await detect_speech(input_file, VIDEO_CUT, duration)
+                if not segments:
+                    raise Exception("No segments found")
+                segments = snap_segments(segments, fps)
+                if profile.max_seconds:
+                    segments = limit_segments(segments, profile.max_seconds)
+                timeline = sum(end - start for start, end in segments)
+
+            # Resolución del perfil antes del zoom y del ass, no después. Con
+            # corte los fps se reducen tras el select, que trabaja en la
+            # rejilla de frames del original
+            filters = []
+            before_cut = None
+            if profile.max_height and height > profile.max_height:
+                width = int(round(width * profile.max_height / height / 2)) * 2
+                height = profile.max_height
+                filters.append(f"scale={width}:{height}")
+            reduce_fps = profile.max_fps if profile.max_fps and profile.max_fps < fps else None
+            if reduce_fps and not cut:
+                filters.append(f"fps={reduce_fps}")
+                fps = reduce_fps
+            step_duration = duration if cut else timeline
+
+            for step in steps:
+                if isinstance(step, CutStep):
+                    before_cut, filters = filters, []
+                    if reduce_fps:
+                        filters.append(f"fps={reduce_fps}")
+                        fps = reduce_fps
+                    step_duration = timeline
+                elif isinstance(step, ZoomStep):
+                    frames = calculate_zoom_frames(step_duration, step.config)
+                    filters.append(zoom_filter(frames, step.config, fps, width, height))
+                elif isinstance(step, MemeStep):
+                    step.template.prepare_for_video(width, height)
+                    AssService.generate_ass(
+                        output_path=ass_path,
+                        text=step.text,
+                        duration=step_duration,
+                        width=width,
+                        height=height,
+                        template=step.template
+                    )
+                    filters.append(f"ass=filename={quote(ass_path)}")
+
+            video_filter = ",".join(filters) or None
+            cmd = ["ffmpeg"]
+            if segments is not None:
+                # Los segmentos ya están en la rejilla de frames
+                graph = cut_filter_graph(segments, audio=has_audio, video_filter=video_filter,
+                                         frame_rate=source_fps, sample_rate=sample_rate,
+                                         source_filter=",".join(before_cut) or None)
+                audio_map = ["-map", "[aout]", *profile.audio_args(filtered=True)] if has_audio else []
+            else:
+                if profile.max_seconds:
+                    cmd += ["-t", f"{timeline:.6f}"]
+                graph = f"[0:v]{video_filter or 'null'}[vout]"
+                audio_map = ["-map", "0:a?", *profile.audio_args()]
+            with open(graph_file, "w") as f:
+                f.write(graph)
+
+            cmd += [
+                "-i", input_file,
+                "-filter_complex_script", graph_file,
+                "-map", "[vout]", *audio_map,
+                *profile.video_args(),
+                "-y",
+                output_path,
+            ]
+            logger.info(f"Pipeline {[type(step).__name__ for step in steps]}: {timeline:.1f}s de salida")
+            with stage(0.2 if cut else 0.0, 1.0):
+                await run_ffmpeg(cmd, duration=timeline)
+        return output_path
+    finally:
+        for path in (graph_file, ass_path):
+            if os.path.exists(path):
+                os.remove(path)
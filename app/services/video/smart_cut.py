@@ -0,0 +1,259 @@
+import os
+import bisect
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from app.utils.ffmpeg_progress import ParallelProgress, stage
+from app.utils.ffmpeg_runner import run_ffmpeg, run_parallel, probe, probe_keyframes
+from app.utils.job_control import current_task_id
+from app.services.segment_graph import write_cut_graph, snap_segments
+from app.core.encoding_profiles import EncodingProfile, EncodingProfileName, ProfileRegistry
+
+logger = logging.getLogger(__name__)
+
+Segment = Tuple[float, float]
+
+# Códecs que sabemos recodificar con parámetros compatibles con el original
+SMART_CUT_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+SMART_CUT_CONTAINERS = {".mp4", ".mov", ".mkv"}
+
+_X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+    "High 10": "high10",
+    "High 4:2:2": "high422",
+    "High 4:4:4 Predictive": "high444",
+}
+
+# ffprobe informa "Rext" para todos los perfiles de rango extendido: x265 los
+# distingue por submuestreo y profundidad, que se sacan del pix_fmt
+_X265_PROFILES = {
+    "Main": "main",
+    "Main 10": "main10",
+    "Main Still Picture": "mainstillpicture",
+}
+_X265_REXT_PROFILES = {
+    "yuv420p10le": "main10",
+    "yuv420p12le": "main12",
+    "yuv422p10le": "main422-10",
+    "yuv422p12le": "main422-12",
+    "yuv444p": "main444-8",
+    "yuv444p10le": "main444-10",
+    "yuv444p12le": "main444-12",
+}
+
+# Desfase para que `-ss` con copia no caiga en el keyframe anterior por redondeo
+SEEK_EPSILON = 0.001
+
+
+class SmartCutUnsupported(Exception):
+    pass
+
+
+@dataclass
+class SourceVideo:
+    codec: str
+    encoder: str
+    profile: Optional[str]
+    level: Optional[int]
+    pix_fmt: Optional[str]
+    frame_rate: str
+    frame_duration: float
+    has_audio: bool
+    sample_rate: Optional[int] = None
+
+
+@dataclass
+class Piece:
+    start: float
+    end: float
+    copy: bool
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+async def inspect_source(input_file: str) -> SourceVideo:
+    info = await probe(input_file)
+    video = next((s for s in info["streams"] if s.get("codec_type") == "video"), None)
+    if video is None:
+        raise SmartCutUnsupported("el archivo no tiene video")
+    codec = video.get("codec_name")
+    if codec not in SMART_CUT_ENCODERS:
+        raise SmartCutUnsupported(f"códec {codec} no soportado")
+
+    frame_rate = video.get("avg_frame_rate") or video.get("r_frame_rate") or "30/1"
+    num, _, den = frame_rate.partition("/")
+    try:
+        fps = float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        fps = 0
+    if fps <= 0:
+        frame_rate, fps = "30/1", 30.0
+
+    audio = next((s for s in info["streams"] if s.get("codec_type") == "audio"), None)
+    return SourceVideo(
+        codec=codec,
+        encoder=SMART_CUT_ENCODERS[codec],
+        profile=video.get("profile"),
+        level=video.get("level"),
+        pix_fmt=video.get("pix_fmt"),
+        frame_rate=frame_rate,
+        frame_duration=1.0 / fps,
+        has_audio=audio is not None,
+        sample_rate=int(audio["sample_rate"]) if audio and audio.get("sample_rate") else None,
+    )
+
+
+def plan_pieces(segments: List[Segment], keyframes: List[float], frame_duration: float) -> List[Piece]:
+    """
+    Parte cada segmento en: cabeza hasta el primer keyframe (recodificar),
+    GOPs completos entre keyframes (copiar) y cola desde el último keyframe
+    (recodificar). Si el segmento no contiene un GOP completo se recodifica entero.
+    """
+    pieces: List[Piece] = []
+    for start, end in segments:
+        first = bisect.bisect_left(keyframes, start - frame_duration / 2)
+        last = bisect.bisect_right(keyframes, end + frame_duration / 2) - 1
+        if first >= len(keyframes) or last < first or keyframes[last] - keyframes[first] < frame_duration:
+            pieces.append(Piece(start, end, copy=False))
+            continue
+
+        copy_start, copy_end = keyframes[first], keyframes[last]
+        if copy_start - start >= frame_duration:
+            pieces.append(Piece(start, copy_start, copy=False))
+        pieces.append(Piece(copy_start, copy_end, copy=True))
+        if end - copy_end >= frame_duration:
+            pieces.append(Piece(copy_end, end, copy=False))
+    return pieces
+
+
+def encoder_args(source: SourceVideo, profile: Optional[EncodingProfile] = None) -> List[str]:
+    """
+    Parámetros de codificación que imitan el stream original para poder unirlo
+    por copia. Códec, fps, pix_fmt, perfil y nivel salen del original; preset y
+    CRF del perfil si se indica (si no, veryfast/18, casi sin pérdida frente a
+    lo copiado). El GOP se cierra siempre: x265 los abre por defecto y un
+    tramo copiado a continuación no puede depender de frames recodificados.
+    """
+    preset, crf = (profile.preset, profile.crf) if profile else ("veryfast", 18)
+    args = ["-c:v", source.encoder, "-preset", preset, "-crf", str(crf), "-r", source.frame_rate]
+    if source.pix_fmt:
+        args += ["-pix_fmt", source.pix_fmt]
+    if source.encoder == "libx264":
+        x264_profile = _X264_PROFILES.get(source.profile or "")
+        if x264_profile:
+            args += ["-profile:v", x264_profile]
+        if source.level and source.level > 0:
+            args += ["-level", f"{source.level / 10:.1f}"]
+        args += ["-flags", "+cgop"]
+    else:
+        x265_profile = _X265_PROFILES.get(source.profile or "")
+        if source.profile == "Rext":
+            x265_profile = _X265_REXT_PROFILES.get(source.pix_fmt or "")
+        if x265_profile:
+            args += ["-profile:v", x265_profile]
+        args += ["-x265-params", "open-gop=0"]
+    return args
+
+
+async def render_piece(input_file: str, piece: Piece, output_path: str, source: SourceVideo,
+                       video_filter: Optional[str] = None, profile: Optional[EncodingProfile] = None):
+    """
+    Escribe solo el video del tramo en MPEG-TS (parámetros del códec en banda).
+    `video_filter` y el preset/CRF de `profile` se aplican a los tramos que se
+    recodifican (p.ej. el zoom).
+    Los tramos recodificados se limitan a su número exacto de frames para que
+    la suma de los trozos coincida con el audio recortado en la rejilla.
+    """
+    if piece.copy:
+        codec = ["-c:v", "copy"]
+        seek = piece.start + SEEK_EPSILON
+    else:
+        codec = encoder_args(source, profile)
+        if video_filter:
+            codec = ["-vf", video_filter, *codec]
+        codec += ["-frames:v", str(max(1, round(piece.duration / source.frame_duration)))]
+        seek = piece.start
+    await run_ffmpeg([
+        "ffmpeg",
+        "-ss", f"{seek:.6f}",
+        "-i", input_file,
+        "-t", f"{piece.end - seek:.6f}",
+        "-map", "0:v:0",
+        "-an", "-sn", "-dn",
+        *codec,
+        "-avoid_negative_ts", "make_zero",
+        "-f", "mpegts",
+        "-y",
+        output_path,
+    ], duration=piece.duration)
+
+
+async def smart_cut(input_file: str, segments: List[Segment], output_path: str, temp_dir: str,
+                    workers: int, profile: Optional[EncodingProfile] = None) -> str:
+    """
+    Corte sin recodificar lo que no hace falta: los GOPs completos se copian y
+    solo se recodifican los fragmentos parciales junto a cada corte, con los
+    parámetros del original. El audio (barato) se recorta y codifica una vez
+    en la unión final. Los cortes se ajustan antes a la rejilla de frames,
+    así los trozos de video y el audio recortado miden lo mismo y no hay
+    deriva. Del perfil solo se usa el audio: el video tiene que coincidir con
+    el original.
+    """
+    profile = profile or ProfileRegistry.resolve(default=EncodingProfileName.FAST)
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension not in SMART_CUT_CONTAINERS:
+        raise SmartCutUnsupported(f"contenedor {extension} no soportado")
+
+    source = await inspect_source(input_file)
+    with stage(0.0, 0.05):
+        keyframes = await probe_keyframes(input_file)
+    if not keyframes:
+        raise SmartCutUnsupported("no se encontraron keyframes")
+
+    segments = snap_segments(segments, 1.0 / source.frame_duration)
+    pieces = plan_pieces(segments, keyframes, source.frame_duration)
+    copied = sum(p.duration for p in pieces if p.copy)
+    total = sum(p.duration for p in pieces) or 1.0
+    logger.info(
+        f"Smart cut: {len(pieces)} tramos, {copied / total:.0%} por copia, "
+        f"{sum(1 for p in pieces if not p.copy)} recodificados"
+    )
+
+    def job(index: int):
+        piece_path = os.path.join(temp_dir, f"piece_{index}.ts")
+
+        async def render() -> str:
+            await render_piece(input_file, pieces[index], piece_path, source)
+            return piece_path
+        return render
+
+    progress = ParallelProgress(current_task_id.get(), len(pieces), 0.05, 0.8)
+    piece_paths = await run_parallel([job(i) for i in range(len(pieces))], workers, progress)
+
+    concat_file = os.path.join(temp_dir, "pieces.txt")
+    with open(concat_file, "w") as f:
+        for path in piece_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+
+    cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", concat_file]
+    if source.has_audio:
+        graph_file = write_cut_graph(os.path.join(temp_dir, "audio_graph.txt"), segments,
+                                     video=False, audio_input="1:a",
+                                     frame_rate=1.0 / source.frame_duration,
+                                     sample_rate=source.sample_rate)
+        cmd += ["-i", input_file, "-filter_complex_script", graph_file, "-map", "0:v", "-map", "[aout]",
+                *profile.audio_args(filtered=True)]
+    else:
+        cmd += ["-map", "0:v"]
+    if extension in (".mp4", ".mov"):
+        cmd += ["-movflags", "+faststart"]
+    cmd += ["-c:v", "copy", "-y", output_path]
+
+    with stage(0.8, 1.0):
+        await run_ffmpeg(cmd, duration=sum(end - start for start, end in segments))
+    return output_path
@@ -1,11 +1,34 @@
 import os
+import math
+import uuid
+import bisect
+import shutil
 import ffmpeg
 import logging
-from typing import Optional, List, Tuple, Dict
+from fractions import Fraction
+from typing import Optional, List, Tuple
 from dataclasses import dataclass
+from app.utils.ffmpeg_progress import ParallelProgress, stage
+from app.utils.ffmpeg_runner import run_stream, run_ffmpeg, run_parallel, probe, probe_keyframes
+from app.utils.job_control import register_scratch, limit_threads, current_task_id
+from app.services.video.smart_cut import (
+    Piece, SmartCutUnsupported, SMART_CUT_CONTAINERS, inspect_source, render_piece
+)
+from app.core.config import settings
+from app.core.encoding_profiles import EncodingProfile, EncodingProfileName, ProfileRegistry
+from app.services.video.cut import chunk_workers
+from app.services.segment_graph import quote
 
 logger = logging.getLogger(__name__)
 
+# Rangos admitidos de ZoomConfig cuando llega de una petición: (tipo, mínimo, máximo)
+ZOOM_LIMITS = {
+    "num_zooms": (int, 0, 500),
+    "zoom_duration": (float, 0.1, 60.0),
+    "target_zoom": (float, 1.0, 4.0),
+}
+
+
 @dataclass
 class ZoomConfig:
     num_zooms: int = 7
@@ -13,16 +36,39 @@ class ZoomConfig:
     target_zoom: float = 1.25
     smooth_return: bool = False
 
+    @classmethod
+    def from_params(cls, params: dict) -> "ZoomConfig":
+        """Construye la configuración desde parámetros externos; ValueError si sobran claves o algún valor no vale."""
+        unknown = set(params) - set(ZOOM_LIMITS) - {"smooth_return"}
+        if unknown:
+            raise ValueError(f"parámetros de zoom desconocidos: {', '.join(sorted(unknown))}")
+        values = {}
+        for key, (kind, low, high) in ZOOM_LIMITS.items():
+            if key not in params:
+                continue
+            value = params[key]
+            # bool es subclase de int: "num_zooms": true no es un número
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or (kind is int and not isinstance(value, int)):
+                raise ValueError(f"{key} debe ser {'un entero' if kind is int else 'un número'}")
+            if not low <= value <= high:
+                raise ValueError(f"{key} debe estar entre {low} y {high}")
+            values[key] = kind(value)
+        if "smooth_return" in params:
+            if not isinstance(params["smooth_return"], bool):
+                raise ValueError("smooth_return debe ser true o false")
+            values["smooth_return"] = params["smooth_return"]
+        return cls(**values)
+
 
-def get_video_info(input_file: str) -> dict:
+async def get_video_info(input_file: str) -> dict:
     try:
-        probe = ffmpeg.probe(input_file)
-        video_stream = next((s for s in probe['streams'] if s['codec_type'] == 'video'), None)
+        info = await probe(input_file)
+        video_stream = next((s for s in info['streams'] if s['codec_type'] == 'video'), None)
         if not video_stream:
             raise Exception("No video stream found")
 
         return {
-            "duration": float(probe['format']['duration']),
+            "duration": float(info['format']['duration']),
             "width": int(video_stream['width']),
             "height": int(video_stream['height']),
             "fps": eval(video_stream.get('r_frame_rate', '30/1'))
@@ -47,6 +93,11 @@ def calculate_zoom_frames(duration: float, config: ZoomConfig) -> List[Tuple[flo
 
 
 def build_zoom_expressions(frames: List[Tuple[float, float]], target_zoom: float, smooth_return: bool = True) -> Tuple[str, str, str]:
+    """
+    Expresiones de `zoompan` del motor anterior: un `if(between(...))` anidado
+    por ventana, evaluado entero en cada frame. Ya no se usa para renderizar;
+    se conserva como referencia para scripts/bench_zoom_engine.py.
+    """
     zoom_expr = "1"
     x_expr = "iw/2-(iw/zoom/2)"
     y_expr = "ih/2-(ih/zoom/2)"
@@ -78,12 +129,193 @@ def build_zoom_expressions(frames: List[Tuple[float, float]], target_zoom: float
     return zoom_expr, x_expr, y_expr
 
 
-def zoom_pan(input_file: str, output_file: Optional[str] = None, config: Optional[ZoomConfig] = None) -> str:
+# Ventana de zoom sin solapes: (desde, hasta, inicio, fin). `desde`/`hasta`
+# son los límites (s) del tramo en que manda la ventana, a medio frame de
+# sus frames extremos; `inicio`/`fin` son los de la curva
+ZoomWindow = Tuple[float, float, float, float]
+
+
+def zoom_windows(frames: List[Tuple[float, float]], fps: float) -> List[ZoomWindow]:
+    """
+    Ventanas de zoom ordenadas y sin solapes sobre la rejilla de frames. Si
+    dos se solapan manda la que va después en `frames`, como en las
+    expresiones anidadas: a las anteriores se les quitan esos frames (una
+    ventana que contiene a otra queda partida en dos).
+    """
+    windows: List[Tuple[int, int, float, float]] = []
+    for start, end in frames:
+        if end - start <= 0:
+            continue
+        first, last = math.ceil(start * fps), math.floor(end * fps)
+        if last < first:
+            continue
+        remaining = []
+        for window in windows:
+            if window[1] < first or window[0] > last:
+                remaining.append(window)
+                continue
+            if window[0] < first:
+                remaining.append((window[0], first - 1, *window[2:]))
+            if window[1] > last:
+                remaining.append((last + 1, window[1], *window[2:]))
+        windows = remaining + [(first, last, start, end)]
+    return [((first - 0.5) / fps, (last + 0.5) / fps, start, end) for first, last, start, end in sorted(windows)]
+
+
+def zoom_expression(frames: List[Tuple[float, float]], target_zoom: float, smooth_return: bool,
+                    fps: float) -> str:
+    """
+    Expresión `z` de zoompan: la misma curva que `build_zoom_expressions`
+    (seno completo de ida y vuelta o medio seno con corte seco) pero en un
+    árbol binario `if(lt(it,corte),izq,der)` sobre las ventanas, como
+    `select_expression`: O(log n) comparaciones por frame en lugar de n.
+    """
+    windows = zoom_windows(frames, fps)
+    if not windows:
+        return "1"
+    multiplier = math.pi if smooth_return else math.pi / 2
+
+    def build(lo: int, hi: int) -> str:
+        if hi - lo == 1:
+            low, high, start, end = windows[lo]
+            curve = f"1+{target_zoom - 1:.6f}*sin((it-{start:.6f})/{end - start:.6f}*{multiplier:.8f})"
+            return f"if(between(it,{low:.6f},{high:.6f}),max(1,{curve}),1)"
+        mid = (lo + hi) // 2
+        return f"if(lt(it,{windows[mid][0]:.6f}),{build(lo, mid)},{build(mid, hi)})"
+
+    return build(0, len(windows))
+
+
+def zoom_filter(frames: List[Tuple[float, float]], config: ZoomConfig, fps: float, width: int, height: int) -> str:
+    """
+    Cadena de filtros (texto) del motor de zoom: un `zoompan` de un frame de
+    salida por frame de entrada y tamaño fijo, acercándose hacia la esquina
+    inferior derecha. El tamaño de todos los enlaces del grafo es constante.
+    """
+    expression = zoom_expression(frames, config.target_zoom, config.smooth_return, fps)
+    return (
+        f"zoompan=z={quote(expression)}:x='iw-iw/zoom':y='ih-ih/zoom':d=1"
+        f":s={width}x{height}:fps={frame_rate(fps)},setsar=1"
+    )
+
+
+def frame_rate(fps: float) -> str:
+    """fps como fracción para ffmpeg (29.97 -> 30000/1001)."""
+    rate = Fraction(fps).limit_denominator(1001)
+    return f"{rate.numerator}/{rate.denominator}"
+
+
+def plan_zoom_pieces(frames: List[Tuple[float, float]], keyframes: List[float], duration: float) -> List[Piece]:
+    """
+    Tramos a recodificar (cada ventana de zoom ampliada a los keyframes que la
+    rodean; las que se tocan se fusionan) y tramos a copiar entre ellos. Todos
+    los cortes caen en keyframes, así que los tramos copiados son GOPs completos.
+    """
+    regions: List[Tuple[float, float]] = []
+    for start, end in sorted(frames):
+        if end - start <= 0:
+            continue
+        first = bisect.bisect_right(keyframes, start) - 1
+        region_start = keyframes[first] if first >= 0 else 0.0
+        last = bisect.bisect_left(keyframes, end)
+        region_end = keyframes[last] if last < len(keyframes) else duration
+        if regions and region_start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], max(regions[-1][1], region_end))
+        else:
+            regions.append((region_start, region_end))
+
+    pieces: List[Piece] = []
+    position = 0.0
+    for start, end in regions:
+        if start > position:
+            pieces.append(Piece(position, start, copy=True))
+        pieces.append(Piece(start, end, copy=False))
+        position = end
+    if duration > position:
+        pieces.append(Piece(position, duration, copy=True))
+    return pieces
+
+
+async def render_zoom_windows(input_file: str, frames: List[Tuple[float, float]], config: ZoomConfig,
+                              output_file: str, temp_dir: str, workers: int, duration: float,
+                              width: int, height: int, fps: float,
+                              profile: Optional[EncodingProfile] = None) -> str:
+    """
+    Zoom recodificando solo las ventanas animadas: cada tramo de
+    `plan_zoom_pieces` se recodifica con el zoom (con el preset y el CRF de
+    `profile` y los parámetros de códec del original) o se copia, se unen con
+    el demuxer concat y el audio original se copia tal cual en la unión. Los
+    tramos empiezan y acaban en keyframes de GOP cerrado (`probe_keyframes`).
+    """
+    extension = os.path.splitext(output_file)[1].lower()
+    if extension not in SMART_CUT_CONTAINERS:
+        raise SmartCutUnsupported(f"contenedor {extension} no soportado")
+
+    source = await inspect_source(input_file)
+    with stage(0.0, 0.05):
+        keyframes = await probe_keyframes(input_file)
+    if not keyframes:
+        raise SmartCutUnsupported("no se encontraron keyframes")
+
+    pieces = plan_zoom_pieces(frames, keyframes, duration)
+    encoded = sum(p.duration for p in pieces if not p.copy)
+    logger.info(
+        f"Zoom por ventanas: {len(pieces)} tramos, {encoded / (duration or 1.0):.0%} recodificado"
+    )
+
+    def job(index: int):
+        piece = pieces[index]
+        piece_path = os.path.join(temp_dir, f"piece_{index}.ts")
+
+        async def render() -> str:
+            video_filter = None
+            if not piece.copy:
+                # Ventanas del tramo en tiempos relativos a su inicio
+                local = [(start - piece.start, end - piece.start) for start, end in frames
+                         if start < piece.end and end > piece.start]
+                video_filter = zoom_filter(local, config, fps, width, height)
+            await render_piece(input_file, piece, piece_path, source, video_filter, profile)
+            return piece_path
+        return render
+
+    progress = ParallelProgress(current_task_id.get(), len(pieces), 0.05, 0.9)
+    piece_paths = await run_parallel([job(i) for i in range(len(pieces))], workers, progress)
+
+    concat_file = os.path.join(temp_dir, "pieces.txt")
+    with open(concat_file, "w") as f:
+        for path in piece_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+
+    cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", concat_file, "-i", input_file,
+           "-map", "0:v", "-map", "1:a?", "-c", "copy"]
+    if extension in (".mp4", ".mov"):
+        cmd += ["-movflags", "+faststart"]
+    cmd += ["-y", output_file]
+
+    with stage(0.9, 1.0):
+        await run_ffmpeg(cmd, duration=duration)
+    return output_file
+
+
+async def zoom_pan(input_file: str, output_file: Optional[str] = None, config: Optional[ZoomConfig] = None,
+                   profile: Optional[EncodingProfile] = None, smart_zoom: bool = False) -> str:
+    """
+    Zooms suaves con un `zoompan` de tamaño fijo cuya expresión es un árbol
+    binario sobre las ventanas (`zoom_expression`): cada frame evalúa
+    O(log n) comparaciones, así que el coste apenas depende del número de
+    ventanas.
+
+    Con `smart_zoom` solo se recodifican las ventanas de zoom y el resto se
+    copia (ver `render_zoom_windows`); requiere un perfil que no cambie
+    resolución, fps ni duración y un origen que lo admita, si no se
+    recodifica completo.
+    """
     if not os.path.exists(input_file):
         raise FileNotFoundError(f"Input file not found: {input_file}")
 
     if config is None:
         config = ZoomConfig()
+    profile = profile or ProfileRegistry.resolve(default=EncodingProfileName.ARCHIVE)
 
     if output_file is None:
         base, ext = os.path.splitext(input_file)
@@ -91,9 +323,10 @@ def zoom_pan(input_file: str, output_file: Optional[str] = None, config: Optiona
         output_file = os.path.join("temp", f"{os.path.basename(base)}_smartzoom{ext}")
 
     os.makedirs(os.path.dirname(output_file) or "temp", exist_ok=True)
+    register_scratch(output_file)
 
     try:
-        video_info = get_video_info(input_file)
+        video_info = await get_video_info(input_file)
         width = video_info['width']
         height = video_info['height']
         duration = video_info['duration']
@@ -105,36 +338,62 @@ def zoom_pan(input_file: str, output_file: Optional[str] = None, config: Optiona
         
         logger.info(f"Config: {config}")
         logger.info(f"Zoom Frames: {zoom_frames}")
-        
-        z_expr, x_expr, y_expr = build_zoom_expressions(zoom_frames, config.target_zoom, config.smooth_return)
-        
-        logger.info(f"Zoom Expr: {z_expr}")
-        
-        in_stream = ffmpeg.input(input_file)
-        
-        video = in_stream.video.filter(
-            'zoompan',
-            z=z_expr,
-            x=x_expr,
-            y=y_expr,
-            d=1,
-            s=f'{width}x{height}',
-            fps=fps
+
+        if smart_zoom and (profile.video_filter() or profile.max_seconds):
+            logger.info(f"Smart zoom no compatible con el perfil {profile.name}; se recodifica completo")
+        elif smart_zoom:
+            temp_dir = os.path.join(settings.TEMP_DIR, f"zoom_{uuid.uuid4().hex[:8]}")
+            os.makedirs(temp_dir, exist_ok=True)
+            register_scratch(temp_dir)
+            try:
+                with limit_threads(profile.threads):
+                    # Como mucho una ventana recodificada y un tramo copiado por zoom
+                    workers = chunk_workers(len(zoom_frames) * 2 + 1)
+                    return await render_zoom_windows(input_file, zoom_frames, config, output_file, temp_dir,
+                                                     workers, duration, width, height, fps, profile)
+            except SmartCutUnsupported as e:
+                logger.warning(f"Smart zoom no disponible para {input_file} ({e}); se recodifica completo")
+            except ffmpeg.Error as e:
+                # Un tramo que ffmpeg no sabe copiar o recodificar no debe tumbar el zoom
+                stderr = (e.stderr or b"").decode(errors="replace").strip().splitlines()
+                logger.warning(f"Smart zoom falló para {input_file} ({stderr[-1] if stderr else e}); se recodifica completo")
+            finally:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+        # Los zooms se calculan sobre el video completo: una previsualización
+        # limitada a los primeros segundos muestra lo mismo que el render final
+        input_kwargs = {"t": profile.max_seconds} if profile.max_seconds else {}
+        in_stream = ffmpeg.input(input_file, **input_kwargs)
+        video = in_stream.video
+
+        # Reducir fps y resolución antes del zoom y no después
+        if profile.max_fps and profile.max_fps < fps:
+            video = video.filter('fps', profile.max_fps)
+            fps = profile.max_fps
+        if profile.max_height and height > profile.max_height:
+            width = int(round(width * profile.max_height / height / 2)) * 2
+            height = profile.max_height
+            video = video.filter('scale', width, height)
+
+        logger.info(f"Zoom: {len(zoom_frames)} ventanas")
+        video = (
+            video
+            .filter('zoompan', z=zoom_expression(zoom_frames, config.target_zoom, config.smooth_return, fps),
+                    x='iw-iw/zoom', y='ih-ih/zoom', d=1, s=f"{width}x{height}", fps=frame_rate(fps))
+            .filter('setsar', 1)
         )
-        
+
         audio = in_stream.audio
         
         out = ffmpeg.output(
             video, 
             audio, 
             output_file, 
-            vcodec='libx264', 
-            crf=18, 
-            preset='slow', 
-            acodec='copy'
+            **profile.output_kwargs()
         )
         
-        out.run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+        with limit_threads(profile.threads):
+            await run_stream(out.overwrite_output(), duration=profile.limit_duration(duration))
         
         return output_file
         
@@ -142,3 +401,4 @@ def zoom_pan(input_file: str, output_file: Optional[str] = None, config: Optiona
         error_log = e.stderr.decode() if e.stderr else str(e)
         logger.error(f"FFmpeg error: {error_log}")
         raise Exception(f"FFmpeg error: {error_log[-500:]}") from e
+
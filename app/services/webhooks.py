@@ -0,0 +1,251 @@
+import asyncio
+import ipaddress
+import socket
+import time
+import logging
+from typing import Awaitable, Dict, Optional, Set, Tuple
+from urllib.parse import urlparse
+import httpx
+from app.core.config import settings
+from app.utils.job_control import JobCancelled
+
+logger = logging.getLogger(__name__)
+
+# Respuestas que no mejoran reintentando
+_PERMANENT_FAILURES = {400, 401, 403, 404, 405, 410, 413, 422}
+
+
+# Claves del resultado síncrono que no tienen sentido fuera de este servidor
+_LOCAL_ONLY_KEYS = ("file_path",)
+
+
+def _is_public_address(address: str) -> bool:
+    try:
+        return ipaddress.ip_address(address.split("%")[0]).is_global
+    except ValueError:
+        return False
+
+
+def is_valid_callback_url(url: str) -> bool:
+    """
+    URL http(s) con host. Salvo WEBHOOK_ALLOW_PRIVATE, rechaza hosts locales y
+    direcciones IP no públicas (loopback, privadas, link-local); los nombres
+    se resuelven de nuevo antes de cada entrega (`resolves_to_public`).
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    if settings.WEBHOOK_ALLOW_PRIVATE:
+        return True
+    host = parsed.hostname.lower()
+    if host == "localhost" or host.endswith((".localhost", ".local", ".internal")):
+        return False
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return True
+    return _is_public_address(host)
+
+
+async def resolves_to_public(url: str) -> bool:
+    """True si todas las direcciones del host del callback son públicas."""
+    if settings.WEBHOOK_ALLOW_PRIVATE:
+        return True
+    parsed = urlparse(url)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80),
+            type=socket.SOCK_STREAM,
+        )
+    except OSError:
+        # Un fallo de DNS se trata como error de red y se reintenta
+        return True
+    return all(_is_public_address(info[4][0]) for info in infos)
+
+
+class WebhookSender:
+    """
+    Envío asíncrono y acotado de webhooks de finalización.
+
+    Las entregas se encolan en una cola de tamaño máximo `queue_size` que
+    consumen `workers` corrutinas con un único cliente httpx. Los reintentos
+    con backoff exponencial se reprograman con `call_later` en lugar de dormir
+    en el worker, así un receptor lento solo ocupa un worker durante `timeout`.
+
+    Al apagar (`stop`) se espera a los trabajos con callback aún en marcha, se
+    adelantan los reintentos programados y se vacía la cola durante como
+    mucho `drain_timeout` segundos; lo que quede se registra como descartado.
+    """
+
+    def __init__(self, workers: int, queue_size: int, max_attempts: int, backoff: float, timeout: float,
+                 drain_timeout: float = 15):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.timeout = timeout
+        self.drain_timeout = drain_timeout
+        # Reintentos programados con call_later: clave -> (handle, entrega)
+        self._retries: Dict[object, Tuple[asyncio.TimerHandle, tuple]] = {}
+        self._draining = False
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._workers: list = []
+        self.delivered_count = 0
+        self.failed_count = 0
+        self.dropped_count = 0
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._client = httpx.AsyncClient(timeout=self.timeout)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Webhook sender started with {self.workers} workers")
+
+    async def stop(self):
+        deadline = time.monotonic() + self.drain_timeout
+        self._draining = True
+        if _background:
+            await asyncio.wait(list(_background), timeout=self.drain_timeout)
+        # Los reintentos programados se adelantan en lugar de perderse
+        for key, (handle, item) in list(self._retries.items()):
+            handle.cancel()
+            del self._retries[key]
+            self._put(*item)
+        if self._queue is not None and self._workers:
+            try:
+                await asyncio.wait_for(self._queue.join(), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                pass
+        lost = self._queue.qsize() if self._queue else 0
+        if lost:
+            self.dropped_count += lost
+            logger.error(f"Webhook sender stopped with {lost} undelivered callbacks")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._draining = False
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def enqueue(self, url: str, payload: dict, attempt: int = 1):
+        """Encola una entrega. Se puede llamar desde cualquier hilo."""
+        if self._loop is None:
+            logger.warning(f"Webhook sender not started, dropping callback to {url}")
+            self.dropped_count += 1
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._put(url, payload, attempt)
+        else:
+            self._loop.call_soon_threadsafe(self._put, url, payload, attempt)
+
+    def _put(self, url: str, payload: dict, attempt: int):
+        try:
+            self._queue.put_nowait((url, payload, attempt))
+        except asyncio.QueueFull:
+            self.dropped_count += 1
+            logger.error(f"Webhook queue full, dropping callback to {url} for task {payload.get('task_id')}")
+
+    async def _worker(self):
+        while True:
+            url, payload, attempt = await self._queue.get()
+            try:
+                await self._deliver(url, payload, attempt)
+            except Exception as e:
+                logger.error(f"Unexpected error delivering webhook to {url}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def _retry_later(self, delay: float, item: tuple):
+        key = object()
+
+        def fire():
+            self._retries.pop(key, None)
+            self._put(*item)
+
+        self._retries[key] = (self._loop.call_later(delay, fire), item)
+
+    async def _deliver(self, url: str, payload: dict, attempt: int):
+        if not await resolves_to_public(url):
+            self.failed_count += 1
+            logger.error(f"Refusing webhook to {url} for task {payload.get('task_id')}: host resolves to a non-public address")
+            return
+        status_code = None
+        try:
+            response = await self._client.post(url, json=payload)
+            status_code = response.status_code
+            if response.is_success:
+                self.delivered_count += 1
+                logger.info(f"Webhook delivered to {url} for task {payload.get('task_id')} (attempt {attempt})")
+                return
+            logger.warning(f"Webhook to {url} answered {status_code} (attempt {attempt})")
+        except httpx.HTTPError as e:
+            logger.warning(f"Webhook to {url} failed (attempt {attempt}): {e}")
+
+        if status_code in _PERMANENT_FAILURES or attempt >= self.max_attempts:
+            self.failed_count += 1
+            logger.error(f"Giving up webhook to {url} for task {payload.get('task_id')} after {attempt} attempts")
+            return
+
+        # Durante el apagado se reintenta sin esperar
+        if self._draining:
+            self._put(url, payload, attempt + 1)
+            return
+        self._retry_later(self.backoff * (2 ** (attempt - 1)), (url, payload, attempt + 1))
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "retrying": len(self._retries),
+            "delivered": self.delivered_count,
+            "failed": self.failed_count,
+            "dropped": self.dropped_count,
+        }
+
+
+webhook_sender = WebhookSender(
+    workers=settings.WEBHOOK_WORKERS,
+    queue_size=settings.WEBHOOK_QUEUE_SIZE,
+    max_attempts=settings.WEBHOOK_MAX_ATTEMPTS,
+    backoff=settings.WEBHOOK_BACKOFF_SECONDS,
+    timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+    drain_timeout=settings.WEBHOOK_DRAIN_SECONDS,
+)
+
+# Referencias a los trabajos en segundo plano para que no los recoja el GC
+_background: Set[asyncio.Task] = set()
+
+
+def run_with_callback(task_id: str, callback_url: str, job: Awaitable[dict]):
+    """
+    Ejecuta `job` en segundo plano y al terminar envía su resultado (o el error)
+    a `callback_url`. `job` devuelve el mismo dict que la respuesta síncrona.
+    """
+    async def runner():
+        started = time.time()
+        try:
+            result = await job
+            result = {key: value for key, value in result.items() if key not in _LOCAL_ONLY_KEYS}
+            payload = {"task_id": task_id, "status": "completed", **result}
+        except JobCancelled:
+            logger.info(f"Background job for task {task_id} cancelled")
+            payload = {"task_id": task_id, "status": "cancelled", "success": False}
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            logger.error(f"Background job for task {task_id} failed: {detail}")
+            payload = {"task_id": task_id, "status": "failed", "success": False, "error": detail}
+        timings = dict(payload.get("timings") or {})
+        timings["total_seconds"] = round(time.time() - started, 3)
+        payload["timings"] = timings
+        webhook_sender.enqueue(callback_url, payload)
+
+    background = asyncio.create_task(runner())
+    _background.add(background)
+    background.add_done_callback(_background.discard)
@@ -0,0 +1,153 @@
+import contextvars
+import logging
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+from app.services.task_manager import task_manager
+
+logger = logging.getLogger(__name__)
+
+# Tramo del porcentaje total (0-99) que cubre el ffmpeg en curso; el 100 lo marca ProcessWrapper
+_progress_span: contextvars.ContextVar[tuple] = contextvars.ContextVar("progress_span", default=(0.0, 99.0))
+# Destino alternativo del progreso dentro de una rama de ParallelProgress
+_progress_sink: contextvars.ContextVar[Optional[Callable]] = contextvars.ContextVar("progress_sink", default=None)
+
+
+@contextmanager
+def stage(start: float, end: float):
+    """
+    Restringe el progreso de los ffmpeg lanzados dentro del bloque a la fracción
+    [start, end] del tramo actual. Útil para trabajos con varias pasadas.
+    """
+    lo, hi = _progress_span.get()
+    token = _progress_span.set((lo + (hi - lo) * start, lo + (hi - lo) * end))
+    try:
+        yield
+    finally:
+        _progress_span.reset(token)
+
+
+class ParallelProgress:
+    """
+    Progreso de varias ramas que se ejecutan a la vez (p.ej. trozos de un
+    video). Cada rama informa de su fracción con `part(i)` y a la tarea se
+    vuelca la media, escalada a la fracción [start, end] del tramo actual.
+    """
+
+    def __init__(self, task_id: Optional[str], parts: int, start: float = 0.0, end: float = 1.0):
+        lo, hi = _progress_span.get()
+        self.task_id = task_id
+        self.lo = lo + (hi - lo) * start
+        self.hi = lo + (hi - lo) * end
+        self.fractions = [0.0] * max(parts, 1)
+
+    def _update(self, index: int, fraction: float, fps: Optional[float], speed: Optional[float]):
+        self.fractions[index] = max(self.fractions[index], fraction)
+        if not self.task_id:
+            return
+        mean = sum(self.fractions) / len(self.fractions)
+        task_manager.update_task_progress(
+            self.task_id, int(self.lo + (self.hi - self.lo) * mean), fps=fps, speed=speed
+        )
+
+    @contextmanager
+    def part(self, index: int):
+        span_token = _progress_span.set((0.0, 1.0))
+        sink_token = _progress_sink.set(lambda fraction, fps, speed: self._update(index, fraction, fps, speed))
+        try:
+            yield
+        finally:
+            _progress_sink.reset(sink_token)
+            _progress_span.reset(span_token)
+
+
+class FfmpegProgress:
+    """
+    Parser de la salida de `-progress`: bloques `clave=valor` terminados por
+    `progress=continue` o `progress=end`.
+    """
+
+    def __init__(self, duration: Optional[float] = None):
+        self.duration = duration if duration and duration > 0 else None
+        self.out_time = 0.0
+        self.fps: Optional[float] = None
+        self.speed: Optional[float] = None
+        self.done = False
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if self.done:
+            return 1.0
+        if not self.duration:
+            return None
+        return min(self.out_time / self.duration, 1.0)
+
+    def feed(self, line: str) -> bool:
+        """Procesa una línea; devuelve True al cerrar un bloque de progreso."""
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return False
+        value = value.strip()
+        try:
+            if key == "out_time_us" and value != "N/A":
+                self.out_time = max(int(value) / 1_000_000, 0.0)
+            elif key == "fps":
+                self.fps = float(value)
+            elif key == "speed" and value.endswith("x"):
+                self.speed = float(value[:-1])
+        except ValueError:
+            pass
+        if key == "progress":
+            self.done = value == "end"
+            return True
+        return False
+
+
+def report_progress(task_id: str, progress: FfmpegProgress):
+    lo, hi = _progress_span.get()
+    fraction = progress.fraction
+    sink = _progress_sink.get()
+    if sink is not None:
+        if fraction is not None:
+            sink(lo + (hi - lo) * fraction, progress.fps, progress.speed)
+        return
+    porcentage = None if fraction is None else int(lo + (hi - lo) * fraction)
+    task_manager.update_task_progress(task_id, porcentage, fps=progress.fps, speed=progress.speed)
+
+
+# Opciones de ffmpeg sin valor; el resto consume el argumento siguiente
+_FLAG_OPTIONS = {
+    "-y", "-n", "-an", "-vn", "-sn", "-dn", "-shortest", "-nostdin", "-nostats", "-stats",
+    "-hide_banner", "-copyts", "-start_at_zero", "-re", "-accurate_seek", "-noaccurate_seek",
+    "-autorotate", "-noautorotate", "-benchmark", "-ignore_unknown", "-copyinkf",
+}
+
+
+def output_positions(args: List[str]) -> List[int]:
+    """
+    Índices de los ficheros de salida en una línea de ffmpeg: argumentos
+    sueltos que no son valor de una opción (las entradas van tras `-i`).
+    """
+    positions = []
+    index = 1
+    while index < len(args):
+        arg = args[index]
+        if arg.startswith("-") and arg != "-":
+            index += 1 if arg in _FLAG_OPTIONS else 2
+            continue
+        positions.append(index)
+        index += 1
+    return positions
+
+
+def apply_thread_budget(args: List[str], threads: Optional[int]) -> List[str]:
+    """
+    Limita los hilos de filtros y del codificador. `-threads` es opción de
+    salida y solo afecta a la salida que le sigue, así que se inserta antes
+    de cada fichero de salida.
+    """
+    if not threads:
+        return list(args)
+    args = list(args)
+    for index in reversed(output_positions(args)):
+        args[index:index] = ["-threads", str(threads)]
+    return [args[0], "-filter_threads", str(threads), "-filter_complex_threads", str(threads), *args[1:]]
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import time
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+import ffmpeg
+from app.core.config import settings
+from app.services.analysis_cache import analysis_cache
+from app.utils.ffmpeg_progress import FfmpegProgress, ParallelProgress, report_progress, apply_thread_budget
+from app.utils.job_control import (
+    current_task_id,
+    current_thread_budget,
+    register_process,
+    unregister_process,
+    is_cancelled,
+    check_cancelled,
+    JobCancelled,
+)
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_BIN = "ffmpeg"
+FFPROBE_BIN = "ffprobe"
+
+
+class FfmpegTimeout(Exception):
+    def __init__(self, label: str, timeout: float):
+        super().__init__(f"ffmpeg '{label}' exceeded {timeout}s")
+        self.label = label
+        self.timeout = timeout
+
+
+class _RunningProcess:
+    def __init__(self, process: asyncio.subprocess.Process, task_id: Optional[str], label: str):
+        self.process = process
+        self.task_id = task_id
+        self.label = label
+        self.started_at = time.time()
+
+
+# Procesos en marcha en este worker, para /tasks/stats y diagnóstico
+_running: Dict[int, _RunningProcess] = {}
+
+
+def running_processes() -> List[dict]:
+    now = time.time()
+    return [
+        {
+            "pid": pid,
+            "task_id": entry.task_id,
+            "label": entry.label,
+            "elapsed_seconds": round(now - entry.started_at, 1),
+        }
+        for pid, entry in _running.items()
+    ]
+
+
+async def _drain(stream: asyncio.StreamReader, buffer: bytearray):
+    while chunk := await stream.read(65536):
+        buffer.extend(chunk)
+
+
+async def _kill(process: asyncio.subprocess.Process):
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+
+async def _supervise(cmd: List[str], task_id: Optional[str], label: str, timeout: Optional[float],
+                     consume_stdout: Callable[[asyncio.subprocess.Process], Awaitable[None]]) -> bytes:
+    """
+    Lanza `cmd`, deja que `consume_stdout` lea su stdout y drena stderr en
+    paralelo. Se encarga del registro para cancelaciones, del timeout y de
+    matar el proceso si la corrutina se cancela. Devuelve el stderr.
+    """
+    # Un trabajo cancelado no lanza más pasadas (p.ej. el bucle de chunks de video/cut.py)
+    if task_id:
+        check_cancelled(task_id)
+
+    stderr = bytearray()
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    register_process(process, task_id)
+    _running[process.pid] = _RunningProcess(process, task_id, label)
+    stderr_reader = asyncio.ensure_future(_drain(process.stderr, stderr))
+
+    async def communicate():
+        await consume_stdout(process)
+        await stderr_reader
+        await process.wait()
+
+    try:
+        await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _kill(process)
+        logger.error(f"ffmpeg '{label}' killed after {timeout}s")
+        raise FfmpegTimeout(label, timeout)
+    finally:
+        # También cubre la cancelación de la corrutina (asyncio.CancelledError)
+        if process.returncode is None:
+            await _kill(process)
+        stderr_reader.cancel()
+        _running.pop(process.pid, None)
+        unregister_process(process, task_id)
+
+    if task_id and is_cancelled(task_id):
+        raise JobCancelled(task_id)
+    if process.returncode != 0:
+        raise ffmpeg.Error(cmd[0], b"", bytes(stderr))
+    return bytes(stderr)
+
+
+def _default_timeout(timeout: Optional[float]) -> Optional[float]:
+    return timeout if timeout is not None else (settings.FFMPEG_TIMEOUT_SECONDS or None)
+
+
+async def run_ffmpeg(
+    args: List[str],
+    duration: Optional[float] = None,
+    task_id: Optional[str] = None,
+    timeout: Optional[float] = None,
+    label: Optional[str] = None,
+) -> str:
+    """
+    Ejecuta ffmpeg como subproceso asyncio con `-progress pipe:1`.
+
+    El progreso real (porcentaje sobre `duration`, fps y velocidad) se vuelca
+    en la tarea; stdout y stderr se drenan en el event loop, sin hilos. Si
+    vence `timeout` o se cancela la corrutina/la tarea, el proceso se mata.
+    Devuelve el stderr; lanza ffmpeg.Error si ffmpeg falla.
+    """
+    task_id = task_id or current_task_id.get()
+    args = apply_thread_budget(args, current_thread_budget.get())
+    cmd = [args[0], "-nostats", "-progress", "pipe:1", *args[1:]]
+    progress = FfmpegProgress(duration)
+
+    async def consume_progress(process: asyncio.subprocess.Process):
+        while raw := await process.stdout.readline():
+            if progress.feed(raw.decode(errors="replace")) and task_id:
+                report_progress(task_id, progress)
+                # Detecta cancelaciones hechas desde otro worker
+                if is_cancelled(task_id):
+                    process.kill()
+
+    stderr = await _supervise(cmd, task_id, label or (task_id or "ffmpeg"), _default_timeout(timeout), consume_progress)
+    return stderr.decode(errors="replace")
+
+
+async def read_output(
+    args: List[str],
+    on_data: Callable[[bytes], Optional[float]],
+    duration: Optional[float] = None,
+    task_id: Optional[str] = None,
+    timeout: Optional[float] = None,
+    label: Optional[str] = None,
+    chunk_size: int = 1 << 16,
+):
+    """
+    Ejecuta ffmpeg escribiendo en stdout (`pipe:1`) y entrega los datos a
+    `on_data` por bloques, sin acumularlos. `on_data` devuelve la posición en
+    segundos procesada hasta ahora, que se usa como progreso sobre `duration`.
+    `on_data` suele ser trabajo de CPU (NumPy), así que se ejecuta en un hilo
+    y no bloquea el event loop.
+    """
+    task_id = task_id or current_task_id.get()
+    cmd = [args[0], "-nostats", *args[1:]]
+    progress = FfmpegProgress(duration)
+
+    async def consume_data(process: asyncio.subprocess.Process):
+        while chunk := await process.stdout.read(chunk_size):
+            position = await asyncio.to_thread(on_data, chunk)
+            if position is not None and task_id:
+                progress.out_time = position
+                report_progress(task_id, progress)
+                if is_cancelled(task_id):
+                    process.kill()
+
+    await _supervise(cmd, task_id, label or (task_id or "ffmpeg"), _default_timeout(timeout), consume_data)
+
+
+async def run_parallel(jobs: List[Callable[[], Awaitable]], workers: int,
+                       progress: Optional[ParallelProgress] = None) -> list:
+    """
+    Ejecuta las corrutinas que crean `jobs` con como mucho `workers` a la vez,
+    repartiendo entre ellas el presupuesto de hilos del trabajo. Si se pasa
+    `progress`, cada una informa como `progress.part(i)`. Devuelve los
+    resultados en orden; si una falla, cancela (y mata) las demás.
+    """
+    semaphore = asyncio.Semaphore(max(1, workers))
+    budget = current_thread_budget.get()
+    threads = max(1, budget // max(1, workers)) if budget else None
+
+    async def run_one(index: int):
+        async with semaphore:
+            current_thread_budget.set(threads)
+            if progress is None:
+                return await jobs[index]()
+            with progress.part(index):
+                return await jobs[index]()
+
+    # Cada tarea copia el contexto: el presupuesto de hilos que fija es solo suyo
+    tasks = [asyncio.create_task(run_one(i)) for i in range(len(jobs))]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def run_stream(stream, duration: Optional[float] = None, task_id: Optional[str] = None,
+                     timeout: Optional[float] = None, label: Optional[str] = None) -> str:
+    """Igual que run_ffmpeg pero para un grafo construido con ffmpeg-python."""
+    return await run_ffmpeg(stream.compile(), duration, task_id, timeout, label)
+
+
+async def run_ffprobe(args: List[str], timeout: float = 60) -> bytes:
+    """Ejecuta ffprobe con `args` y devuelve su stdout; lanza ffmpeg.Error si falla."""
+    cmd = [FFPROBE_BIN, "-v", "error", *args]
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _kill(process)
+        raise FfmpegTimeout("ffprobe", timeout)
+    finally:
+        if process.returncode is None:
+            await _kill(process)
+    if process.returncode != 0:
+        raise ffmpeg.Error(FFPROBE_BIN, stdout, stderr)
+    return stdout
+
+
+async def probe(input_file: str, timeout: float = 60) -> dict:
+    """
+    Equivalente asíncrono de ffmpeg.probe; lanza ffmpeg.Error si ffprobe falla.
+    El resultado se guarda en la caché de análisis si se conoce el hash del fichero.
+    """
+    cached = await asyncio.to_thread(analysis_cache.get_json, input_file, "probe")
+    if cached is not None:
+        return cached
+    stdout = await run_ffprobe(["-print_format", "json", "-show_format", "-show_streams", input_file], timeout)
+    info = json.loads(stdout.decode("utf-8"))
+    await asyncio.to_thread(analysis_cache.put_json, input_file, "probe", info)
+    return info
+
+
+async def probe_keyframes(input_file: str, timeout: float = 300) -> List[float]:
+    """
+    Instantes (s) de los keyframes del primer stream de video en los que se
+    puede empezar a copiar. Lee solo los paquetes, sin decodificar; se cachea
+    como el resto del análisis.
+
+    Un keyframe de GOP abierto (I no IDR en H.264, CRA en HEVC) va seguido en
+    orden de decodificación de imágenes que se muestran antes que él y que
+    dependen del GOP anterior: copiar desde ahí deja frames rotos, así que
+    esos keyframes se descartan.
+    """
+    cached = await asyncio.to_thread(analysis_cache.get_json, input_file, "keyframes-closed")
+    if cached is not None:
+        return cached
+    stdout = await run_ffprobe([
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        input_file,
+    ], timeout)
+    keyframes = []
+    open_gop = set()
+    current = None
+    for line in stdout.decode("utf-8", errors="replace").splitlines():
+        pts_time, _, flags = line.partition(",")
+        if pts_time in ("", "N/A"):
+            continue
+        pts = float(pts_time)
+        if "K" in flags:
+            current = pts
+            keyframes.append(pts)
+        elif current is not None and pts < current:
+            # Imagen inicial (leading picture) del keyframe en curso
+            open_gop.add(current)
+    keyframes = sorted(k for k in keyframes if k not in open_gop)
+    if open_gop:
+        logger.info(f"{len(open_gop)} keyframes de GOP abierto descartados como punto de copia en {input_file}")
+    await asyncio.to_thread(analysis_cache.put_json, input_file, "keyframes-closed", keyframes)
+    return keyframes
+
+
+async def probe_duration(input_file: str) -> Optional[float]:
+    try:
+        return float((await probe(input_file))['format']['duration'])
+    except Exception as e:
+        logger.warning(f"No se pudo obtener la duración de {input_file}: {e}")
+        return None
+
+
+async def probe_sample_rate(input_file: str) -> Optional[int]:
+    """Frecuencia de muestreo del primer stream de audio, o None si no hay o no se pudo leer."""
+    try:
+        info = await probe(input_file)
+        audio = next((s for s in info["streams"] if s.get("codec_type") == "audio"), None)
+        return int(audio["sample_rate"]) if audio and audio.get("sample_rate") else None
+    except Exception as e:
+        logger.warning(f"No se pudo obtener la frecuencia de audio de {input_file}: {e}")
+        return None
@@ -0,0 +1,139 @@
+import contextvars
+import os
+import shutil
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set
+from app.services.task_manager import task_manager
+
+logger = logging.getLogger(__name__)
+
+# Tarea a la que se atribuye el trabajo (progreso, procesos, temporales) en este contexto
+current_task_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_task_id", default=None)
+
+# Hilos que puede usar cada ffmpeg del trabajo en curso; lo fija el planificador (None = sin límite)
+current_thread_budget: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("current_thread_budget", default=None)
+
+
+@contextmanager
+def limit_threads(threads: Optional[int]):
+    """Reduce el presupuesto de hilos dentro del bloque (p.ej. el de un perfil de codificación)."""
+    if not threads:
+        yield
+        return
+    budget = current_thread_budget.get()
+    token = current_thread_budget.set(min(budget, threads) if budget else threads)
+    try:
+        yield
+    finally:
+        current_thread_budget.reset(token)
+
+
+class JobCancelled(Exception):
+    def __init__(self, task_id: str):
+        super().__init__(f"Task {task_id} was cancelled")
+        self.task_id = task_id
+
+
+_lock = threading.Lock()
+_cancelled: Set[str] = set()
+# Procesos ffmpeg (asyncio.subprocess.Process) en marcha por tarea
+_processes: Dict[str, Set] = {}
+_scratch: Dict[str, List[str]] = {}
+
+
+def register_process(process, task_id: Optional[str] = None):
+    task_id = task_id or current_task_id.get()
+    if not task_id:
+        return
+    with _lock:
+        _processes.setdefault(task_id, set()).add(process)
+        cancelled = task_id in _cancelled
+    # Cancelada justo antes de lanzar el proceso
+    if cancelled:
+        _kill(process)
+
+
+def unregister_process(process, task_id: Optional[str] = None):
+    task_id = task_id or current_task_id.get()
+    with _lock:
+        processes = _processes.get(task_id)
+        if processes:
+            processes.discard(process)
+            if not processes:
+                del _processes[task_id]
+
+
+def register_scratch(*paths: str, task_id: Optional[str] = None):
+    """Ficheros o directorios temporales del trabajo que se borran si se cancela."""
+    task_id = task_id or current_task_id.get()
+    if not task_id:
+        return
+    with _lock:
+        _scratch.setdefault(task_id, []).extend(p for p in paths if p)
+
+
+def is_cancelled(task_id: Optional[str] = None) -> bool:
+    """
+    Cancelada en este proceso o marcada como cancelada en el almacén de tareas
+    (p.ej. por un DELETE atendido en otro worker de uvicorn). Se llama en cada
+    línea de progreso desde el event loop, así que solo mira el estado en
+    memoria del almacén (`peek_status`), sin E/S.
+    """
+    task_id = task_id or current_task_id.get()
+    if not task_id:
+        return False
+    with _lock:
+        if task_id in _cancelled:
+            return True
+    if task_manager.peek_status(task_id) == "cancelled":
+        cancel(task_id)
+        return True
+    return False
+
+
+def check_cancelled(task_id: Optional[str] = None):
+    task_id = task_id or current_task_id.get()
+    if is_cancelled(task_id):
+        raise JobCancelled(task_id)
+
+
+def _kill(process):
+    if process.returncode is not None:
+        return
+    try:
+        process.kill()
+    except (OSError, ProcessLookupError):
+        pass
+
+
+def cancel(task_id: str):
+    """Marca la tarea como cancelada y mata sus procesos ffmpeg en curso."""
+    with _lock:
+        _cancelled.add(task_id)
+        processes = list(_processes.get(task_id, ()))
+    for process in processes:
+        logger.info(f"Killing ffmpeg process {process.pid} of cancelled task {task_id}")
+        _kill(process)
+
+
+def cleanup_scratch(task_id: str):
+    with _lock:
+        paths = _scratch.pop(task_id, [])
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove scratch path {path}: {e}")
+
+
+def finish(task_id: str):
+    """Olvida el estado de control de un trabajo terminado (sin borrar sus temporales)."""
+    with _lock:
+        _cancelled.discard(task_id)
+        _processes.pop(task_id, None)
+        _scratch.pop(task_id, None)
@@ -1,49 +1,44 @@
-import threading
-import time
 import logging
-from typing import Callable, Any
+import asyncio
+from typing import Awaitable, Callable, Any
 from app.services.task_manager import task_manager
+from app.utils.job_control import current_task_id, is_cancelled, JobCancelled
 
 logger = logging.getLogger(__name__)
 
+
+def _finish_task(task_id: str, success: bool):
+    if success:
+        task_manager.update_task_porcentage(task_id, 100)
+    task_manager.update_task_status(task_id, success)
+
+
 class ProcessWrapper:
     @staticmethod
-    def run(task_id: str, target_func: Callable, *args, **kwargs) -> Any:
+    async def run(task_id: str, target_func: Callable[..., Awaitable], *args, **kwargs) -> Any:
         """
-        Ejecuta una función target mientras simula progreso en una tarea.
+        Ejecuta una corrutina target asociando a la tarea el progreso real que
+        reportan los ffmpeg que lance (ver app.utils.ffmpeg_runner).
         """
-        stop_progress = threading.Event()
-
-        def simulate_progress():
-            current_prog = 5
-            # Subimos hasta 90%
-            while not stop_progress.is_set() and current_prog < 90:
-                time.sleep(0.5) 
-                current_prog += 2
-                task_manager.update_task_porcentage(task_id, current_prog)
+        token = current_task_id.set(task_id)
+        try:
+            result = await target_func(*args, **kwargs)
 
-        # Iniciar simulación en background
-        progress_thread = threading.Thread(target=simulate_progress)
-        progress_thread.start()
+            # El almacén puede hacer E/S (sqlite): fuera del event loop
+            await asyncio.to_thread(_finish_task, task_id, True)
 
-        try:
-            # Ejecutar función real (bloqueante)
-            result = target_func(*args, **kwargs)
-            
-            # Al terminar éxito
-            stop_progress.set()
-            progress_thread.join()
-            
-            task_manager.update_task_porcentage(task_id, 100)
-            task_manager.update_task_status(task_id, True)
-            
             return result
 
+        except asyncio.CancelledError:
+            logger.info(f"Task {task_id} cancelled")
+            raise
         except Exception as e:
-            # Al fallar
-            stop_progress.set()
-            progress_thread.join()
-            
+            # Al cancelar se matan los ffmpeg: el error resultante no es un fallo
+            if is_cancelled(task_id):
+                logger.info(f"Task {task_id} cancelled")
+                raise JobCancelled(task_id) from e
             logger.error(f"Error in process wrapper for task {task_id}: {e}")
-            task_manager.update_task_status(task_id, False)
+            await asyncio.to_thread(_finish_task, task_id, False)
             raise e
+        finally:
+            current_task_id.reset(token)
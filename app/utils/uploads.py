@@ -0,0 +1,22 @@
+from fastapi import UploadFile
+from app.services.analysis_cache import analysis_cache, new_hasher
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def save_upload(file: UploadFile, path: str) -> str:
+    """
+    Copia el contenido de un UploadFile a disco. Es bloqueante: desde el event
+    loop usar `await asyncio.to_thread(save_upload, file, path)`.
+
+    El hash del contenido se calcula durante la copia y se registra en la
+    caché de análisis, de modo que los reintentos del mismo fichero reutilizan
+    ffprobe, niveles de audio y keyframes ya calculados.
+    """
+    hasher = new_hasher()
+    with open(path, "wb") as b:
+        while chunk := file.file.read(COPY_CHUNK_SIZE):
+            hasher.update(chunk)
+            b.write(chunk)
+    analysis_cache.remember(path, hasher.hexdigest())
+    return path
@@ -0,0 +1,87 @@
+"""
+Benchmark del texto de los memes: filtro `ass` (libass en cada frame, motor
+anterior) frente a la capa PNG renderizada una vez y compuesta con `overlay`
+(`render_caption_overlay`), tanto del tamaño del video como recortada a la
+caja del texto. Mide el tiempo de ffmpeg y los fps, solo filtrando (`-f
+null`) o además codificando (`--encode`); el render de la capa se mide aparte
+porque se cachea (en una segunda ejecución sale de la caché de renders).
+
+    python scripts/bench_caption_overlay.py --seconds 60 --sizes 1080x1920,1920x1080
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.video_styles import StyleRegistry, VideoTemplate
+from app.services.video.ass_service import AssService
+from app.services.video.caption_overlay import render_caption_overlay
+
+FPS = 30
+TEXT = "Cuando el código compila a la primera\ny nadie sabe por qué"
+
+
+def make_sample(path: str, width: int, height: int, seconds: float):
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={FPS}:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-y", path,
+    ], check=True)
+
+
+def run(args) -> float:
+    started = time.perf_counter()
+    subprocess.run(["ffmpeg", "-v", "error", *args], check=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--sizes", default="1080x1920,1920x1080")
+    parser.add_argument("--encode", action="store_true", help="codificar con x264 veryfast en lugar de -f null")
+    args = parser.parse_args()
+    frames_total = args.seconds * FPS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = (["-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-y", os.path.join(tmp, "out.mp4")]
+                  if args.encode else ["-f", "null", "-"])
+        print("| tamaño | libass (s) | libass fps | capa completa (s) | capa completa fps "
+              "| capa recortada (s) | capa recortada fps | render capa (s) |")
+        print("|--------|-----------:|-----------:|------------------:|------------------:"
+              "|-------------------:|-------------------:|----------------:|")
+        for size in args.sizes.split(","):
+            width, height = (int(value) for value in size.split("x"))
+            sample = os.path.join(tmp, f"sample_{size}.mp4")
+            make_sample(sample, width, height, args.seconds)
+
+            style = StyleRegistry.resolve(VideoTemplate.MEME_CLASSIC)
+            style.prepare_for_video(width, height)
+            ass_path = os.path.join(tmp, "caption.ass")
+            AssService.generate_ass(ass_path, TEXT, args.seconds, width, height, style)
+
+            started = time.perf_counter()
+            caption = asyncio.run(render_caption_overlay(TEXT, style, width, height))
+            layer = time.perf_counter() - started
+            try:
+                libass = run(["-i", sample, "-vf", f"ass=filename={ass_path}", *output])
+                # La capa del tamaño del video (como antes del recorte): pad del único frame
+                full = run(["-i", sample, "-i", caption.path, "-filter_complex",
+                            f"[1:v]pad={width}:{height}:{caption.x}:{caption.y}:color=black@0.0[layer];"
+                            f"[0:v][layer]overlay", *output])
+                cropped = run(["-i", sample, "-i", caption.path, "-filter_complex",
+                               f"[0:v][1:v]overlay=x={caption.x}:y={caption.y}", *output])
+            finally:
+                os.remove(caption.path)
+            print(f"| {size} | {libass:.1f} | {frames_total / libass:.0f} | {full:.1f} | {frames_total / full:.0f} "
+                  f"| {cropped:.1f} | {frames_total / cropped:.0f} | {layer:.2f} |", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark del grafo de corte según el número de segmentos: grafo antiguo
+(un trim/atrim + concat por segmento) frente a select/aselect con expresión
+en árbol binario (app.services.segment_graph). Ambos se pasan por
+`-filter_complex_script` (el antiguo no cabe en la línea de comandos con
+miles de segmentos). Mide tiempo total y memoria máxima de ffmpeg.
+
+    python scripts/bench_cut_graph.py --minutes 10 --counts 10,100,1000,5000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.segment_graph import write_cut_graph
+
+
+def make_sample(path: str, seconds: float):
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", "-y", path,
+    ], check=True)
+
+
+def synthetic_segments(count: int, duration: float):
+    """`count` segmentos de voz repartidos uniformemente, con un 30% de pausa entre ellos."""
+    slot = duration / count
+    return [(i * slot, i * slot + slot * 0.7) for i in range(count)]
+
+
+def write_legacy_graph(path: str, segments):
+    chains = []
+    for i, (start, end) in enumerate(segments):
+        chains.append(f"[0:v]trim=start={start}:end={end},setpts=PTS-STARTPTS[v{i}]")
+        chains.append(f"[0:a]atrim=start={start}:end={end},asetpts=PTS-STARTPTS[a{i}]")
+    labels = "".join(f"[v{i}][a{i}]" for i in range(len(segments)))
+    chains.append(f"{labels}concat=n={len(segments)}:v=1:a=1[vout][aout]")
+    with open(path, "w") as f:
+        f.write(";\n".join(chains))
+
+
+def run(sample: str, graph: str, output: str):
+    """Devuelve (segundos, memoria máxima en MB) del ffmpeg hijo."""
+    started = time.perf_counter()
+    process = subprocess.Popen([
+        "ffmpeg", "-v", "error", "-i", sample, "-filter_complex_script", graph,
+        "-map", "[vout]", "-map", "[aout]", "-c:v", "libx264", "-preset", "ultrafast",
+        "-c:a", "aac", "-y", output,
+    ])
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    if status != 0:
+        return elapsed, None
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--counts", default="10,100,1000,5000")
+    parser.add_argument("--input", help="usar este video en lugar de generar uno")
+    args = parser.parse_args()
+    counts = [int(c) for c in args.counts.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = args.input
+        if not sample:
+            sample = os.path.join(tmp, "sample.mp4")
+            print(f"Generando video de {args.minutes} min...")
+            make_sample(sample, args.minutes * 60)
+        duration = float(subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", sample],
+            capture_output=True, text=True, check=True,
+        ).stdout)
+
+        print(f"{'segmentos':>10} {'trim+concat (s)':>16} {'MB':>8} {'select (s)':>16} {'MB':>8}")
+        for count in counts:
+            segments = synthetic_segments(count, duration)
+            legacy_graph = os.path.join(tmp, "legacy.txt")
+            select_graph = os.path.join(tmp, "select.txt")
+            write_legacy_graph(legacy_graph, segments)
+            write_cut_graph(select_graph, segments, frame_rate=30)
+
+            legacy = run(sample, legacy_graph, os.path.join(tmp, "legacy.mp4"))
+            select = run(sample, select_graph, os.path.join(tmp, "select.mp4"))
+
+            def fmt(result):
+                elapsed, memory = result
+                return f"{elapsed:>16.1f} {memory:>8.0f}" if memory is not None else f"{'error':>16} {'-':>8}"
+            print(f"{count:>10} {fmt(legacy)} {fmt(select)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Benchmark: corte de silencios de una sola codificación frente al antiguo
+flujo de tres codificaciones (trozos -> corte por trozo -> concat recodificado).
+
+Mide el tiempo total de cada flujo y la calidad (PSNR/SSIM) de cada salida
+frente a una referencia sin pérdidas de sus mismos frames, así la métrica
+recoge solo la pérdida de las codificaciones. Aparte se compara la salida
+antigua con el corte exacto del flujo nuevo (frames que sobran o faltan en
+los bordes de los trozos). Ejemplo:
+
+    python scripts/bench_cut_single_encode.py --minutes 30
+
+Con --scaling mide solo el corte actual (grupos en paralelo con
+encode_groups_parallel) con CUT_CHUNK_WORKERS en 1, 2, 4... hasta el número
+de núcleos:
+
+    python scripts/bench_cut_single_encode.py --minutes 30 --scaling
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.analysis_cache import analysis_cache
+from app.services.video.cut import cut_video_remove_silence, get_duration, get_frame_rate
+from app.services.segment_graph import write_cut_graph
+from app.services.silence_analysis import detect_speech, silence_periods, VIDEO_CUT
+from app.utils.ffmpeg_runner import run_ffmpeg
+from app.utils.job_control import current_thread_budget
+
+
+def make_sample(path: str, seconds: float):
+    # 3 s de silencio cada 10 s para que haya cortes reales
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={seconds}",
+        "-f", "lavfi", "-i", f"aevalsrc='0.5*sin(440*2*PI*t)*gte(mod(t,10),3)':s=44100:d={seconds}",
+        "-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac", "-shortest", "-y", path,
+    ], check=True)
+
+
+async def detect_silence(input_file: str, duration: float) -> list:
+    """Periodos de silencio (inicio, fin) de un trozo, como los usaba el flujo anterior."""
+    return silence_periods(await detect_speech(input_file, VIDEO_CUT, duration), duration)
+
+
+def build_segments(periods: list, duration: float) -> list:
+    """Tramos con voz entre los silencios (flujo anterior)."""
+    if not periods:
+        return [(0, duration)]
+
+    segments = []
+    if periods[0][0] > 0:
+        segments.append((0, periods[0][0]))
+    for i in range(len(periods) - 1):
+        start = periods[i][1]
+        end = periods[i + 1][0]
+        if start < end:
+            segments.append((start, end))
+    if periods[-1][1] < duration:
+        segments.append((periods[-1][1], duration))
+    return segments
+
+
+async def legacy_three_pass(input_file: str, work_dir: str, chunk_seconds: float, lossless: bool = False) -> str:
+    """
+    Reproduce el flujo anterior: trozos en libx264, corte por trozo y concat
+    recodificado. Con `lossless` las tres codificaciones van con -qp 0: mismos
+    frames sin pérdida, la referencia para medir la pérdida acumulada.
+    """
+    video_args = ["-c:v", "libx264", "-preset", "ultrafast"] + (["-qp", "0"] if lossless else [])
+    prefix = "legacy_lossless" if lossless else "legacy"
+    duration = await get_duration(input_file)
+    processed = []
+    index = 0
+    start = 0.0
+    while start < duration:
+        length = min(chunk_seconds, duration - start)
+        chunk = os.path.join(work_dir, f"{prefix}_chunk_{index}.mp4")
+        await run_ffmpeg(["ffmpeg", "-ss", str(start), "-i", input_file, "-t", str(length),
+                          *video_args, "-c:a", "aac",
+                          "-avoid_negative_ts", "make_zero", "-y", chunk])
+        segments = build_segments(await detect_silence(chunk, length), length)
+        select = "+".join(f"between(t,{s},{e})" for s, e in segments)
+        out = os.path.join(work_dir, f"{prefix}_processed_{index}.mp4")
+        await run_ffmpeg(["ffmpeg", "-i", chunk,
+                          "-vf", f"select='{select}',setpts=N/FRAME_RATE/TB",
+                          "-af", f"aselect='{select}',asetpts=N/SR/TB",
+                          *video_args, "-c:a", "aac", "-y", out])
+        processed.append(out)
+        start += chunk_seconds
+        index += 1
+
+    concat = os.path.join(work_dir, f"{prefix}_concat.txt")
+    with open(concat, "w") as f:
+        for part in processed:
+            f.write(f"file '{os.path.abspath(part)}'\n")
+    output = os.path.join(work_dir, f"{prefix}_output.mp4")
+    await run_ffmpeg(["ffmpeg", "-f", "concat", "-safe", "0", "-i", concat,
+                      *video_args, "-c:a", "aac",
+                      "-af", "aresample=async=1", "-y", output])
+    return output
+
+
+async def lossless_reference(input_file: str, output: str, work_dir: str):
+    """
+    Los mismos frames que conserva el corte actual (segmentos ajustados a la
+    rejilla de frames) sin pérdidas: si la referencia se desalinea un solo
+    frame, el PSNR mide el desfase y no la codificación.
+    """
+    duration = await get_duration(input_file)
+    segments = await detect_speech(input_file, VIDEO_CUT, duration)
+    graph = write_cut_graph(os.path.join(work_dir, "reference.txt"), segments, audio=False,
+                            frame_rate=await get_frame_rate(input_file))
+    await run_ffmpeg(["ffmpeg", "-i", input_file, "-filter_complex_script", graph, "-map", "[vout]",
+                      "-c:v", "libx264", "-preset", "ultrafast", "-qp", "0", "-y", output])
+
+
+def quality(distorted: str, reference: str) -> dict:
+    result = subprocess.run([
+        "ffmpeg", "-i", distorted, "-i", reference,
+        "-lavfi", "[0:v][1:v]psnr;[0:v][1:v]ssim", "-f", "null", "-",
+    ], capture_output=True, text=True)
+    psnr = re.search(r"PSNR .*average:([\d.inf]+)", result.stderr)
+    ssim = re.search(r"SSIM .*All:([\d.]+)", result.stderr)
+    return {"psnr": psnr.group(1) if psnr else "n/a", "ssim": ssim.group(1) if ssim else "n/a"}
+
+
+async def timed(coro):
+    started = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - started
+
+
+async def run(sample: str, work_dir: str, threads: int):
+    current_thread_budget.set(threads)
+    new_output, new_elapsed = await timed(cut_video_remove_silence(sample))
+    legacy_output, legacy_elapsed = await timed(legacy_three_pass(sample, work_dir, settings.CUT_CHUNK_SECONDS))
+
+    reference = os.path.join(work_dir, "reference.mkv")
+    await lossless_reference(sample, reference, work_dir)
+    legacy_reference = await legacy_three_pass(sample, work_dir, settings.CUT_CHUNK_SECONDS, lossless=True)
+
+    print(f"{'flujo':<14} {'wall (s)':>10} {'PSNR (dB)':>10} {'SSIM':>8}")
+    for name, output, output_reference, elapsed in (
+            ("una pasada", new_output, reference, new_elapsed),
+            ("tres pasadas", legacy_output, legacy_reference, legacy_elapsed)):
+        q = quality(output, output_reference)
+        print(f"{name:<14} {elapsed:>10.1f} {q['psnr']:>10} {q['ssim']:>8}")
+    print(f"speedup: {legacy_elapsed / new_elapsed:.2f}x")
+    q = quality(legacy_reference, reference)
+    print(f"tres pasadas sin pérdida frente al corte exacto: PSNR {q['psnr']} dB, SSIM {q['ssim']}")
+    os.remove(new_output)
+
+
+def worker_counts(cpus: int) -> list:
+    counts, n = [], 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    counts.append(cpus)
+    return counts
+
+
+async def scaling(sample: str, threads: int, max_workers: int):
+    """Tiempo del corte actual con 1, 2, 4... grupos codificándose a la vez."""
+    current_thread_budget.set(threads)
+    # Sin caché de análisis: todas las ejecuciones pagan el mismo análisis
+    analysis_cache.max_bytes = 0
+    print(f"{'workers':>8} {'wall (s)':>10} {'speedup':>8}")
+    baseline = None
+    for workers in worker_counts(max_workers):
+        settings.CUT_CHUNK_WORKERS = workers
+        output, elapsed = await timed(cut_video_remove_silence(sample))
+        os.remove(output)
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>10.1f} {baseline / elapsed:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=30, help="duración del video sintético")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="presupuesto de hilos del trabajo")
+    parser.add_argument("--input", help="usar este video en lugar de generar uno")
+    parser.add_argument("--scaling", action="store_true", help="medir el corte actual con 1, 2, 4... workers")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1,
+                        help="último número de workers de --scaling")
+    parser.add_argument("--chunk-seconds", type=float, default=settings.CUT_CHUNK_SECONDS,
+                        help="segundos del original por grupo (CUT_CHUNK_SECONDS)")
+    args = parser.parse_args()
+
+    settings.CUT_CHUNK_SECONDS = args.chunk_seconds
+
+    os.makedirs("temp", exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="bench_cut_")
+    try:
+        sample = args.input
+        if not sample:
+            sample = os.path.join(work_dir, "sample.mp4")
+            print(f"Generando video de {args.minutes} min...")
+            make_sample(sample, args.minutes * 60)
+        if args.scaling:
+            asyncio.run(scaling(sample, args.threads, args.max_workers))
+        else:
+            asyncio.run(run(sample, work_dir, args.threads))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Tabla de perfiles de codificación (app.core.encoding_profiles): fps de
+codificación y tamaño de salida de cada perfil sobre el mismo video.
+Imprime una tabla Markdown lista para pegar en la documentación.
+
+    python scripts/bench_encoding_profiles.py --minutes 2
+    python scripts/bench_encoding_profiles.py --input grabacion.mp4 --threads 4
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.encoding_profiles import ProfileRegistry
+
+
+def make_sample(path: str, seconds: float):
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=30:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={seconds}",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "16", "-c:a", "aac", "-shortest", "-y", path,
+    ], check=True)
+
+
+def count_frames(path: str) -> int:
+    out = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0", "-count_packets",
+        "-show_entries", "stream=nb_read_packets", "-of", "csv=p=0", path,
+    ], capture_output=True, text=True, check=True).stdout
+    return int(out.strip() or 0)
+
+
+def encode(sample: str, output: str, profile, threads: int) -> float:
+    cmd = ["ffmpeg", "-v", "error", "-i", sample]
+    video_filter = profile.video_filter()
+    if video_filter:
+        cmd += ["-vf", video_filter]
+    threads = min(threads, profile.threads) if profile.threads else threads
+    cmd += [*profile.video_args(), *profile.audio_args(), "-threads", str(threads), "-y", output]
+    started = time.perf_counter()
+    subprocess.run(cmd, check=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=2)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--input", help="usar este video en lugar de generar uno")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = args.input
+        if not sample:
+            sample = os.path.join(tmp, "sample.mp4")
+            print(f"Generando video de {args.minutes} min...", file=sys.stderr)
+            make_sample(sample, args.minutes * 60)
+        frames = count_frames(sample)
+        source_size = os.path.getsize(sample)
+
+        print(f"| perfil | preset | CRF | altura máx. | fps de codificación | tamaño (MB) | % del original |")
+        print(f"|---|---|---|---|---|---|---|")
+        profiles = [ProfileRegistry.resolve(name) for name in ProfileRegistry.names()] + [ProfileRegistry.preview()]
+        for profile in profiles:
+            name = profile.name
+            output = os.path.join(tmp, f"{name}.mp4")
+            elapsed = encode(sample, output, profile, args.threads)
+            size = os.path.getsize(output)
+            print(
+                f"| {name} | {profile.preset} | {profile.crf} | {profile.max_height or 'original'} | "
+                f"{frames / elapsed:.1f} | {size / 1e6:.1f} | {100 * size / source_size:.0f}% |"
+            )
+
+
+if __name__ == "__main__":
+    main()
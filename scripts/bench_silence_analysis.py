@@ -0,0 +1,68 @@
+"""
+Benchmark del análisis de silencios: pasada anterior (`silencedetect` sobre
+el fichero completo, decodificando también el video) frente al análisis
+NumPy de app.services.silence_analysis (solo audio, PCM mono por tubería).
+
+    python scripts/bench_silence_analysis.py --minutes 60
+    python scripts/bench_silence_analysis.py --input grabacion.mp4
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.silence_analysis import detect_speech, VIDEO_CUT
+
+
+def make_sample(path: str, seconds: float):
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=30:duration={seconds}",
+        "-f", "lavfi", "-i", f"aevalsrc='0.5*sin(440*2*PI*t)*gte(mod(t,10),3)':s=48000:d={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", "-y", path,
+    ], check=True)
+
+
+def legacy_silencedetect(path: str) -> int:
+    result = subprocess.run(
+        ["ffmpeg", "-i", path, "-af", "silencedetect=n=-30dB:d=0.5", "-f", "null", "-"],
+        capture_output=True, text=True,
+    )
+    return len(re.findall(r"silence_start: ([\d.]+).*?silence_end: ([\d.]+)", result.stderr, re.DOTALL))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--input", help="usar este video en lugar de generar uno")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = args.input
+        if not sample:
+            sample = os.path.join(tmp, "sample.mp4")
+            print(f"Generando video de {args.minutes} min...")
+            make_sample(sample, args.minutes * 60)
+
+        started = time.perf_counter()
+        silences = legacy_silencedetect(sample)
+        legacy = time.perf_counter() - started
+
+        started = time.perf_counter()
+        segments = asyncio.run(detect_speech(sample, VIDEO_CUT))
+        numpy_elapsed = time.perf_counter() - started
+
+        print(f"silencedetect (video+audio): {legacy:8.1f} s  ({silences} silencios)")
+        print(f"NumPy (solo audio):          {numpy_elapsed:8.1f} s  ({len(segments)} tramos de voz)")
+        print(f"speedup: {legacy / numpy_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
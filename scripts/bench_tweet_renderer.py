@@ -0,0 +1,126 @@
+"""
+Benchmark de la imagen de tweet: grafo de ffmpeg por imagen (motor anterior,
+`generate_tweet_image_ffmpeg`) frente al render en proceso con Pillow sobre
+la capa base cacheada (`render_tweet`). Mide la latencia por imagen.
+
+Sin Poppins en app/assets/fonts (la imagen de Docker la descarga) se puede
+medir con otra fuente con `--font`; ffmpeg no la encuentra por nombre y usa
+la que le dé fontconfig.
+
+`--workers` mide además un lote (`generate_tweet_images`) con cada valor de
+TWEET_BATCH_WORKERS: tiempo total y el mayor retraso que sufre el bucle de
+eventos mientras tanto (el dibujo de glifos retiene el GIL).
+
+    python scripts/bench_tweet_renderer.py --runs 30
+    python scripts/bench_tweet_renderer.py --runs 30 --font /usr/share/fonts/truetype/dejavu/DejaVuSans.ttf
+    python scripts/bench_tweet_renderer.py --runs 30 --workers 1,2,4
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.image import tweet
+from app.services.image.tweet import (
+    generate_tweet_image_ffmpeg, generate_tweet_images, render_tweet, preload_base_layer
+)
+
+TEXTS = [
+    "Cuando el código compila a la primera",
+    "Nadie:\nAbsolutamente nadie:\nEl linter a las 3 de la mañana",
+    "Ese momento en el que arreglas un bug y aparecen otros tres que nadie había visto nunca en producción",
+    "Deploy el viernes a las 18:00 😀🔥 ¿qué podría salir mal? ✓",
+]
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return f"{statistics.median(samples) * 1000:.1f} | {p95 * 1000:.1f}"
+
+
+def bench_ffmpeg(runs: int):
+    samples = []
+    for index in range(runs):
+        started = time.perf_counter()
+        output = asyncio.run(generate_tweet_image_ffmpeg(TEXTS[index % len(TEXTS)]))
+        samples.append(time.perf_counter() - started)
+        os.remove(output)
+    return samples
+
+
+def bench_pillow(runs: int, tmp: str):
+    started = time.perf_counter()
+    preload_base_layer()
+    base = time.perf_counter() - started
+    samples = []
+    for index in range(runs):
+        output = os.path.join(tmp, f"tweet_{index}.png")
+        started = time.perf_counter()
+        render_tweet(TEXTS[index % len(TEXTS)], output)
+        samples.append(time.perf_counter() - started)
+    return samples, base
+
+
+async def bench_batch(texts, workers: int):
+    """(segundos del lote, mayor retraso del bucle de eventos en segundos)."""
+    settings.TWEET_BATCH_WORKERS = workers
+    lag = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal lag
+        while not done.is_set():
+            expected = time.perf_counter() + 0.005
+            await asyncio.sleep(0.005)
+            lag = max(lag, time.perf_counter() - expected)
+
+    probe = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    paths = await generate_tweet_images(texts)
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe
+    for path in paths:
+        os.remove(path)
+    return elapsed, lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--font", help="fuente para el render con Pillow si Poppins no está instalada")
+    parser.add_argument("--workers", help="valores de TWEET_BATCH_WORKERS a medir en lote, p. ej. 1,2,4")
+    args = parser.parse_args()
+    if args.font:
+        tweet.FONT_REGULAR_PATH = tweet.FONT_BOLD_PATH = args.font
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pillow, base = bench_pillow(args.runs, tmp)
+        ffmpeg_samples = bench_ffmpeg(args.runs)
+
+    print(f"Capa base (una vez por proceso): {base * 1000:.1f} ms\n")
+    print("| motor | mediana (ms) | p95 (ms) |")
+    print("|-------|-------------:|---------:|")
+    print(f"| ffmpeg | {summarize(ffmpeg_samples)} |")
+    print(f"| Pillow | {summarize(pillow)} |")
+
+    if args.workers:
+        texts = [TEXTS[index % len(TEXTS)] for index in range(args.runs)]
+        print(f"\nLote de {len(texts)} textos, {os.cpu_count()} CPU\n")
+        print("| workers | lote (ms) | retraso máx. del bucle (ms) |")
+        print("|--------:|----------:|----------------------------:|")
+        for workers in (int(value) for value in args.workers.split(",")):
+            elapsed, lag = asyncio.run(bench_batch(texts, workers))
+            print(f"| {workers} | {elapsed * 1000:.0f} | {lag * 1000:.1f} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark del zoom según el número de ventanas: zoompan con las expresiones
+`if(between(...))` anidadas (motor anterior, `build_zoom_expressions`) frente
+al árbol binario sobre las ventanas (`zoom_filter`, el que se usa) y a un
+grafo por ventanas que solo pasa por zoompan los frames de cada ventana y
+copia el resto (`trim` + `concat`). Solo se filtra (salida `-f null`), sin
+codificar, para medir el motor y no el encoder; la columna "solo decodificar"
+es el suelo de cualquier motor. Cada celda es la mejor de `--repeat` pasadas.
+
+    python scripts/bench_zoom_engine.py --minutes 5 --counts 7,50,300
+"""
+
+import argparse
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.segment_graph import quote
+from app.services.video.zoom_pan import (
+    ZoomConfig, calculate_zoom_frames, build_zoom_expressions, zoom_filter, zoom_windows
+)
+
+WIDTH, HEIGHT, FPS = 1920, 1080, 30
+
+
+def make_sample(path: str, seconds: float):
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={WIDTH}x{HEIGHT}:rate={FPS}:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-y", path,
+    ], check=True)
+
+
+def zoom_config(count: int, duration: float) -> ZoomConfig:
+    # Con cientos de ventanas se acortan para que no se solapen
+    return ZoomConfig(num_zooms=count, zoom_duration=min(4.0, duration / (count + 1) * 0.8))
+
+
+def write_legacy_graph(path: str, frames, config: ZoomConfig):
+    z_expr, x_expr, y_expr = build_zoom_expressions(frames, config.target_zoom, config.smooth_return)
+    with open(path, "w") as f:
+        f.write(f"[0:v]zoompan=z={quote(z_expr)}:x={quote(x_expr)}:y={quote(y_expr)}"
+                f":d=1:s={WIDTH}x{HEIGHT}:fps={FPS}[vout]")
+
+
+def write_tree_graph(path: str, frames, config: ZoomConfig):
+    with open(path, "w") as f:
+        f.write(f"[0:v]{zoom_filter(frames, config, FPS, WIDTH, HEIGHT)}[vout]")
+
+
+def write_windows_graph(path: str, frames, config: ZoomConfig, duration: float):
+    """Un tramo por ventana (zoompan) y por hueco entre ventanas (sin filtro), unidos con concat."""
+    multiplier = math.pi if config.smooth_return else math.pi / 2
+    pieces, position = [], 0
+    for low, high, start, end in zoom_windows(frames, FPS):
+        first, last = round(low * FPS + 0.5), round(high * FPS - 0.5)
+        if first > position:
+            pieces.append((position, first, None))
+        pieces.append((first, last + 1, (start, end)))
+        position = last + 1
+    if position < round(duration * FPS):
+        pieces.append((position, round(duration * FPS), None))
+
+    chains = [f"[0:v]split={len(pieces)}" + "".join(f"[s{i}]" for i in range(len(pieces)))]
+    for i, (first, end_frame, window) in enumerate(pieces):
+        chain = f"[s{i}]trim=start_frame={first}:end_frame={end_frame},setpts=PTS-STARTPTS"
+        if window:
+            start, end = window
+            curve = (f"max(1,1+{config.target_zoom - 1:.6f}"
+                     f"*sin((it+{first / FPS:.6f}-{start:.6f})/{end - start:.6f}*{multiplier:.8f}))")
+            chain += f",zoompan=z='{curve}':x='iw-iw/zoom':y='ih-ih/zoom':d=1:s={WIDTH}x{HEIGHT}:fps={FPS}"
+        chains.append(f"{chain}[p{i}]")
+    chains.append("".join(f"[p{i}]" for i in range(len(pieces))) + f"concat=n={len(pieces)}:v=1:a=0[vout]")
+    with open(path, "w") as f:
+        f.write(";\n".join(chains))
+
+
+def run(sample: str, graph: str, repeat: int):
+    """
+    Mejores segundos de ffmpeg en `repeat` pasadas, o None si no acepta el
+    grafo (el anidado no pasa del límite de anidamiento del evaluador).
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run([
+            "ffmpeg", "-v", "error", "-i", sample, "-filter_complex_script", graph,
+            "-map", "[vout]", "-f", "null", "-",
+        ], capture_output=True)
+        if result.returncode != 0:
+            return None
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def cells(seconds, frames_total: float) -> str:
+    return "falla | -" if seconds is None else f"{seconds:.1f} | {frames_total / seconds:.0f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--counts", default="7,50,300")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    counts = [int(c) for c in args.counts.split(",")]
+    duration = args.minutes * 60
+    frames_total = duration * FPS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = os.path.join(tmp, "sample.mp4")
+        print(f"Generando video de {args.minutes} min ({WIDTH}x{HEIGHT}@{FPS})...")
+        make_sample(sample, duration)
+
+        decode_graph = os.path.join(tmp, "decode.txt")
+        with open(decode_graph, "w") as f:
+            f.write("[0:v]null[vout]")
+        print(f"Solo decodificar: {cells(run(sample, decode_graph, args.repeat), frames_total)} (s | fps)\n")
+
+        print("| zooms | anidado (s) | anidado fps | árbol (s) | árbol fps | por ventanas (s) | por ventanas fps |")
+        print("|------:|------------:|------------:|----------:|----------:|-----------------:|-----------------:|")
+        for count in counts:
+            config = zoom_config(count, duration)
+            frames = calculate_zoom_frames(duration, config)
+            legacy_graph = os.path.join(tmp, "legacy.txt")
+            tree_graph = os.path.join(tmp, "tree.txt")
+            windows_graph = os.path.join(tmp, "windows.txt")
+            write_legacy_graph(legacy_graph, frames, config)
+            write_tree_graph(tree_graph, frames, config)
+            write_windows_graph(windows_graph, frames, config, duration)
+
+            legacy = run(sample, legacy_graph, args.repeat)
+            tree = run(sample, tree_graph, args.repeat)
+            windows = run(sample, windows_graph, args.repeat)
+            print(f"| {count} | {cells(legacy, frames_total)} | {cells(tree, frames_total)} "
+                  f"| {cells(windows, frames_total)} |", flush=True)
+
+
+if __name__ == "__main__":
+    main()
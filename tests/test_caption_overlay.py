@@ -0,0 +1,57 @@
+import asyncio
+import shutil
+import subprocess
+
+import pytest
+from PIL import Image
+
+from app.core.video_styles import StyleRegistry, VideoTemplate
+from app.services.render_cache import render_cache
+from app.services.video.caption_overlay import render_caption_overlay
+
+WIDTH, HEIGHT = 320, 240
+
+pytestmark = pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg no disponible")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_cache, "directory", str(tmp_path / "render"))
+    monkeypatch.setattr(render_cache, "max_bytes", 10 * 1024 * 1024)
+    monkeypatch.setattr(render_cache, "_size", None)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def composite_on_white(layer) -> bytes:
+    return subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"color=white:size={WIDTH}x{HEIGHT}:d=0.1",
+        "-i", layer.path,
+        "-filter_complex", f"[0:v][1:v]overlay=x={layer.x}:y={layer.y}",
+        "-frames:v", "1", "-f", "rawvideo", "-pix_fmt", "gray", "-",
+    ], check=True, capture_output=True).stdout
+
+
+def test_layer_is_cropped_and_restored_with_its_position(workdir):
+    style = StyleRegistry.resolve(VideoTemplate.MEME_THIN)
+    layer = asyncio.run(render_caption_overlay("hola mundo", style, WIDTH, HEIGHT))
+    cached = asyncio.run(render_caption_overlay("hola mundo", style, WIDTH, HEIGHT))
+
+    size = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "stream=width,height", "-of", "csv=p=0",
+                           layer.path], check=True, capture_output=True, text=True).stdout.strip()
+    width, height = (int(value) for value in size.split(","))
+    assert 0 < width < WIDTH and 0 < height < HEIGHT
+    assert (layer.x, layer.y) != (0, 0)
+    assert (cached.x, cached.y) == (layer.x, layer.y) and cached.path != layer.path
+
+
+def test_white_text_without_outline_leaves_no_dark_fringes(workdir):
+    style = StyleRegistry.resolve(VideoTemplate.MEME_THIN)
+    layer = asyncio.run(render_caption_overlay("hola mundo", style, WIDTH, HEIGHT))
+    # Texto blanco sobre fondo blanco: compuesto bien no se ve
+    assert min(composite_on_white(layer)) >= 253
+    with Image.open(layer.path) as image:
+        pixels = zip(image.getchannel("R").tobytes(), image.getchannel("A").tobytes())
+        edges = [(r, a) for r, a in pixels if 0 < a < 255]
+    assert edges and all(r >= 250 for r, _ in edges)
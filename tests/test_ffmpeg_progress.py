@@ -0,0 +1,32 @@
+import ffmpeg
+
+from app.utils.ffmpeg_progress import apply_thread_budget, output_positions
+
+
+def test_threads_before_every_output():
+    source = ffmpeg.input("in.mp4")
+    split = source.video.filter_multi_output("split", 2)
+    stream = ffmpeg.merge_outputs(
+        ffmpeg.output(split[0], source.audio, "a.mp4", vcodec="libx264", shortest=None),
+        ffmpeg.output(split[1], "b.mp4", crf=18),
+    ).overwrite_output()
+    args = apply_thread_budget(["ffmpeg", *stream.get_args()], 2)
+
+    assert args[:5] == ["ffmpeg", "-filter_threads", "2", "-filter_complex_threads", "2"]
+    for output in ("a.mp4", "b.mp4"):
+        index = args.index(output)
+        assert args[index - 2:index] == ["-threads", "2"]
+    assert args.count("-threads") == 2
+    assert args[-1] == "-y"
+
+
+def test_output_positions_skip_option_values():
+    args = ["ffmpeg", "-v", "error", "-f", "concat", "-safe", "0", "-i", "list.txt",
+            "-an", "-c", "copy", "out.mp4", "-y"]
+    assert output_positions(args) == [args.index("out.mp4")]
+
+
+def test_no_budget_leaves_args_untouched():
+    args = ["ffmpeg", "-i", "in.mp4", "out.mp4"]
+    assert apply_thread_budget(args, None) == args
+    assert apply_thread_budget(args, 0) == args
@@ -0,0 +1,69 @@
+import shutil
+import subprocess
+
+import pytest
+
+from app.core.encoding_profiles import ProfileRegistry
+from app.services.video.caption_overlay import CaptionLayer
+from app.services.video.meme import meme_batch_stream
+from app.utils.ffmpeg_progress import apply_thread_budget, output_positions
+
+OUTPUTS = [f"/tmp/meme_{index}.mp4" for index in range(3)]
+CAPTIONS = [CaptionLayer(f"/tmp/caption_{index}.png", 10, 20 * index) for index in range(3)]
+
+
+def batch_args(profile_name: str, audio_path=None):
+    profile = ProfileRegistry.resolve(profile_name)
+    stream = meme_batch_stream("/tmp/video.mp4", CAPTIONS, OUTPUTS, profile, audio_path)
+    return apply_thread_budget(stream.compile(), 2)
+
+
+def output_options(args):
+    """Opciones de cada salida: lo que hay entre la salida anterior (o el grafo de filtros) y ella."""
+    positions = output_positions(args)
+    starts = [args.index("-filter_complex") + 2] + [position + 1 for position in positions[:-1]]
+    return {args[end]: args[start:end] for start, end in zip(starts, positions)}
+
+
+def test_every_output_gets_the_thread_cap():
+    options = output_options(batch_args("standard", "/tmp/audio.m4a"))
+    assert sorted(options) == sorted(OUTPUTS)
+    for output_args in options.values():
+        assert output_args[output_args.index("-threads") + 1] == "2"
+
+
+def test_captions_are_placed_at_their_box():
+    graph = batch_args("standard")
+    graph = graph[graph.index("-filter_complex") + 1]
+    for index in range(3):
+        assert f"overlay=eof_action=repeat:x=10:y={20 * index}" in graph
+
+
+def test_audio_is_copied_into_every_output():
+    args = batch_args("standard", "/tmp/audio.m4a")
+    assert "/tmp/audio.m4a" in args
+    for output_args in output_options(args).values():
+        assert output_args[output_args.index("-c:a") + 1] == "copy"
+        assert "-b:a" not in output_args
+
+
+@pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg no disponible")
+def test_batch_renders_every_variant(tmp_path):
+    video, audio, caption = tmp_path / "video.mp4", tmp_path / "audio.m4a", tmp_path / "caption.png"
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", "testsrc2=size=64x48:rate=10:duration=1",
+        "-f", "lavfi", "-i", "sine=duration=1",
+        "-c:v", "libx264", "-c:a", "aac", "-y", str(video),
+    ], check=True)
+    subprocess.run(["ffmpeg", "-v", "error", "-i", str(video), "-vn", "-c:a", "aac", "-y", str(audio)], check=True)
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "color=white@0.5:size=32x16,format=rgba",
+                    "-frames:v", "1", "-y", str(caption)], check=True)
+
+    outputs = [str(tmp_path / f"out_{index}.mp4") for index in range(2)]
+    stream = meme_batch_stream(str(video), [CaptionLayer(str(caption), 8, 4)] * 2, outputs, ProfileRegistry.resolve("draft"), str(audio))
+    subprocess.run(stream.compile(), check=True, capture_output=True)
+    for output in outputs:
+        streams = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "stream=codec_type", "-of", "csv=p=0",
+                                  output], check=True, capture_output=True, text=True).stdout.split()
+        assert sorted(streams) == ["audio", "video"]
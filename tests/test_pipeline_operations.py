@@ -0,0 +1,40 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.controllers.video.pipeline_controller import parse_operations
+from app.services.video.pipeline import CutStep, MemeStep, ZoomStep
+
+
+def test_keeps_requested_order():
+    steps = parse_operations(json.dumps([
+        {"op": "meme", "text": "hola"},
+        {"op": "zoom", "num_zooms": 3, "target_zoom": 1.5, "smooth_return": True},
+        {"op": "cut"},
+    ]))
+    assert [type(step) for step in steps] == [MemeStep, ZoomStep, CutStep]
+    assert steps[1].config.num_zooms == 3 and steps[1].config.target_zoom == 1.5
+
+
+@pytest.mark.parametrize("operation", [
+    {"op": "zoom", "num_zooms": -1},
+    {"op": "zoom", "num_zooms": 2.5},
+    {"op": "zoom", "num_zooms": True},
+    {"op": "zoom", "zoom_duration": 0},
+    {"op": "zoom", "target_zoom": "2"},
+    {"op": "zoom", "smooth_return": 1},
+    {"op": "zoom", "speed": 2},
+    {"op": "meme", "text": "hola", "font": "x"},
+    {"op": "meme", "text": "hola", "color": 3},
+    {"op": "cut", "threshold": -30},
+])
+def test_rejects_invalid_parameters(operation):
+    with pytest.raises(HTTPException) as error:
+        parse_operations(json.dumps([operation]))
+    assert error.value.status_code == 400
+
+
+def test_rejects_repeated_operation():
+    with pytest.raises(HTTPException):
+        parse_operations(json.dumps([{"op": "cut"}, {"op": "cut"}]))
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services import render_cache as cache_module
+from app.services.render_cache import render_cache, submit_cached, upload_cached
+from app.services.scheduler import JobScheduler
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_cache, "directory", str(tmp_path / "render"))
+    monkeypatch.setattr(render_cache, "max_bytes", 10 * 1024 * 1024)
+    monkeypatch.setattr(render_cache, "_size", None)
+    monkeypatch.setattr(settings, "TEMP_DIR", str(tmp_path / "temp"))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_restore_copies_hits_into_temp_dir(cache_dir):
+    source = cache_dir / "out.mp4"
+    source.write_text("video")
+    render_cache.store("clave", ".mp4", str(source))
+
+    restored = render_cache.restore("clave", ".mp4")
+    assert restored.startswith(settings.TEMP_DIR)
+    with open(restored) as f:
+        assert f.read() == "video"
+    assert render_cache.restore("otra", ".mp4") is None
+
+
+def test_identical_renders_in_flight_run_once(cache_dir):
+    calls = []
+
+    async def render(path: str) -> str:
+        calls.append(path)
+        await asyncio.sleep(0.05)
+        with open(path, "w") as f:
+            f.write("video")
+        return path
+
+    async def scenario():
+        lane = JobScheduler(workers=2, threads_per_job=1, name="test")
+        results = await asyncio.gather(*(
+            submit_cached(lane, f"task-{i}", "clave", ".mp4", render, str(cache_dir / f"out{i}.mp4"))
+            for i in range(3)
+        ))
+        await lane.shutdown()
+        return results
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [timings.get("cached", False) for _, timings in results] == [False, True, True]
+    assert all(open(path).read() == "video" for path, _ in results)
+    assert not cache_module._rendering
+
+
+def test_identical_uploads_in_flight_run_once(cache_dir):
+    calls = []
+
+    def upload(name: str) -> dict:
+        calls.append(name)
+        return {"file_id": "abc"}
+
+    async def scenario():
+        return await asyncio.gather(*(upload_cached("clave", upload, "video.mp4") for _ in range(3)))
+
+    before = (render_cache.hits, render_cache.misses)
+    assert asyncio.run(scenario()) == [{"file_id": "abc"}] * 3
+    assert len(calls) == 1
+    # Las búsquedas de subidas no cuentan como aciertos/fallos de salidas
+    assert (render_cache.hits, render_cache.misses) == before
+    assert render_cache.stats()["upload_hits"] >= 2
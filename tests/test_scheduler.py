@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.core.encoding_profiles import ProfileRegistry
+from app.services.scheduler import JobScheduler, SchedulerFull
+from app.utils.job_control import JobCancelled
+
+
+def test_bounded_queue_rejects_when_full():
+    async def scenario():
+        lane = JobScheduler(workers=1, threads_per_job=1, name="preview", max_queued=1)
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+
+        running = lane.submit("a", job)
+        await asyncio.sleep(0)
+        waiting = lane.submit("b", job)
+        with pytest.raises(SchedulerFull):
+            lane.submit("c", job)
+        assert lane.stats()["queued"] == 1
+
+        release.set()
+        await asyncio.gather(running, waiting)
+        await lane.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_shutdown_resolves_running_and_queued_jobs():
+    async def scenario():
+        lane = JobScheduler(workers=1, threads_per_job=1, name="test")
+
+        async def job():
+            await asyncio.Event().wait()
+
+        running = lane.submit("a", job)
+        await asyncio.sleep(0)
+        waiting = lane.submit("b", job)
+        await asyncio.wait_for(lane.shutdown(), 5)
+        for future in (running, waiting):
+            with pytest.raises(JobCancelled):
+                await asyncio.wait_for(future, 1)
+        assert lane.stats()["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_preview_profile_only_through_preview():
+    assert "preview" not in ProfileRegistry.names()
+    with pytest.raises(ValueError):
+        ProfileRegistry.resolve("preview")
+    assert ProfileRegistry.preview(10).max_seconds == 10
@@ -0,0 +1,90 @@
+import os
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from app.services.segment_graph import audio_segments, select_expression, snap_segments, write_cut_graph
+
+
+def short_segments(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    segments, t = [], 0.1
+    for _ in range(count):
+        start = t + rng.uniform(0.05, 0.2)
+        end = start + rng.uniform(0.04, 0.3)
+        segments.append((start, end))
+        t = end
+    return segments
+
+
+def test_audio_follows_video_length_without_accumulating():
+    fps, sample_rate = 30000 / 1001, 44100
+    block = round(sample_rate / fps) / sample_rate
+    segments = snap_segments(short_segments(500), fps)
+
+    video_total = 0.0
+    audio_total = 0.0
+    for (start, end), (a_start, a_end) in zip(segments, audio_segments(segments, block)):
+        video_total += end - start
+        audio_total += a_end - a_start
+        assert abs(audio_total - video_total) <= block / 2 + 1e-9
+        assert abs(a_start + block / 2 - start) <= block
+
+
+@pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg no disponible")
+def test_rendered_audio_and_video_lengths_match(tmp_path):
+    fps, sample_rate, size = 30000 / 1001, 44100, 16
+    source = tmp_path / "source.mkv"
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}x{size}:rate=30000/1001:duration=45",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate={sample_rate}:duration=45",
+        "-c:v", "ffv1", "-c:a", "pcm_s16le", "-y", str(source),
+    ], check=True)
+
+    segments = short_segments(120)
+    graph = write_cut_graph(str(tmp_path / "graph.txt"), segments, frame_rate=fps, sample_rate=sample_rate)
+    video, audio = tmp_path / "video.raw", tmp_path / "audio.raw"
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-i", str(source), "-filter_complex_script", graph,
+        "-map", "[vout]", "-f", "rawvideo", "-pix_fmt", "gray", "-y", str(video),
+        "-map", "[aout]", "-f", "s16le", "-ac", "1", "-y", str(audio),
+    ], check=True)
+
+    video_seconds = os.path.getsize(video) / (size * size) / fps
+    audio_seconds = os.path.getsize(audio) / 2 / sample_rate
+    expected = sum(end - start for start, end in snap_segments(segments, fps))
+    assert abs(video_seconds - expected) < 1 / fps
+    assert abs(audio_seconds - video_seconds) <= 0.5 * round(sample_rate / fps) / sample_rate + 1e-6
+
+
+def evaluate(expression: str, t: float) -> float:
+    """Evalúa una expresión de select con las funciones de ffmpeg que usa."""
+    functions = {"iff": lambda c, a, b: a if c else b, "gte": lambda a, b: float(a >= b),
+                 "lt": lambda a, b: float(a < b)}
+    return eval(expression.replace("if(", "iff("), functions, {"t": t})
+
+
+def test_select_expression_matches_segments():
+    segments = short_segments(37)
+    expression = select_expression(segments)
+    for step in range(int(segments[-1][1] * 100) + 20):
+        t = step / 100
+        inside = any(start <= t < end for start, end in segments)
+        assert evaluate(expression, t) == float(inside), t
+
+
+def test_select_expression_offset_and_empty():
+    assert select_expression([]) == "0"
+    expression = select_expression([(10.0, 11.0), (12.0, 13.0)], offset=10.0)
+    assert [evaluate(expression, t) for t in (0.0, 0.99, 1.0, 2.5, 3.0)] == [1, 1, 0, 1, 0]
+
+
+def test_snap_segments_lands_on_the_grid_and_drops_empty_ones():
+    fps = 25
+    snapped = snap_segments([(0.01, 0.51), (1.001, 1.015), (2.03, 2.97)], fps)
+    assert snapped == [(0.0, 0.52), (2.04, 2.96)]
+    for start, end in snapped:
+        assert round(start * fps, 9).is_integer() and round(end * fps, 9).is_integer()
@@ -0,0 +1,38 @@
+from app.core.encoding_profiles import ProfileRegistry
+from app.services.video.smart_cut import Piece, SourceVideo, encoder_args, plan_pieces
+
+
+def source(encoder: str, profile: str) -> SourceVideo:
+    return SourceVideo(codec="h264" if encoder == "libx264" else "hevc", encoder=encoder, profile=profile,
+                       level=40, pix_fmt="yuv420p", frame_rate="30000/1001", frame_duration=1001 / 30000,
+                       has_audio=True)
+
+
+def option(args, name):
+    return args[args.index(name) + 1]
+
+
+def test_encoder_args_use_profile_quality_and_source_stream():
+    args = encoder_args(source("libx264", "High"), ProfileRegistry.resolve("draft"))
+    assert option(args, "-preset") == "ultrafast" and option(args, "-crf") == "28"
+    assert option(args, "-r") == "30000/1001" and option(args, "-profile:v") == "high"
+    assert option(args, "-flags") == "+cgop"
+
+
+def test_encoder_args_close_hevc_gops():
+    args = encoder_args(source("libx265", "Main"))
+    assert option(args, "-preset") == "veryfast" and option(args, "-crf") == "18"
+    assert option(args, "-x265-params") == "open-gop=0"
+
+
+def test_plan_pieces_copies_whole_gops_only():
+    keyframes = [0.0, 2.0, 4.0, 6.0, 8.0]
+    frame = 0.04
+    assert plan_pieces([(1.0, 7.0)], keyframes, frame) == [
+        Piece(1.0, 2.0, copy=False), Piece(2.0, 6.0, copy=True), Piece(6.0, 7.0, copy=False)]
+    # Empieza y acaba en keyframe (a menos de medio frame): nada que recodificar
+    assert plan_pieces([(2.01, 6.0)], keyframes, frame) == [Piece(2.0, 6.0, copy=True)]
+    # Sin un GOP completo dentro se recodifica entero
+    assert plan_pieces([(2.5, 3.5), (4.5, 6.2)], keyframes, frame) == [
+        Piece(2.5, 3.5, copy=False), Piece(4.5, 6.2, copy=False)]
+    assert plan_pieces([(9.0, 10.0)], keyframes, frame) == [Piece(9.0, 10.0, copy=False)]
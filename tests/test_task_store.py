@@ -0,0 +1,50 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+from app.api.v1.controllers import tasks_controller
+from app.services.sqlite_task_store import SqliteTaskStore
+
+
+def test_locked_database_does_not_block_the_event_loop(monkeypatch, tmp_path):
+    store = SqliteTaskStore(str(tmp_path / "tasks.db"))
+    store.stats()
+    monkeypatch.setattr(tasks_controller, "task_manager", store)
+
+    # Otro proceso con una escritura abierta: add_task espera a que la suelte
+    writer = sqlite3.connect(str(tmp_path / "tasks.db"), isolation_level=None, check_same_thread=False)
+    writer.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.5, writer.rollback).start()
+
+    async def scenario():
+        lag = 0.0
+        done = asyncio.Event()
+
+        async def ticker():
+            nonlocal lag
+            while not done.is_set():
+                expected = time.perf_counter() + 0.01
+                await asyncio.sleep(0.01)
+                lag = max(lag, time.perf_counter() - expected)
+
+        probe = asyncio.create_task(ticker())
+        await asyncio.sleep(0.02)
+        started = time.perf_counter()
+        response = await tasks_controller.init_task_handler()
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe
+        return response, elapsed, lag
+
+    try:
+        response, elapsed, lag = asyncio.run(scenario())
+    finally:
+        writer.close()
+        store.close()
+
+    assert elapsed >= 0.4
+    assert lag < 0.2
+    task_id = json.loads(response.body)["task_id"]
+    assert store.get_task(task_id) is not None
@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.controllers.image import tweet_controller
+from app.api.v1.controllers.image.tweet_controller import MAX_BATCH_TEXTS, _render_many, parse_texts
+from app.services.scheduler import JobScheduler
+
+
+def test_parse_texts_keeps_order():
+    assert parse_texts(json.dumps(["uno", "dos", "uno"])) == ["uno", "dos", "uno"]
+
+
+@pytest.mark.parametrize("raw", [
+    "no es json",
+    json.dumps([]),
+    json.dumps({"texts": ["uno"]}),
+    json.dumps(["uno", ""]),
+    json.dumps(["uno", "   "]),
+    json.dumps(["uno", 2]),
+    json.dumps(["x"] * (MAX_BATCH_TEXTS + 1)),
+])
+def test_parse_texts_rejects_invalid_lists(raw):
+    with pytest.raises(HTTPException) as error:
+        parse_texts(raw)
+    assert error.value.status_code == 400
+
+
+def test_repeated_texts_render_once(monkeypatch, tmp_path):
+    rendered = []
+
+    async def fake_generate(texts):
+        rendered.extend(texts)
+        paths = []
+        for index, text in enumerate(texts):
+            path = tmp_path / f"{len(rendered)}_{index}.png"
+            path.write_text(text)
+            paths.append(str(path))
+        return paths
+
+    async def scenario():
+        lane = JobScheduler(workers=1, threads_per_job=1, name="test")
+        monkeypatch.setattr(tweet_controller, "scheduler", lane)
+        monkeypatch.setattr(tweet_controller, "generate_tweet_images", fake_generate)
+        texts = ["a", "b", "a", "c", "b"]
+        paths, _ = await _render_many("t", texts, [None] * len(texts), [0, 1, 2, 3, 4])
+        await lane.shutdown()
+        return paths
+
+    paths = asyncio.run(scenario())
+    assert rendered == ["a", "b", "c"]
+    assert paths[0] == paths[2] and paths[1] == paths[4]
+    assert len(set(paths.values())) == 3
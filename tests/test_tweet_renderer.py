@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.services.image import tweet
+from app.services.image.tweet import _font_path_for, _wrap
+
+DEJAVU = "/usr/share/fonts/truetype/dejavu"
+
+
+def test_wrap_balances_lines_like_libass():
+    assert _wrap("aaa bbb ccc ddd eee fff", len, 20) == ["aaa bbb ccc", "ddd eee fff"]
+
+
+def test_wrap_keeps_explicit_breaks_and_width():
+    lines = _wrap("uno dos tres cuatro cinco seis siete\nocho", len, 16)
+    assert lines[-1] == "ocho"
+    assert all(len(line) <= 16 for line in lines)
+    assert " ".join(lines[:-1]).split() == "uno dos tres cuatro cinco seis siete".split()
+
+
+@pytest.mark.skipif(not os.path.exists(f"{DEJAVU}/DejaVuSansMono.ttf"), reason="DejaVu no instalada")
+def test_missing_glyphs_use_the_fallback_chain(monkeypatch):
+    primary, fallback = f"{DEJAVU}/DejaVuSansMono.ttf", f"{DEJAVU}/DejaVuSans.ttf"
+    monkeypatch.setattr(settings, "TWEET_FALLBACK_FONTS", f"/no/existe.ttf,{fallback}")
+    tweet._fallback_paths.cache_clear()
+    _font_path_for.cache_clear()
+    try:
+        assert _font_path_for("a", primary) == primary
+        assert _font_path_for("☰", primary) == fallback
+        # Nadie lo tiene: se queda la fuente pedida, como libass
+        assert _font_path_for("", primary) == primary
+    finally:
+        tweet._fallback_paths.cache_clear()
+        _font_path_for.cache_clear()
+
+
+@pytest.mark.skipif(not os.path.exists(f"{DEJAVU}/DejaVuSans.ttf"), reason="DejaVu no instalada")
+def test_missing_font_uses_the_first_fallback(monkeypatch, caplog):
+    fallback = f"{DEJAVU}/DejaVuSans.ttf"
+    monkeypatch.setattr(settings, "TWEET_FALLBACK_FONTS", f"/no/existe.ttf,{fallback}")
+    caches = (tweet._fallback_paths, tweet._installed_font, tweet._charset, tweet._font, _font_path_for)
+    for cache in caches:
+        cache.cache_clear()
+    try:
+        missing = "/no/existe/Poppins-Regular.ttf"
+        with caplog.at_level("WARNING", logger=tweet.__name__):
+            assert tweet._font(missing, 40).path == fallback
+        assert any(missing in record.getMessage() for record in caplog.records)
+        assert _font_path_for("a", missing) == missing
+        assert tweet._text_width("hola", missing, 40) > 0
+    finally:
+        for cache in caches:
+            cache.cache_clear()
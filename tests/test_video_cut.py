@@ -0,0 +1,39 @@
+import asyncio
+import shutil
+import subprocess
+
+import pytest
+
+from app.services.video.cut import concat_copy
+
+
+def frame_times(path) -> list:
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v", "-show_entries", "packet=pts_time",
+        "-of", "csv=p=0", str(path),
+    ], capture_output=True, text=True, check=True)
+    return sorted(float(line.split(",")[0]) for line in result.stdout.split())
+
+
+@pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg no disponible")
+def test_concat_copy_leaves_no_gap_between_aac_parts(tmp_path):
+    parts = []
+    for index in range(3):
+        part = tmp_path / f"part_{index}.mp4"
+        subprocess.run([
+            "ffmpeg", "-v", "error",
+            "-f", "lavfi", "-i", "testsrc2=size=32x32:rate=30:duration=2",
+            "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100:duration=2",
+            "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac",
+            # Como encode_segments: el priming del AAC lleva el video a 0.023 s
+            "-avoid_negative_ts", "make_zero", "-y", str(part),
+        ], check=True)
+        parts.append(str(part))
+
+    output = tmp_path / "out.mp4"
+    asyncio.run(concat_copy(parts, str(tmp_path / "concat.txt"), str(output), [2.0] * 3))
+
+    times = frame_times(output)
+    assert len(times) == 180
+    steps = [b - a for a, b in zip(times, times[1:])]
+    assert max(steps) < 1.5 / 30
@@ -0,0 +1,111 @@
+import shutil
+import subprocess
+
+import ffmpeg
+import pytest
+
+import asyncio
+import math
+
+from app.core.config import settings
+from app.core.encoding_profiles import ProfileRegistry
+from app.services.video import zoom_pan as zoom_module
+from app.services.video.smart_cut import Piece
+from app.services.video.zoom_pan import (
+    ZoomConfig, build_zoom_expressions, plan_zoom_pieces, zoom_expression, zoom_filter, zoom_windows
+)
+
+
+def test_overlapping_windows_later_one_wins():
+    fps = 10
+    windows = zoom_windows([(1.0, 2.0), (1.5, 3.0), (5.0, 5.0)], fps)
+    assert [(start, end) for _, _, start, end in windows] == [(1.0, 2.0), (1.5, 3.0)]
+    (low_a, high_a, _, _), (low_b, high_b, _, _) = windows
+    assert low_a == pytest.approx(0.95) and high_a == pytest.approx(1.45)
+    assert low_b == pytest.approx(1.45) and high_b == pytest.approx(3.05)
+
+
+def test_window_inside_a_later_one_disappears():
+    windows = zoom_windows([(2.0, 2.5), (1.0, 4.0)], 10)
+    assert [(start, end) for _, _, start, end in windows] == [(1.0, 4.0)]
+
+
+def test_later_window_splits_the_one_containing_it():
+    windows = zoom_windows([(1.0, 4.0), (2.0, 2.5)], 10)
+    assert [(start, end) for _, _, start, end in windows] == [(1.0, 4.0), (2.0, 2.5), (1.0, 4.0)]
+    assert [(round(low, 2), round(high, 2)) for low, high, _, _ in windows] == [(0.95, 1.95), (1.95, 2.55), (2.55, 4.05)]
+
+
+@pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg no disponible")
+def test_render_keeps_size_and_frame_count(tmp_path):
+    width, height, fps, seconds = 64, 48, 25, 8
+    frames = [(0.5 + i * 0.2, 1.0 + i * 0.2) for i in range(30)]
+    config = ZoomConfig(num_zooms=len(frames), zoom_duration=0.5, target_zoom=1.6)
+    output = tmp_path / "zoom.raw"
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}",
+        "-vf", zoom_filter(frames, config, fps, width, height),
+        "-f", "rawvideo", "-pix_fmt", "gray", "-y", str(output),
+    ], check=True)
+
+    data = output.read_bytes()
+    assert len(data) == width * height * fps * seconds
+    # Fuera de las ventanas el frame es el original; dentro, no
+    frame = width * height
+    first = subprocess.run([
+        "ffmpeg", "-v", "error", "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}",
+        "-f", "rawvideo", "-pix_fmt", "gray", "-",
+    ], check=True, capture_output=True).stdout
+    assert data[:frame] == first[:frame]
+    middle = 60 * frame
+    assert data[middle:middle + frame] != first[middle:middle + frame]
+
+
+def evaluate(expression: str, **variables) -> float:
+    """Evalúa una expresión de zoompan con las funciones de ffmpeg que usan los motores."""
+    functions = {"iff": lambda c, a, b: a if c else b, "lt": lambda a, b: float(a < b),
+                 "between": lambda x, a, b: float(a <= x <= b), "sin": math.sin, "max": max}
+    return eval(expression.replace("if(", "iff("), functions, variables)
+
+
+@pytest.mark.parametrize("smooth_return", [True, False])
+def test_tree_expression_matches_nested_one(smooth_return):
+    fps = 30
+    frames = [(1.0, 2.5), (4.2, 5.0), (7.0, 9.1), (12.5, 13.0)]
+    nested, _, _ = build_zoom_expressions(frames, 1.6, smooth_return)
+    tree = zoom_expression(frames, 1.6, smooth_return, fps)
+    for frame in range(15 * fps):
+        t = frame / fps
+        assert evaluate(tree, it=t) == pytest.approx(evaluate(nested, time=t), abs=1e-6), t
+
+
+def test_plan_zoom_pieces_cuts_on_keyframes_and_merges():
+    keyframes = [0.0, 2.0, 4.0, 6.0, 8.0]
+    pieces = plan_zoom_pieces([(4.5, 5.0), (2.5, 3.0), (3.5, 4.5), (8.5, 9.0)], keyframes, 10.0)
+    assert pieces == [Piece(0.0, 2.0, copy=True), Piece(2.0, 6.0, copy=False),
+                      Piece(6.0, 8.0, copy=True), Piece(8.0, 10.0, copy=False)]
+    assert plan_zoom_pieces([], keyframes, 10.0) == [Piece(0.0, 10.0, copy=True)]
+
+
+@pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg no disponible")
+def test_smart_zoom_falls_back_when_ffmpeg_fails(monkeypatch, tmp_path):
+    source = tmp_path / "source.mp4"
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc2=size=64x48:rate=25:duration=4",
+        "-f", "lavfi", "-i", "sine=frequency=440:duration=4",
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", "-y", str(source),
+    ], check=True)
+    scratch = tmp_path / "scratch"
+    monkeypatch.setattr(settings, "TEMP_DIR", str(scratch))
+
+    async def failing_windows(*args, **kwargs):
+        raise ffmpeg.Error("ffmpeg", b"", b"concat: invalid data")
+
+    monkeypatch.setattr(zoom_module, "render_zoom_windows", failing_windows)
+    output = asyncio.run(zoom_module.zoom_pan(
+        str(source), str(tmp_path / "zoom.mp4"), ZoomConfig(num_zooms=2, zoom_duration=0.5),
+        ProfileRegistry.resolve("standard"), smart_zoom=True,
+    ))
+    assert (tmp_path / "zoom.mp4").stat().st_size > 0 and output == str(tmp_path / "zoom.mp4")
+    assert not any(scratch.iterdir())